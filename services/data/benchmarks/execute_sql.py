@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import time
+import uuid
+
+import psycopg2.extras
+
+from services.data.postgres_async_db import AsyncPostgresDB
+from services.utils import DBConfiguration
+
+
+async def fetch_row_objects(table, select_sql, values):
+    "Rows materialized through a DictCursor and row objects"
+    with (await table.db.pool.cursor(cursor_factory=psycopg2.extras.DictCursor)) as cur:
+        await cur.execute(select_sql, values)
+        records = await cur.fetchall()
+        return [table._row_type(**record).serialize() for record in records]
+
+
+async def fetch_execute_sql(table, select_sql, values):
+    response, _ = await table.execute_sql(select_sql=select_sql, values=values)
+    return response.body
+
+
+async def fetch_stream_sql(table, select_sql, values):
+    rows = []
+    async for chunk in table.stream_sql(select_sql=select_sql, values=values):
+        rows.extend(chunk)
+    return rows
+
+
+async def run_benchmark(args):
+    db = AsyncPostgresDB.get_instance()
+    await db._init(DBConfiguration())
+    table = db.artifact_table_postgres
+    flow_id = "ExecuteBenchmarkFlow-{}".format(uuid.uuid4().hex)
+    with (await db.pool.cursor()) as cur:
+        await cur.execute(
+            """
+            INSERT INTO {} (flow_id, run_number, step_name, task_id, name, location, ds_type, sha, type,
+                            content_type, user_name, attempt_id, ts_epoch, tags, system_tags)
+            SELECT %s, 1, 'start', n / 100, 'artifact_' || n, 's3://bucket/' || n, 's3', md5(n::text), 'pickle',
+                   'gzip+pickle-v2', 'benchmark', 0, 1, '[]', '[]'
+            FROM generate_series(1, %s) AS n
+            """.format(table.table_name),
+            [flow_id, args.rows]
+        )
+
+    select_sql = "SELECT * FROM {} WHERE flow_id = %s".format(table.table_name)
+    try:
+        variants = [
+            ("row objects", fetch_row_objects),
+            ("execute_sql", fetch_execute_sql),
+            ("stream_sql", fetch_stream_sql),
+        ]
+        expected = None
+        for name, fetch in variants:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.time()
+                rows = await fetch(table, select_sql, [flow_id])
+                timings.append(time.time() - start)
+            expected = expected or rows
+            assert rows == expected, "{} rows differ".format(name)
+            print("%s: %.0fms for %d rows" % (name, 1000 * min(timings), len(rows)))
+    finally:
+        with (await db.pool.cursor()) as cur:
+            await cur.execute("DELETE FROM {} WHERE flow_id = %s".format(table.table_name), [flow_id])
+        db.pool.close()
+        await db.pool.wait_closed()
+
+
+def main():
+    """
+    Measure the time to fetch and serialize a large artifact listing through row objects,
+    with execute_sql, and streamed in chunks with stream_sql.
+
+    Connects to the database configured with the MF_METADATA_DB_* environment variables.
+
+    Usage: python -m services.data.benchmarks.execute_sql [--rows N] [--repeat N]
+    """
+    parser = argparse.ArgumentParser(description="Measure the time to fetch and serialize a large listing.")
+    parser.add_argument("--rows", type=int, default=100000, help="number of artifacts to list (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of fetches per variant, the fastest is reported (default: 3)")
+    args = parser.parse_args()
+    asyncio.get_event_loop().run_until_complete(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
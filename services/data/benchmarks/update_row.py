@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from services.data import postgres_async_db
+from services.data.postgres_async_db import AsyncPostgresDB
+from services.utils import DBConfiguration
+
+
+async def update_with_update_row(table, flow_id, run_number, heartbeat_ts):
+    return await table.update_row(
+        filter_dict={"flow_id": flow_id, "run_number": str(run_number), "last_heartbeat_ts:<=": heartbeat_ts},
+        update_dict={"last_heartbeat_ts": heartbeat_ts}
+    )
+
+
+async def update_with_update_record(table, flow_id, run_number, heartbeat_ts):
+    return await table.update_record(
+        filter_dict={"flow_id": flow_id, "run_number": run_number, "last_heartbeat_ts:<=": heartbeat_ts},
+        update_dict={"last_heartbeat_ts": heartbeat_ts}
+    )
+
+
+async def measure(update, table, flow_id, run_numbers, heartbeat_ts, updates, concurrency):
+    "Returns the number of heartbeat updates per second, spread over the runs."
+    queue = asyncio.Queue()
+    for i in range(updates):
+        queue.put_nowait((run_numbers[i % len(run_numbers)], heartbeat_ts + i))
+
+    async def _worker():
+        while not queue.empty():
+            run_number, ts = queue.get_nowait()
+            response = await update(table, flow_id, run_number, ts)
+            assert response.response_code == 200, response.body
+
+    start = time.time()
+    await asyncio.gather(*[_worker() for _ in range(concurrency)])
+    return updates / (time.time() - start)
+
+
+async def run_benchmark(args):
+    db = AsyncPostgresDB.get_instance()
+    await db._init(DBConfiguration(pool_max=args.concurrency))
+    table = db.run_table_postgres
+    flow_id = "UpdateBenchmarkFlow-{}".format(uuid.uuid4().hex)
+    await db.flow_table_postgres.create_record({
+        "flow_id": flow_id, "user_name": "benchmark", "tags": json.dumps([]), "system_tags": json.dumps([])
+    })
+    run_numbers = []
+    for _ in range(args.runs):
+        run = await table.create_record({
+            "flow_id": flow_id, "user_name": "benchmark", "tags": json.dumps([]), "system_tags": json.dumps([])
+        }, expanded=True)
+        run_numbers.append(run.body["run_number"])
+
+    # heartbeats only move forwards, so every update uses a newer timestamp.
+    heartbeat_ts = int(time.time())
+    try:
+        variants = [
+            ("update_row", update_with_update_row, True),
+            ("update_record (parameterized)", update_with_update_record, False),
+            ("update_record (prepared)", update_with_update_record, True),
+        ]
+        for name, update, prepared in variants:
+            postgres_async_db.DB_PREPARED_STATEMENTS = prepared
+            # warm up the connections of the pool
+            await measure(update, table, flow_id, run_numbers, heartbeat_ts, args.concurrency * 10, args.concurrency)
+            heartbeat_ts += args.concurrency * 10
+            rate = await measure(update, table, flow_id, run_numbers, heartbeat_ts, args.updates, args.concurrency)
+            heartbeat_ts += args.updates
+            print("%s: %.0f updates/sec" % (name, rate))
+    finally:
+        for cleanup_table in (table, db.flow_table_postgres):
+            await cleanup_table.execute_sql(
+                select_sql="DELETE FROM {} WHERE flow_id = %s RETURNING flow_id".format(cleanup_table.table_name),
+                values=[flow_id], serialize=False
+            )
+        db.pool.close()
+        await db.pool.wait_closed()
+
+
+def main():
+    """
+    Measure the throughput of heartbeat updates of runs with the string built update_row, and with
+    the parameterized update_record with and without prepared statements.
+
+    Connects to the database configured with the MF_METADATA_DB_* environment variables.
+
+    Usage: python -m services.data.benchmarks.update_row [--updates N] [--runs N] [--concurrency N]
+    """
+    parser = argparse.ArgumentParser(description="Measure the throughput of single row updates.")
+    parser.add_argument("--updates", type=int, default=5000, help="number of updates per variant (default: 5000)")
+    parser.add_argument("--runs", type=int, default=100, help="number of runs to spread updates over (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of concurrent updates (default: 4)")
+    args = parser.parse_args()
+    asyncio.get_event_loop().run_until_complete(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import asyncio
-from typing import List, Dict, Any
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Sequence
 import psycopg2
 import collections
 import datetime
@@ -82,6 +83,65 @@ def get_exposed_task_id(task_id, task_name):
     return task_id
 
 
+def exposed_run_id_str(run_number, run_id):
+    return str(get_exposed_run_id(run_number, run_id))
+
+
+def exposed_task_id_str(task_id, task_name):
+    return str(get_exposed_task_id(task_id, task_name))
+
+
+def row_serializer(row_type, columns: Sequence[str], expanded: bool = False) -> Callable[[Sequence], Dict]:
+    """
+    Function that serializes a result row of the given columns, the same way as
+    `row_type(**row).serialize(expanded)`.
+
+    Row types can declare their serialized fields with a `serialized_fields(expanded)` classmethod.
+    Each field is either a column that is serialized as is under its own name, or a
+    (key, function, column, ...) tuple for a key that is computed from one or more columns.
+    Rows of such types are serialized straight from the row values with a precomputed column map.
+    Other row types, or results that lack a column of a field, are serialized through a row object.
+
+    Parameters
+    ----------
+    row_type : type
+        row class of the result, such as ArtifactRow
+    columns : Sequence[str]
+        column names of the result rows, in order
+    expanded : bool
+        serialize the expanded form of the rows
+
+    Returns
+    -------
+    Callable[[Sequence], Dict]
+        function that serializes a row of values, for example a tuple or a DictRow
+    """
+    # Later columns win on duplicate names, like with DictCursor
+    index = {column: i for i, column in enumerate(columns)}
+    fields = row_type.serialized_fields(expanded) if hasattr(row_type, "serialized_fields") else None
+    field_columns = [column for field in fields or [] for column in ([field] if isinstance(field, str) else field[2:])]
+    if fields is None or any(column not in index for column in field_columns):
+        def _serialize_row_object(record):
+            return row_type(**dict(zip(columns, record))).serialize(expanded)
+        return _serialize_row_object
+
+    keys = [field if isinstance(field, str) else field[0] for field in fields]
+    # Computed keys get the value of their first column first, to keep the key order of serialize()
+    indexes = [index[field if isinstance(field, str) else field[2]] for field in fields]
+    values = itemgetter(*indexes) if len(indexes) > 1 else (lambda record: (record[indexes[0]],))
+    computed = [
+        (field[0], field[1], [index[column] for column in field[2:]])
+        for field in fields if not isinstance(field, str)
+    ]
+
+    def _serialize(record):
+        row = dict(zip(keys, values(record)))
+        for key, func, column_indexes in computed:
+            row[key] = func(*[record[i] for i in column_indexes])
+        return row
+    return _serialize
+
+
 def get_latest_attempt_id_for_tasks(artifacts):
     attempt_ids = {}
     for artifact in artifacts:
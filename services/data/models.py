@@ -56,6 +56,15 @@ class RunRow(object):
         self.ts_epoch = ts_epoch
         self.last_heartbeat_ts = last_heartbeat_ts
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        if expanded:
+            return ["flow_id", "run_number", "run_id", "user_name", "ts_epoch", "tags", "system_tags",
+                    "last_heartbeat_ts"]
+        return ["flow_id", ("run_number", get_exposed_run_id, "run_number", "run_id"), "user_name", "ts_epoch",
+                "tags", "system_tags", "last_heartbeat_ts"]
+
     def serialize(self, expanded: bool = False):
         if expanded:
             return {
@@ -182,6 +191,16 @@ class TaskRow(object):
         self.system_tags = system_tags
         self.last_heartbeat_ts = last_heartbeat_ts
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        if expanded:
+            return ["flow_id", "run_number", "run_id", "step_name", "task_id", "task_name", "user_name",
+                    "ts_epoch", "tags", "system_tags", "last_heartbeat_ts"]
+        return ["flow_id", ("run_number", get_exposed_run_id, "run_number", "run_id"), "step_name",
+                ("task_id", get_exposed_task_id, "task_id", "task_name"), "user_name", "ts_epoch", "tags",
+                "system_tags", "last_heartbeat_ts"]
+
     def serialize(self, expanded: bool = False):
         if expanded:
             return {
@@ -336,6 +355,13 @@ class ArtifactRow(object):
         self.tags = tags
         self.system_tags = system_tags
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        return ["flow_id", ("run_number", get_exposed_run_id, "run_number", "run_id"), "step_name",
+                ("task_id", get_exposed_task_id, "task_id", "task_name"), "name", "location", "ds_type", "sha",
+                "type", "content_type", "user_name", "attempt_id", "ts_epoch", "tags", "system_tags"]
+
     def serialize(self, expanded: bool = False):
         return {
             "flow_id": self.flow_id,
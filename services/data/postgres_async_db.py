@@ -1,17 +1,20 @@
+import asyncio
+import hashlib
 import psycopg2
 import psycopg2.extras
-from psycopg2.extensions import QuotedString
 import os
 import aiopg
 import json
 import math
 import re
 import time
+import weakref
+from collections import OrderedDict
 from services.utils import logging, DBType
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Tuple
 
 from .db_utils import DBResponse, DBPagination, aiopg_exception_handling, \
-    get_db_ts_epoch_str, translate_run_key, translate_task_key, new_heartbeat_ts
+    get_db_ts_epoch_str, translate_run_key, translate_task_key, new_heartbeat_ts, row_serializer
 from .models import FlowRow, RunRow, StepRow, TaskRow, MetadataRow, ArtifactRow
 from services.utils import DBConfiguration, USE_SEPARATE_READER_POOL
 
@@ -22,6 +25,37 @@ AIOPG_ECHO = os.environ.get("AIOPG_ECHO", 0) == "1"
 
 WAIT_TIME = 10
 
+# Maximum number of rows to insert with a single multi-row INSERT statement
+BULK_INSERT_BATCH_SIZE = int(os.environ.get("DB_BULK_INSERT_BATCH_SIZE", 500))
+
+# Bounds for the in-process cache of run and task id resolutions used by the write path.
+ID_CACHE_MAX_SIZE = int(os.environ.get("MF_METADATA_ID_CACHE_SIZE", 10000))
+ID_CACHE_TTL_SECONDS = int(os.environ.get("MF_METADATA_ID_CACHE_TTL_SECONDS", 60 * 10))
+# Time to keep run tags cached for when applying them to steps, tasks, artifacts and metadata.
+# Tag mutations through this process invalidate the cache right away, other processes pick them up after the TTL.
+RUN_TAGS_CACHE_TTL_SECONDS = int(os.environ.get("MF_METADATA_RUN_TAGS_CACHE_TTL_SECONDS", 5))
+
+# Heartbeats of runs and tasks that are known to exist are buffered, and written to the database once per
+# flush interval. The interval is capped to a third of the heartbeat threshold of the UI service, so that
+# a buffered heartbeat reaches the database well before the run or task is considered to have failed.
+# A flush interval of 0 writes every heartbeat right away.
+HEARTBEAT_THRESHOLD = int(os.environ.get("HEARTBEAT_THRESHOLD", WAIT_TIME * 6))
+HEARTBEAT_FLUSH_INTERVAL_SECONDS = min(
+    int(os.environ.get("MF_METADATA_HEARTBEAT_FLUSH_INTERVAL_SECONDS", WAIT_TIME)),
+    HEARTBEAT_THRESHOLD // 3
+)
+
+# Run parameterized updates as server-side prepared statements, so that their plans are reused.
+# Disable with `DB_PREPARED_STATEMENTS=0` when connecting through a pooler that does not keep
+# sessions, such as PgBouncer in transaction pooling mode.
+DB_PREPARED_STATEMENTS = os.environ.get("DB_PREPARED_STATEMENTS", "1") == "1"
+
+# Maximum number of rendered select statements cached per table, by the shape of their conditions and ordering.
+SELECT_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_SELECT_STATEMENT_CACHE_SIZE", 1024))
+
+# Number of rows to fetch at a time when streaming query results through a server-side cursor
+STREAM_CHUNK_SIZE = int(os.environ.get("DB_STREAM_CHUNK_SIZE", 1000))
+
 # Create database triggers automatically, disabled by default
 # Enable with env variable `DB_TRIGGER_CREATE=1`
 DB_TRIGGER_CREATE = os.environ.get("DB_TRIGGER_CREATE", 0) == "1"
@@ -39,10 +73,128 @@ DB_SCHEMA_NAME = os.environ.get("DB_SCHEMA_NAME", "public")
 operator_match = re.compile('([^:]*):([=><]+)$')
 
 # use a ddmmyyy timestamp as the version for triggers
-TRIGGER_VERSION = "05092024"
+TRIGGER_VERSION = "18102026"
 TRIGGER_NAME_PREFIX = "notify_ui"
 
 
+class IdCache(object):
+    """
+    Bounded LRU cache with a time-to-live.
+
+    Used for id resolutions, which never change once created so that cached entries
+    only need to expire in order to keep memory bounded, and for run tags, which are
+    kept for a short time and invalidated explicitly when they are mutated.
+
+    Parameters
+    ----------
+    max_size : int
+        maximum number of entries to hold before evicting the least recently used one.
+    ttl_seconds : int
+        time in seconds after which an entry is considered expired.
+    """
+
+    def __init__(self, max_size: int = ID_CACHE_MAX_SIZE, ttl_seconds: int = ID_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class HeartbeatBuffer(object):
+    """
+    Write-behind buffer for heartbeats.
+
+    Keeps the latest heartbeat timestamp per run or task in memory, and writes all of them with
+    one UPDATE statement per table once the flush interval has passed. Only heartbeats of
+    objects whose heartbeat has been written successfully before are buffered, so that
+    heartbeats for objects that do not exist still fail right away.
+
+    Parameters
+    ----------
+    flush_interval : int
+        time in seconds to buffer heartbeats for. 0 disables buffering.
+    """
+
+    def __init__(self, flush_interval: int = HEARTBEAT_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self.known = IdCache()
+        self._pending = {}
+        self._flush_task = None
+
+    def mark_known(self, table: "AsyncPostgresTable", key_columns: Tuple[str], key: Tuple):
+        "Records that a heartbeat for the key has been written, so that later heartbeats can be buffered."
+        if self.flush_interval > 0:
+            self.known.put((table.table_name, key_columns, key), True)
+
+    def add(self, table: "AsyncPostgresTable", key_columns: Tuple[str], key: Tuple, heartbeat_ts: int) -> bool:
+        """
+        Buffer a heartbeat for a key that is known to exist.
+
+        Returns
+        -------
+        bool
+            True if the heartbeat was buffered, False if it needs to be written right away.
+        """
+        if self.flush_interval <= 0 or not self.known.get((table.table_name, key_columns, key)):
+            return False
+        heartbeats = self._pending.setdefault((table, key_columns), {})
+        heartbeats[key] = max(heartbeat_ts, heartbeats.get(key, heartbeat_ts))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+        return True
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        "Write all buffered heartbeats."
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        pending, self._pending = self._pending, {}
+        for (table, key_columns), heartbeats in pending.items():
+            response = await table.update_heartbeats(key_columns, heartbeats)
+            if response.response_code != 200:
+                # Keep the heartbeats for the next flush, unless newer ones have been buffered meanwhile.
+                for key, heartbeat_ts in heartbeats.items():
+                    self.add(table, key_columns, key, heartbeat_ts)
+
+    def __len__(self):
+        return sum(len(heartbeats) for heartbeats in self._pending.values())
+
+
 class _AsyncPostgresDB(object):
     connection = None
     flow_table_postgres = None
@@ -75,6 +227,13 @@ class _AsyncPostgresDB(object):
         tables.append(self.metadata_table_postgres)
         self.tables = tables
 
+        self.run_ids_cache = IdCache()
+        self.task_ids_cache = IdCache()
+        self.run_tags_cache = IdCache(ttl_seconds=RUN_TAGS_CACHE_TTL_SECONDS)
+        self.heartbeat_buffer = HeartbeatBuffer()
+        # Names of the statements that have been prepared on each connection
+        self.prepared_statements = weakref.WeakKeyDictionary()
+
     async def _init(self, db_conf: DBConfiguration, create_triggers=DB_TRIGGER_CREATE):
         # todo make poolsize min and max configurable as well as timeout
         # todo add retry and better error message
@@ -133,18 +292,55 @@ class _AsyncPostgresDB(object):
         return None
 
     async def get_run_ids(self, flow_id: str, run_id: str):
+        cached = self.run_ids_cache.get((flow_id, str(run_id)))
+        if cached is not None:
+            return cached
+
         run = await self.run_table_postgres.get_run(flow_id, run_id,
                                                     expanded=True)
+        self.cache_run_ids(run.body)
         return run.body['run_number'], run.body['run_id']
 
     async def get_task_ids(self, flow_id: str, run_id: str,
                            step_name: str, task_name: str):
+        cached = self.task_ids_cache.get((flow_id, str(run_id), step_name, str(task_name)))
+        if cached is not None:
+            return cached
 
         task = await self.task_table_postgres.get_task(flow_id, run_id,
                                                        step_name, task_name,
                                                        expanded=True)
+        self.cache_task_ids(task.body)
         return task.body['task_id'], task.body['task_name']
 
+    def cache_run_ids(self, run: Dict):
+        """
+        Store the id resolution of an expanded run record,
+        so that it can be looked up both by run number and by run id.
+        """
+        ids = (run['run_number'], run['run_id'])
+        for run_key in ids:
+            if run_key is not None:
+                self.run_ids_cache.put((run['flow_id'], str(run_key)), ids)
+
+    def invalidate_run_tags(self, flow_id: str, *run_keys):
+        "Drop cached run tags, for every run number / run id the run has been looked up by."
+        for run_key in run_keys:
+            if run_key is not None:
+                self.run_tags_cache.delete((flow_id, str(run_key)))
+
+    def cache_task_ids(self, task: Dict):
+        """
+        Store the id resolution of an expanded task record,
+        for every combination of run number / run id and task id / task name.
+        """
+        ids = (task['task_id'], task['task_name'])
+        for run_key in (task['run_number'], task['run_id']):
+            for task_key in ids:
+                if run_key is not None and task_key is not None:
+                    self.task_ids_cache.put(
+                        (task['flow_id'], str(run_key), task['step_name'], str(task_key)), ids)
+
 
 class AsyncPostgresDB(object):
     __instance = None
@@ -161,6 +357,16 @@ class AsyncPostgresDB(object):
         return getattr(AsyncPostgresDB.__instance, name)
 
 
+def limit_offset_sql(limit: int = 0, offset: int = 0) -> str:
+    "LIMIT and OFFSET clauses to append to a select statement"
+    sql = ""
+    if limit:
+        sql += " LIMIT {}".format(limit)
+    if offset:
+        sql += " OFFSET {}".format(offset)
+    return sql
+
+
 class AsyncPostgresTable(object):
     db = None
     table_name = None
@@ -184,6 +390,10 @@ class AsyncPostgresTable(object):
         if self.table_name is None:
             raise NotImplementedError(
                 "need to specify table name")
+        self._update_statements = {}
+        self._select_statement_cache = OrderedDict()
+        self._rendered_fragments = {}
+        self._row_serializers = {}
 
     async def _init(self, create_triggers: bool):
         if create_triggers:
@@ -218,33 +428,74 @@ class AsyncPostgresTable(object):
     async def find_records(self, conditions: List[str] = None, values=[], fetch_single=False,
                            limit: int = 0, offset: int = 0, order: List[str] = None, expanded=False,
                            enable_joins=False, cur: aiopg.Cursor = None) -> Tuple[DBResponse, DBPagination]:
-        sql_template = """
-        SELECT * FROM (
-            SELECT
-                {keys}
-            FROM {table_name}
-            {joins}
-        ) T
-        {where}
-        {order_by}
-        {limit}
-        {offset}
-        """
-
-        select_sql = sql_template.format(
-            keys=",".join(
-                self.select_columns + (self.join_columns if enable_joins and self.join_columns else [])),
-            table_name=self.table_name,
-            joins=" ".join(self.joins) if enable_joins and self.joins is not None else "",
-            where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
-            order_by="ORDER BY {}".format(", ".join(order)) if order else "",
-            limit="LIMIT {}".format(limit) if limit else "",
-            offset="OFFSET {}".format(offset) if offset else ""
-        ).strip()
+        conditions = tuple(conditions or ())
+        order = tuple(order or ())
+
+        def _render():
+            keys, joins = self._select_fragments(enable_joins)
+            sql_template = """
+            SELECT * FROM (
+                SELECT
+                    {keys}
+                FROM {table_name}
+                {joins}
+            ) T
+            {where}
+            {order_by}
+            """
+            return sql_template.format(
+                keys=keys,
+                table_name=self.table_name,
+                joins=joins,
+                where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
+                order_by="ORDER BY {}".format(", ".join(order)) if order else "",
+            ).strip()
+
+        select_sql = self._select_statement(("find_records", conditions, order, enable_joins), _render)
+        select_sql += limit_offset_sql(limit, offset)
 
         return await self.execute_sql(select_sql=select_sql, values=values, fetch_single=fetch_single,
                                       expanded=expanded, limit=limit, offset=offset, cur=cur)
 
+    def _select_fragments(self, enable_joins: bool) -> Tuple[str, str]:
+        """
+        Rendered select keys and joins of the table, computed once per table.
+
+        Returns
+        -------
+        Tuple[str, str]
+            comma separated select keys, with the join columns when joins are enabled, and the joins
+        """
+        if enable_joins not in self._rendered_fragments:
+            keys = self.select_columns + (self.join_columns if enable_joins and self.join_columns else [])
+            joins = " ".join(self.joins) if enable_joins and self.joins else ""
+            self._rendered_fragments[enable_joins] = (",".join(keys), joins)
+        return self._rendered_fragments[enable_joins]
+
+    def _select_statement(self, shape: Tuple, render) -> str:
+        """
+        SQL of a statement shape, rendered with `render` the first time the shape is requested.
+
+        Shapes must cover everything the rendered SQL depends on, apart from values passed as parameters.
+        The least recently used statements are evicted once the cache is full.
+        """
+        try:
+            self._select_statement_cache.move_to_end(shape)
+            return self._select_statement_cache[shape]
+        except KeyError:
+            sql = render()
+            self._select_statement_cache[shape] = sql
+            if len(self._select_statement_cache) > SELECT_STATEMENT_CACHE_SIZE:
+                self._select_statement_cache.popitem(last=False)
+            return sql
+
+    def _row_serializer(self, columns: Tuple[str], expanded: bool = False):
+        "Serializer of result rows with the given columns, built once per shape of the result"
+        shape = (columns, expanded)
+        if shape not in self._row_serializers:
+            self._row_serializers[shape] = row_serializer(self._row_type, columns, expanded)
+        return self._row_serializers[shape]
+
     async def execute_sql(self, select_sql: str, values=[], fetch_single=False,
                           expanded=False, limit: int = 0, offset: int = 0,
                           cur: aiopg.Cursor = None, serialize: bool = True) -> Tuple[DBResponse, DBPagination]:
@@ -254,11 +505,9 @@ class AsyncPostgresTable(object):
             rows = []
             records = await _cur.fetchall()
             if serialize:
-                for record in records:
-                    # pylint-initial-ignore: Lack of __init__ makes this too hard for pylint
-                    # pylint: disable=not-callable
-                    row = self._row_type(**record)
-                    rows.append(row.serialize(expanded))
+                if records:
+                    serialize_row = self._row_serializer(tuple(column[0] for column in _cur.description), expanded)
+                    rows = [serialize_row(record) for record in records]
             else:
                 rows = records
 
@@ -281,8 +530,9 @@ class AsyncPostgresTable(object):
                 return DBResponse(response_code=200, body=body), pagination
             else:
                 db_pool = self.db.reader_pool if USE_SEPARATE_READER_POOL else self.db.pool
+                # Serialized rows are built from plain tuples, unserialized rows are accessed by column name.
                 with (await db_pool.cursor(
-                        cursor_factory=psycopg2.extras.DictCursor
+                        cursor_factory=None if serialize else psycopg2.extras.DictCursor
                 )) as cur:
                     body, pagination = await _execute_on_cursor(cur)
                     cur.close()
@@ -293,7 +543,54 @@ class AsyncPostgresTable(object):
             self.db.logger.exception("Exception occurred")
             return aiopg_exception_handling(error), None
 
-    async def create_record(self, record_dict):
+    async def stream_sql(self, select_sql: str, values=[], expanded=False, serialize: bool = True,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[List]:
+        """
+        Rows of a query in chunks, fetched through a server-side cursor instead of all at once,
+        so that large results do not have to be held in memory.
+
+        The cursor lives in a transaction on a connection of its own, which is held until the
+        iteration finishes. Unlike execute_sql, errors are raised to the caller.
+
+        Parameters
+        ----------
+        select_sql : str
+            query to stream the results of
+        values : List
+            parameters of the query
+        expanded : bool
+            serialize the expanded form of the rows
+        serialize : bool
+            serialize rows with the row type of the table, otherwise rows are DictRows
+        chunk_size : int
+            number of rows to fetch at a time
+
+        Yields
+        ------
+        List
+            the next chunk of at most chunk_size rows
+        """
+        db_pool = self.db.reader_pool if USE_SEPARATE_READER_POOL else self.db.pool
+        with (await db_pool.cursor(
+                cursor_factory=None if serialize else psycopg2.extras.DictCursor
+        )) as cur:
+            async with cur.begin():
+                await cur.execute("DECLARE stream_cursor NO SCROLL CURSOR FOR {}".format(select_sql), values)
+                serialize_row = None
+                while True:
+                    await cur.execute("FETCH FORWARD %s FROM stream_cursor", [chunk_size])
+                    records = await cur.fetchall()
+                    if not records:
+                        break
+                    if not serialize:
+                        yield records
+                        continue
+                    if serialize_row is None:
+                        serialize_row = self._row_serializer(tuple(column[0] for column in cur.description), expanded)
+                    yield [serialize_row(record) for record in records]
+                # the cursor is closed with the transaction
+
+    async def create_record(self, record_dict, expanded=False):
         # note: need to maintain order
         cols = []
         values = []
@@ -333,7 +630,7 @@ class AsyncPostgresTable(object):
                 for key, value in record.items():
                     if key in self.keys:
                         filtered_record[key] = value
-                response_body = self._row_type(**filtered_record).serialize()  # pylint: disable=not-callable
+                response_body = self._row_type(**filtered_record).serialize(expanded)  # pylint: disable=not-callable
                 # todo make sure connection is closed even with error
                 cur.close()
             return DBResponse(response_code=200, body=response_body)
@@ -341,6 +638,226 @@ class AsyncPostgresTable(object):
             self.db.logger.exception("Exception occurred")
             return aiopg_exception_handling(error)
 
+    async def create_records(self, records: List[Dict], batch_size: int = BULK_INSERT_BATCH_SIZE) -> DBResponse:
+        """
+        Insert multiple records with multi-row INSERT statements inside a single transaction.
+
+        Records that conflict with an existing row (or with an earlier record of the same batch)
+        are skipped instead of failing the whole insert.
+
+        Parameters
+        ----------
+        records : List[Dict]
+            records to insert. All records are expected to share the same set of columns.
+        batch_size : int (optional)
+            maximum number of rows per INSERT statement.
+
+        Returns
+        -------
+        DBResponse
+            body is a list aligned with the provided records, containing the serialized row for each
+            inserted record, or None for records that were skipped due to a conflict or an error.
+        """
+        if not records:
+            return DBResponse(response_code=200, body=[])
+
+        # note: need to maintain order
+        cols = list(records[0].keys()) + ["ts_epoch"]
+        ts_epoch = get_db_ts_epoch_str()
+        row_format = "({})".format(", ".join(["%s"] * len(cols)))
+
+        try:
+            inserted_rows = []
+            with (
+                await self.db.pool.cursor(
+                    cursor_factory=psycopg2.extras.DictCursor
+                )
+            ) as cur:
+                async with cur.begin():
+                    for i in range(0, len(records), batch_size):
+                        batch = records[i:i + batch_size]
+                        values = []
+                        for record in batch:
+                            values.extend(record[col] for col in cols[:-1])
+                            values.append(ts_epoch)
+
+                        insert_sql = """
+                                    INSERT INTO {0}({1}) VALUES {2}
+                                    ON CONFLICT DO NOTHING
+                                    RETURNING *
+                                    """.format(
+                            self.table_name, ", ".join(cols), ", ".join([row_format] * len(batch))
+                        )
+                        await cur.execute(insert_sql, tuple(values))
+                        inserted_rows += await cur.fetchall()
+                cur.close()
+        except (Exception, psycopg2.DatabaseError):
+            # The transaction has been rolled back, so nothing from this call has been persisted.
+            # Fall back to inserting records one by one so that a single invalid record
+            # does not prevent the rest from being stored.
+            self.db.logger.exception("Bulk insert failed, falling back to single inserts")
+            body = []
+            for record in records:
+                response = await self.create_record(record)
+                body.append(response.body if response.response_code == 200 else None)
+            return DBResponse(response_code=200, body=body)
+
+        # RETURNING only yields the inserted rows, so match them back to the requested
+        # records by their primary key values to report which ones were skipped.
+        key_cols = [key for key in self.primary_keys if key in records[0]]
+
+        def _key(row):
+            return tuple(str(row[key]) for key in key_cols)
+
+        inserted_by_key = {}
+        for row in inserted_rows:
+            filtered_record = {key: value for key, value in row.items() if key in self.keys}
+            inserted_by_key.setdefault(_key(row), []).append(
+                self._row_type(**filtered_record).serialize())  # pylint: disable=not-callable
+
+        body = []
+        for record in records:
+            matches = inserted_by_key.get(_key(record))
+            body.append(matches.pop(0) if matches else None)
+        return DBResponse(response_code=200, body=body)
+
+    def _update_statement(self, filter_columns: Tuple[str], update_columns: Tuple[str]) -> Tuple[str, str, str]:
+        """
+        Statement for updating a set of columns of rows matching a set of filters.
+
+        Statements are cached by their shape, so that each shape is prepared only once per connection.
+
+        Returns
+        -------
+        Tuple[str, str, str]
+            statement name, statement with $n parameters for preparing, and statement with %s parameters
+        """
+        shape = (filter_columns, update_columns)
+        if shape not in self._update_statements:
+            sets = ["{} = {{}}".format(col_name) for col_name in update_columns]
+            filters = []
+            for col_name in filter_columns:
+                find_operator = operator_match.match(col_name)
+                if find_operator:
+                    filters.append("({0} IS NULL or {0} {1} {{}})".format(find_operator.group(1), find_operator.group(2)))
+                else:
+                    filters.append("{} = {{}}".format(col_name))
+            template = "UPDATE {0} SET {1} WHERE {2}".format(self.table_name, ", ".join(sets), " and ".join(filters))
+            params = len(sets) + len(filters)
+            prepared_sql = template.format(*("${}".format(i) for i in range(1, params + 1)))
+            # Statements are named after their content, as tables of the same name share connections.
+            self._update_statements[shape] = (
+                "update_{}".format(hashlib.md5(prepared_sql.encode("utf-8")).hexdigest()),
+                prepared_sql,
+                template.format(*(["%s"] * params)),
+            )
+        return self._update_statements[shape]
+
+    async def update_record(self, filter_dict: Dict, update_dict: Dict, cur: aiopg.Cursor = None) -> DBResponse:
+        """
+        Update a single row with a parameterized statement.
+
+        Unlike update_row, values are passed as they are, without quoting.
+
+        Parameters
+        ----------
+        filter_dict : Dict
+            values of the columns that identify the row. A column name can have an operator suffix,
+            such as 'last_heartbeat_ts:<=', in which case rows with a NULL value match as well.
+        update_dict : Dict
+            new values by column name
+
+        Returns
+        -------
+        DBResponse
+            404 if no row matched, 500 if multiple rows matched.
+        """
+        name, prepared_sql, update_sql = self._update_statement(tuple(filter_dict), tuple(update_dict))
+        values = tuple(update_dict.values()) + tuple(filter_dict.values())
+
+        async def _execute_update_on_cursor(_cur):
+            if DB_PREPARED_STATEMENTS:
+                prepared = self.db.prepared_statements.setdefault(_cur.connection, set())
+                if name not in prepared:
+                    await _cur.execute("PREPARE {} AS {}".format(name, prepared_sql))
+                    prepared.add(name)
+                await _cur.execute("EXECUTE {}({})".format(name, ", ".join(["%s"] * len(values))), values)
+            else:
+                await _cur.execute(update_sql, values)
+            if _cur.rowcount < 1:
+                return DBResponse(response_code=404,
+                                  body={"msg": "could not find row"})
+            if _cur.rowcount > 1:
+                return DBResponse(response_code=500,
+                                  body={"msg": "duplicate rows"})
+            return DBResponse(response_code=200, body={"rowcount": _cur.rowcount})
+        if cur:
+            return await _execute_update_on_cursor(cur)
+        try:
+            with (
+                await self.db.pool.cursor(
+                    cursor_factory=psycopg2.extras.DictCursor
+                )
+            ) as cur:
+                db_response = await _execute_update_on_cursor(cur)
+                cur.close()
+                return db_response
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.db.logger.exception("Exception occurred")
+            return aiopg_exception_handling(error)
+
+    async def update_heartbeats(self, key_columns: Tuple[str], heartbeats: Dict[Tuple, int],
+                                batch_size: int = BULK_INSERT_BATCH_SIZE) -> DBResponse:
+        """
+        Set the heartbeats of multiple rows with UPDATE ... FROM (VALUES ...) statements.
+
+        Heartbeats are never moved backwards, in case a newer heartbeat has been written meanwhile.
+
+        Parameters
+        ----------
+        key_columns : Tuple[str]
+            columns that identify the rows
+        heartbeats : Dict[Tuple, int]
+            heartbeat timestamps by the values of the key columns
+
+        Returns
+        -------
+        DBResponse
+            body contains the number of updated rows
+        """
+        row_format = "({})".format(", ".join(["%s"] * (len(key_columns) + 1)))
+        items = list(heartbeats.items())
+        rowcount = 0
+        try:
+            with (
+                await self.db.pool.cursor(
+                    cursor_factory=psycopg2.extras.DictCursor
+                )
+            ) as cur:
+                for i in range(0, len(items), batch_size):
+                    batch = items[i:i + batch_size]
+                    values = []
+                    for key, heartbeat_ts in batch:
+                        values.extend(key)
+                        values.append(heartbeat_ts)
+                    update_sql = """
+                        UPDATE {0} AS t SET last_heartbeat_ts = v.last_heartbeat_ts
+                        FROM (VALUES {1}) AS v({2}, last_heartbeat_ts)
+                        WHERE {3} AND (t.last_heartbeat_ts IS NULL OR t.last_heartbeat_ts < v.last_heartbeat_ts)
+                        """.format(
+                        self.table_name,
+                        ", ".join([row_format] * len(batch)),
+                        ", ".join(key_columns),
+                        " AND ".join("t.{0} = v.{0}".format(col) for col in key_columns)
+                    )
+                    await cur.execute(update_sql, tuple(values))
+                    rowcount += cur.rowcount
+                cur.close()
+            return DBResponse(response_code=200, body={"rowcount": rowcount})
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.db.logger.exception("Exception occurred")
+            return aiopg_exception_handling(error)
+
     async def run_in_transaction_with_serializable_isolation_level(self, fun):
         try:
             with (
@@ -598,7 +1115,12 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
             "run_id": run.run_id,
             "last_heartbeat_ts": str(new_heartbeat_ts()) if fill_heartbeat else None
         }
-        return await self.create_record(dict)
+        db_response = await self.create_record(dict, expanded=True)
+        if db_response.response_code != 200:
+            return db_response
+        # Newly created runs are likely to receive writes right away, so prime the id cache.
+        self.db.cache_run_ids(db_response.body)
+        return DBResponse(response_code=200, body=RunRow(**db_response.body).serialize())
 
     async def get_run(self, flow_id: str, run_id: str, expanded: bool = False, cur: aiopg.Cursor = None):
         key, value = translate_run_key(run_id)
@@ -613,15 +1135,22 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
     async def update_heartbeat(self, flow_id: str, run_id: str):
         run_key, run_value = translate_run_key(run_id)
         new_hb = new_heartbeat_ts()
+        body = {"wait_time_in_seconds": WAIT_TIME}
+        key_columns = ("flow_id", run_key)
+        key = (flow_id, int(run_value) if run_key == "run_number" else run_value)
+        if self.db.heartbeat_buffer.add(self, key_columns, key, new_hb):
+            return DBResponse(response_code=200, body=json.dumps(body))
+
         filter_dict = {"flow_id": flow_id,
-                       run_key: str(run_value),
+                       run_key: key[1],
                        "last_heartbeat_ts:<=": new_hb - WAIT_TIME}
         set_dict = {
             "last_heartbeat_ts": new_hb
         }
-        result = await self.update_row(filter_dict=filter_dict,
-                                       update_dict=set_dict)
-        body = {"wait_time_in_seconds": WAIT_TIME}
+        result = await self.update_record(filter_dict=filter_dict,
+                                          update_dict=set_dict)
+        if result.response_code == 200:
+            self.db.heartbeat_buffer.mark_known(self, key_columns, key)
 
         return DBResponse(response_code=result.response_code,
                           body=json.dumps(body))
@@ -629,12 +1158,12 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
     async def update_run_tags(self, flow_id: str, run_id: str, run_tags: list, cur: aiopg.Cursor = None):
         run_key, run_value = translate_run_key(run_id)
         filter_dict = {"flow_id": flow_id,
-                       run_key: str(run_value)}
+                       run_key: int(run_value) if run_key == "run_number" else run_value}
 
-        set_dict = {"tags": QuotedString(json.dumps(run_tags)).getquoted().decode()}
-        return await self.update_row(filter_dict=filter_dict,
-                                     update_dict=set_dict,
-                                     cur=cur)
+        set_dict = {"tags": json.dumps(run_tags)}
+        return await self.update_record(filter_dict=filter_dict,
+                                        update_dict=set_dict,
+                                        cur=cur)
 
 
 class AsyncStepTablePostgres(AsyncPostgresTable):
@@ -703,7 +1232,12 @@ class AsyncTaskTablePostgres(AsyncPostgresTable):
             "system_tags": json.dumps(task.system_tags),
             "last_heartbeat_ts": str(new_heartbeat_ts()) if fill_heartbeat else None
         }
-        return await self.create_record(dict)
+        db_response = await self.create_record(dict, expanded=True)
+        if db_response.response_code != 200:
+            return db_response
+        # Newly created tasks are likely to receive writes right away, so prime the id cache.
+        self.db.cache_task_ids(db_response.body)
+        return DBResponse(response_code=200, body=TaskRow(**db_response.body).serialize())
 
     async def get_tasks(self, flow_id: str, run_id: str, step_name: str):
         run_id_key, run_id_value = translate_run_key(run_id)
@@ -732,18 +1266,25 @@ class AsyncTaskTablePostgres(AsyncPostgresTable):
         run_key, run_value = translate_run_key(run_id)
         task_key, task_value = translate_task_key(task_id)
         new_hb = new_heartbeat_ts()
+        body = {"wait_time_in_seconds": WAIT_TIME}
+        key_columns = ("flow_id", run_key, "step_name", task_key)
+        key = (flow_id, int(run_value) if run_key == "run_number" else run_value,
+               step_name, int(task_value) if task_key == "task_id" else task_value)
+        if self.db.heartbeat_buffer.add(self, key_columns, key, new_hb):
+            return DBResponse(response_code=200, body=json.dumps(body))
+
         filter_dict = {"flow_id": flow_id,
-                       run_key: str(run_value),
+                       run_key: key[1],
                        "step_name": step_name,
-                       task_key: str(task_value),
+                       task_key: key[3],
                        "last_heartbeat_ts:<=": new_hb - WAIT_TIME}
         set_dict = {
             "last_heartbeat_ts": new_hb
         }
-        result = await self.update_row(filter_dict=filter_dict,
-                                       update_dict=set_dict)
-
-        body = {"wait_time_in_seconds": WAIT_TIME}
+        result = await self.update_record(filter_dict=filter_dict,
+                                          update_dict=set_dict)
+        if result.response_code == 200:
+            self.db.heartbeat_buffer.mark_known(self, key_columns, key)
 
         return DBResponse(response_code=result.response_code,
                           body=json.dumps(body))
@@ -795,6 +1336,20 @@ class AsyncMetadataTablePostgres(AsyncPostgresTable):
         }
         return await self.create_record(dict)
 
+    async def bulk_add_metadata(self, metadata: List[Dict]):
+        """
+        Insert multiple metadata records at once.
+        Each item should contain the same fields as the arguments of add_metadata()
+        """
+        records = [{
+            **datum,
+            "run_number": str(datum["run_number"]),
+            "task_id": str(datum["task_id"]),
+            "tags": json.dumps(datum["tags"]),
+            "system_tags": json.dumps(datum["system_tags"]),
+        } for datum in metadata]
+        return await self.create_records(records)
+
     async def get_metadata_in_runs(self, flow_id: str, run_id: str):
         run_id_key, run_id_value = translate_run_key(run_id)
         filter_dict = {"flow_id": flow_id,
@@ -922,6 +1477,21 @@ class AsyncArtifactTablePostgres(AsyncPostgresTable):
         }
         return await self.create_record(dict)
 
+    async def bulk_add_artifacts(self, artifacts: List[Dict]):
+        """
+        Insert multiple artifact records at once.
+        Each item should contain the same fields as the arguments of add_artifact()
+        """
+        records = [{
+            **artifact,
+            "run_number": str(artifact["run_number"]),
+            "task_id": str(artifact["task_id"]),
+            "attempt_id": str(artifact["attempt_id"]),
+            "tags": json.dumps(artifact["tags"]),
+            "system_tags": json.dumps(artifact["system_tags"]),
+        } for artifact in artifacts]
+        return await self.create_records(records)
+
     async def get_artifacts_in_runs(self, flow_id: str, run_id: int):
         run_id_key, run_id_value = translate_run_key(run_id)
         filter_dict = {
@@ -1,5 +1,24 @@
 from services.data.db_utils import DBResponse
-import copy
+
+
+async def get_run_tags(flow_id, run_number, run_table_postgres) -> DBResponse:
+    """
+    Fetch the tags and system_tags of a run, from the short-lived run tags cache
+    of the database adapter if possible.
+    """
+    cache = run_table_postgres.db.run_tags_cache
+    cache_key = (flow_id, str(run_number))
+    run_tags = cache.get(cache_key)
+    if run_tags is not None:
+        return DBResponse(response_code=200, body=run_tags)
+
+    db_response_for_run = await run_table_postgres.get_run(flow_id, run_number)
+    if db_response_for_run.response_code != 200:
+        return db_response_for_run
+    run = db_response_for_run.body
+    run_tags = {"tags": run['tags'], "system_tags": run['system_tags']}
+    cache.put(cache_key, run_tags)
+    return DBResponse(response_code=200, body=run_tags)
 
 
 async def apply_run_tags_to_db_response(flow_id, run_number, run_table_postgres, db_response: DBResponse) -> DBResponse:
@@ -9,26 +28,23 @@ async def apply_run_tags_to_db_response(flow_id, run_number, run_table_postgres,
 
     This is a prerequisite for supporting Run-based tag mutation.
     """
-    # we will return a modified copy of db_response
-    new_db_response = copy.deepcopy(db_response)
     # Only replace tags if response code is legit
     # Object creation ought to return 201 (let's prepare for that)
-    if new_db_response.response_code not in (200, 201):
-        return new_db_response
-    if isinstance(new_db_response.body, list):
-        items_to_modify = new_db_response.body
-    else:
-        items_to_modify = [new_db_response.body]
-    if not items_to_modify:
-        return new_db_response
-    # items_to_modify now references all the items we want to modify
+    if db_response.response_code not in (200, 201):
+        return db_response
+    if not db_response.body:
+        return db_response
 
     # The ancestral run must be successfully read from DB
-    db_response_for_run = await run_table_postgres.get_run(flow_id, run_number)
+    db_response_for_run = await get_run_tags(flow_id, run_number, run_table_postgres)
     if db_response_for_run.response_code != 200:
         return DBResponse(response_code=500, body=db_response_for_run.body)
-    run = db_response_for_run.body
-    for item_as_dict in items_to_modify:
-        item_as_dict['tags'] = run['tags']
-        item_as_dict['system_tags'] = run['system_tags']
-    return new_db_response
+    run_tags = db_response_for_run.body
+
+    # we return a modified copy of db_response. Only the items are copied, as the
+    # tags are the only values that change, and they are replaced rather than mutated.
+    if isinstance(db_response.body, list):
+        body = [dict(item, **run_tags) for item in db_response.body]
+    else:
+        body = dict(db_response.body, **run_tags)
+    return DBResponse(response_code=db_response.response_code, body=body)
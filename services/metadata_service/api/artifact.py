@@ -491,9 +491,9 @@ class ArtificatsApi(object):
                 ),
             )
 
-        # todo change to bulk insert
+        artifacts = []
         for artifact in body:
-            values = {
+            artifacts.append({
                 "flow_id": flow_name,
                 "run_number": run_number,
                 "run_id": run_id,
@@ -510,10 +510,12 @@ class ArtificatsApi(object):
                 "user_name": artifact.get("user_name", " "),
                 "tags": artifact.get("tags"),
                 "system_tags": artifact.get("system_tags"),
-            }
-            artifact_response = await self._async_table.add_artifact(**values)
-            if artifact_response.response_code == 200:
-                count = count + 1
+            })
+
+        artifact_response = await self._async_table.bulk_add_artifacts(artifacts)
+        if artifact_response.response_code == 200:
+            # rows skipped due to conflicts are reported as None
+            count = sum(1 for row in artifact_response.body if row is not None)
 
         result = {"artifacts_created": count}
 
@@ -181,8 +181,9 @@ class MetadataApi(object):
             return web.Response(status=400, body=json.dumps(
                 {"message": "need to register run_id and task_id first"}))
 
+        metadata = []
         for datum in body:
-            values = {
+            metadata.append({
                 "flow_id": flow_name,
                 "run_number": run_number,
                 "run_id": run_id,
@@ -195,10 +196,12 @@ class MetadataApi(object):
                 "user_name": datum.get("user_name"),
                 "tags": datum.get("tags"),
                 "system_tags": datum.get("system_tags"),
-            }
-            metadata_response = await self._async_table.add_metadata(**values)
-            if metadata_response.response_code == 200:
-                count = count + 1
+            })
+
+        metadata_response = await self._async_table.bulk_add_metadata(metadata)
+        if metadata_response.response_code == 200:
+            # rows skipped due to conflicts are reported as None
+            count = sum(1 for row in metadata_response.body if row is not None)
 
         result = {"metadata_created": count}
 
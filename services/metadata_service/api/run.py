@@ -207,8 +207,11 @@ class RunApi(object):
         tags_to_add_set = set(tags_to_add)
         tags_to_remove_set = set(tags_to_remove)
 
+        # run number and run id of the mutated run, as its tags can be cached under both
+        mutated_run_keys = []
+
         async def _in_tx_mutation_logic(cur):
-            run_db_response = await self._async_table.get_run(flow_name, run_number, cur=cur)
+            run_db_response = await self._async_table.get_run(flow_name, run_number, expanded=True, cur=cur)
             if run_db_response.response_code != 200:
                 # if something went wrong with get_run, just return the error from that directly
                 # e.g. 404, or some other error. This is useful for the client (vs additional wrapping, etc).
@@ -235,10 +238,15 @@ class RunApi(object):
             update_db_response = await self._async_table.update_run_tags(flow_name, run_number, next_run_tags, cur=cur)
             if update_db_response.response_code != 200:
                 return update_db_response
+            mutated_run_keys.extend([run["run_number"], run["run_id"]])
             return DBResponse(response_code=200,
                               body={"tags": next_run_tags})
 
-        return await self._async_table.run_in_transaction_with_serializable_isolation_level(_in_tx_mutation_logic)
+        response = await self._async_table.run_in_transaction_with_serializable_isolation_level(_in_tx_mutation_logic)
+        if response.response_code == 200 and mutated_run_keys:
+            # Invalidate only once the new tags are committed, so that concurrent reads can not cache the old ones again.
+            self._async_table.db.invalidate_run_tags(flow_name, run_number, *mutated_run_keys)
+        return response
 
     @format_response
     @handle_exceptions
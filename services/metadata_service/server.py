@@ -1,5 +1,6 @@
 import asyncio
 import os
+import signal
 
 from aiohttp import web
 
@@ -18,6 +19,11 @@ from services.utils import DBConfiguration
 PATH_PREFIX = os.environ.get("PATH_PREFIX", "")
 
 
+async def flush_heartbeats(app):
+    "Write the buffered heartbeats before the service stops, so that live runs and tasks are not seen as failed"
+    await AsyncPostgresDB.get_instance().heartbeat_buffer.flush()
+
+
 def app(loop=None, db_conf: DBConfiguration = None, middlewares=None, path_prefix=""):
 
     loop = loop or asyncio.get_event_loop()
@@ -33,6 +39,7 @@ def app(loop=None, db_conf: DBConfiguration = None, middlewares=None, path_prefi
     MetadataApi(app)
     ArtificatsApi(app)
     AuthApi(app)
+    _app.on_shutdown.append(flush_heartbeats)
 
     if path_prefix:
         _app.add_subapp(path_prefix, app)
@@ -53,10 +60,15 @@ def main():
 
     srv = loop.run_until_complete(f)
     print("serving on", srv.sockets[0].getsockname())
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, loop.stop)
     try:
         loop.run_forever()
     except KeyboardInterrupt:
         pass
+    finally:
+        # Runs the shutdown handlers of the app
+        loop.run_until_complete(handler.cleanup())
 
 
 if __name__ == "__main__":
@@ -83,6 +83,17 @@ async def test_artifact_post(cli, db):
         expected_body={"artifacts_created": 1}
     )
 
+    # Posting a mix of existing and new artifacts should only create the new ones
+    _second_artifact_second_attempt = dict(_second_artifact)
+    _second_artifact_second_attempt["attempt_id"] = 1
+    await assert_api_post_response(
+        cli,
+        path="/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}/artifact".format(**_task),
+        payload=[_first_artifact_second_attempt, _second_artifact_second_attempt, _second_artifact_second_attempt],
+        status=200,
+        expected_body={"artifacts_created": 1}
+    )
+
     # Posting on a non-existent flow_id should result in error
     await assert_api_post_response(
         cli,
@@ -120,6 +131,61 @@ async def test_artifact_post(cli, db):
     )
 
 
+async def test_bulk_add_artifacts(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+
+    def _artifact_values(artifact):
+        return {
+            "flow_id": _task["flow_id"],
+            "run_number": _task["run_number"],
+            "run_id": None,
+            "step_name": _task["step_name"],
+            "task_id": _task["task_id"],
+            "task_name": None,
+            **artifact
+        }
+
+    _response = await db.artifact_table_postgres.bulk_add_artifacts([_artifact_values(ARTIFACT_A)])
+    assert _response.response_code == 200
+    assert len(_response.body) == 1
+    compare_partial(_response.body[0], ARTIFACT_A)
+
+    # The response body is aligned with the input, with None for records that were skipped due to conflicts.
+    _response = await db.artifact_table_postgres.bulk_add_artifacts(
+        [_artifact_values(ARTIFACT_B), _artifact_values(ARTIFACT_A), _artifact_values(ARTIFACT_B)])
+    assert _response.response_code == 200
+    assert len(_response.body) == 3
+    compare_partial(_response.body[0], ARTIFACT_B)
+    assert _response.body[1] is None
+    assert _response.body[2] is None
+
+
+async def test_stream_artifacts(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+    for index in range(5):
+        await add_artifact(db, flow_id=_task["flow_id"], run_number=_task["run_number"], step_name=_task["step_name"],
+                           task_id=_task["task_id"], artifact={**ARTIFACT_A, "name": "artifact-{}".format(index)})
+
+    table = db.artifact_table_postgres
+    select_sql = "SELECT * FROM {} WHERE flow_id = %s ORDER BY name".format(table.table_name)
+    _response, _ = await table.execute_sql(select_sql=select_sql, values=[_flow["flow_id"]])
+    assert len(_response.body) == 5
+
+    chunks = [chunk async for chunk in table.stream_sql(select_sql=select_sql, values=[_flow["flow_id"]], chunk_size=2)]
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row for chunk in chunks for row in chunk] == _response.body
+
+    # unserialized rows are accessible by column name
+    chunks = [chunk async for chunk in table.stream_sql(select_sql=select_sql, values=[_flow["flow_id"]], serialize=False)]
+    assert [row["name"] for row in chunks[0]] == [artifact["name"] for artifact in _response.body]
+
+
 async def test_run_artifacts_get(cli, db):
     # create a flow, run, step and task for the test
     _flow = (await add_flow(db, "TestFlow", "test_user-1", ["a_tag", "b_tag"], ["runtime:test"])).body
@@ -100,6 +100,46 @@ async def test_metadata_post(cli, db):
     )
 
 
+async def test_metadata_post_with_invalid_item(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+
+    # An item violating the table constraints should not prevent the rest from being created.
+    _invalid_metadata = dict(METADATA_B)
+    _invalid_metadata["value"] = None
+    await assert_api_post_response(
+        cli,
+        path="/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}/metadata".format(**_task),
+        payload=[METADATA_A, _invalid_metadata],
+        status=200,
+        expected_body={"metadata_created": 1}
+    )
+
+    _data = (await db.metadata_table_postgres.get_metadata(_task["flow_id"], _task["run_number"], _task["step_name"], _task["task_id"])).body
+    assert len(_data) == 1
+    compare_partial(_data[0], METADATA_A)
+
+
+async def test_metadata_post_caches_id_resolution(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+
+    _path = "/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}/metadata".format(**_task)
+    await assert_api_post_response(cli, path=_path, payload=[METADATA_A], status=200,
+                                   expected_body={"metadata_created": 1})
+    _run_hits, _task_hits = db.run_ids_cache.hits, db.task_ids_cache.hits
+
+    # Subsequent writes for the same task should resolve ids from the cache
+    await assert_api_post_response(cli, path=_path, payload=[METADATA_B], status=200,
+                                   expected_body={"metadata_created": 1})
+    assert db.run_ids_cache.hits == _run_hits + 1
+    assert db.task_ids_cache.hits == _task_hits + 1
+
+
 async def test_run_metadata_get(cli, db):
     # create a flow, run, step and task for the test
     _flow = (await add_flow(db, "TestFlow", "test_user-1", ["a_tag", "b_tag"], ["runtime:test"])).body
@@ -8,10 +8,12 @@ import time
 from .utils import (
     cli, db,
     assert_api_get_response, assert_api_post_response, compare_partial,
-    add_flow, add_run, assert_api_patch_response
+    add_flow, add_run, add_step, assert_api_patch_response
 )
 import pytest
 
+from services.data.tagging_utils import get_run_tags
+
 pytestmark = [pytest.mark.integration_tests]
 
 
@@ -218,6 +220,52 @@ async def test_run_mutate_user_tags(cli, db):
     await assert_tags_in_db(["sprite", "pepsi"])
     await assert_tags_not_in_db(["coca-cola"])
 
+    # tags are passed to the database as parameters, so quotes and backslashes are stored as they are
+    await assert_api_patch_response(cli, '/flows/{flow_id}/runs/{run_number}/tag/mutate'.format(**_run),
+                                    payload={"tags_to_add": ["it's", "back\\slash", "100%s"]}, status=200)
+    await assert_tags_in_db(["it's", "back\\slash", "100%s"])
+
+
+async def test_run_mutate_user_tags_applies_to_children(cli, db):
+    _flow = (await add_flow(db, "TestFlow", "test_user-1", ["a_tag", "b_tag"], ["runtime:test"])).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"], tags=["run_tag"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"], step_name="start")).body
+    _path = "/flows/{flow_id}/runs/{run_number}/steps/{step_name}".format(**_step)
+
+    async def _step_tags():
+        response = await cli.get(_path)
+        assert response.status == 200
+        return sorted(json.loads(await response.text())["tags"])
+
+    assert await _step_tags() == ["run_tag"]
+
+    # Mutating run tags invalidates the cached run tags right away
+    await assert_api_patch_response(cli, '/flows/{flow_id}/runs/{run_number}/tag/mutate'.format(**_run),
+                                    payload={"tags_to_add": ["new_tag"]}, status=200)
+    assert await _step_tags() == ["new_tag", "run_tag"]
+
+
+async def test_run_mutate_user_tags_invalidates_after_commit(cli, db):
+    _flow = (await add_flow(db, "TestFlow", "test_user-1", ["a_tag", "b_tag"], ["runtime:test"])).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"], tags=["run_tag"])).body
+    run_table = db.run_table_postgres
+    update_run_tags = run_table.update_run_tags
+
+    async def _update_run_tags_with_concurrent_read(*args, **kwargs):
+        result = await update_run_tags(*args, **kwargs)
+        # a concurrent read before the commit sees, and caches, the old tags
+        assert (await get_run_tags(_run["flow_id"], _run["run_number"], run_table)).body["tags"] == ["run_tag"]
+        return result
+    run_table.update_run_tags = _update_run_tags_with_concurrent_read
+    try:
+        await assert_api_patch_response(cli, '/flows/{flow_id}/runs/{run_number}/tag/mutate'.format(**_run),
+                                        payload={"tags_to_add": ["new_tag"]}, status=200)
+    finally:
+        del run_table.update_run_tags
+
+    run_tags = (await get_run_tags(_run["flow_id"], _run["run_number"], run_table)).body
+    assert sorted(run_tags["tags"]) == ["new_tag", "run_tag"]
+
 
 async def test_run_mutate_user_tags_concurrency(cli, db):
     # create flow for test
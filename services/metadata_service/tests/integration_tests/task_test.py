@@ -159,6 +159,57 @@ async def test_task_heartbeat_post(cli, db):
     )
 
 
+async def test_task_heartbeat_post_is_buffered(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+    path = "/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}/heartbeat".format(**_task)
+
+    # the first heartbeat is written right away
+    await assert_api_post_response(cli, path=path, status=200)
+    assert len(db.heartbeat_buffer) == 0
+
+    # move heartbeats back in time so that the buffered heartbeats can be observed.
+    for table in (db.task_table_postgres, db.run_table_postgres):
+        await table.update_row(filter_dict={"flow_id": _flow["flow_id"]}, update_dict={"last_heartbeat_ts": 1})
+
+    # later heartbeats are buffered for both the task and the run
+    await assert_api_post_response(cli, path=path, status=200)
+    assert len(db.heartbeat_buffer) == 2
+    _found = (await db.task_table_postgres.get_task(_task["flow_id"], _task["run_number"], _task["step_name"], _task["task_id"])).body
+    assert _found["last_heartbeat_ts"] == 1
+
+    await db.heartbeat_buffer.flush()
+    assert len(db.heartbeat_buffer) == 0
+    _found = (await db.task_table_postgres.get_task(_task["flow_id"], _task["run_number"], _task["step_name"], _task["task_id"])).body
+    assert _found["last_heartbeat_ts"] > 1
+    _found = (await db.run_table_postgres.get_run(_run["flow_id"], _run["run_number"])).body
+    assert _found["last_heartbeat_ts"] > 1
+
+
+async def test_task_heartbeats_are_flushed_on_shutdown(cli, db):
+    _flow = (await add_flow(db)).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"])).body
+    _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name=_step["step_name"])).body
+    path = "/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}/heartbeat".format(**_task)
+
+    await assert_api_post_response(cli, path=path, status=200)
+    for table in (db.task_table_postgres, db.run_table_postgres):
+        await table.update_row(filter_dict={"flow_id": _flow["flow_id"]}, update_dict={"last_heartbeat_ts": 1})
+    await assert_api_post_response(cli, path=path, status=200)
+    assert len(db.heartbeat_buffer) == 2
+
+    # shutting down the app writes the buffered heartbeats
+    await cli.close()
+    assert len(db.heartbeat_buffer) == 0
+    _found = (await db.task_table_postgres.get_task(_task["flow_id"], _task["run_number"], _task["step_name"], _task["task_id"])).body
+    assert _found["last_heartbeat_ts"] > 1
+    _found = (await db.run_table_postgres.get_run(_run["flow_id"], _run["run_number"])).body
+    assert _found["last_heartbeat_ts"] > 1
+
+
 async def test_tasks_get(cli, db):
     # create a flow, run and step for the test
     _flow = (await add_flow(db, "TestFlow", "test_user-1", ["a_tag", "b_tag"], ["runtime:test"])).body
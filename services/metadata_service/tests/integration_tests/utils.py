@@ -14,6 +14,7 @@ from services.metadata_service.api.step import StepApi
 from services.metadata_service.api.task import TaskApi
 from services.metadata_service.api.artifact import ArtificatsApi
 from services.metadata_service.api.metadata import MetadataApi
+from services.metadata_service.server import flush_heartbeats
 
 # Migration imports
 from services.migration_service.api.admin import AdminApi as MigrationAdminApi
@@ -38,6 +39,7 @@ async def init_app(aiohttp_client, queue_ttl=30):
     AuthApi(app)
     ArtificatsApi(app)
     MetadataApi(app)
+    app.on_shutdown.append(flush_heartbeats)
 
     return await aiohttp_client(app)
 
@@ -74,6 +76,11 @@ async def clean_db(db: AsyncPostgresDB):
     )) as cur:
         for table in tables:
             await table.execute_sql(select_sql="DELETE FROM {}".format(table.table_name), cur=cur)
+    db.run_ids_cache.clear()
+    db.task_ids_cache.clear()
+    db.run_tags_cache.clear()
+    await db.heartbeat_buffer.flush()
+    db.heartbeat_buffer.known.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from services.data.db_utils import DBResponse
+from services.data.postgres_async_db import HeartbeatBuffer
+
+pytestmark = [pytest.mark.unit_tests]
+
+KEY_COLUMNS = ("flow_id", "run_number")
+
+
+class MockTable(object):
+    table_name = "runs_v3"
+
+    def __init__(self, response_code=200):
+        self.response_code = response_code
+        self.updates = []
+
+    async def update_heartbeats(self, key_columns, heartbeats):
+        self.updates.append((key_columns, dict(heartbeats)))
+        return DBResponse(response_code=self.response_code, body={})
+
+
+async def test_heartbeat_buffer_only_buffers_known_keys():
+    buffer = HeartbeatBuffer(flush_interval=60)
+    table = MockTable()
+
+    assert not buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+    buffer.mark_known(table, KEY_COLUMNS, ("HelloFlow", 1))
+    assert buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+    assert not buffer.add(table, KEY_COLUMNS, ("HelloFlow", 2), 100)
+    assert len(buffer) == 1
+    await buffer.flush()
+
+
+async def test_heartbeat_buffer_disabled():
+    buffer = HeartbeatBuffer(flush_interval=0)
+    table = MockTable()
+    buffer.mark_known(table, KEY_COLUMNS, ("HelloFlow", 1))
+
+    assert not buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+
+
+async def test_heartbeat_buffer_flushes_latest_heartbeats_once():
+    buffer = HeartbeatBuffer(flush_interval=60)
+    table = MockTable()
+    for run_number in (1, 2):
+        buffer.mark_known(table, KEY_COLUMNS, ("HelloFlow", run_number))
+
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 120)
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 110)
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 2), 100)
+    await buffer.flush()
+
+    assert table.updates == [(KEY_COLUMNS, {("HelloFlow", 1): 120, ("HelloFlow", 2): 100})]
+    assert len(buffer) == 0
+
+
+async def test_heartbeat_buffer_flushes_after_interval():
+    buffer = HeartbeatBuffer(flush_interval=0.05)
+    table = MockTable()
+    buffer.mark_known(table, KEY_COLUMNS, ("HelloFlow", 1))
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+    assert table.updates == []
+
+    await asyncio.sleep(0.2)
+    assert table.updates == [(KEY_COLUMNS, {("HelloFlow", 1): 100})]
+
+
+async def test_heartbeat_buffer_keeps_heartbeats_of_failed_flush():
+    buffer = HeartbeatBuffer(flush_interval=60)
+    table = MockTable(response_code=500)
+    buffer.mark_known(table, KEY_COLUMNS, ("HelloFlow", 1))
+    buffer.add(table, KEY_COLUMNS, ("HelloFlow", 1), 100)
+    await buffer.flush()
+
+    assert len(buffer) == 1
+    table.response_code = 200
+    await buffer.flush()
+    assert table.updates[-1] == (KEY_COLUMNS, {("HelloFlow", 1): 100})
+    assert len(buffer) == 0
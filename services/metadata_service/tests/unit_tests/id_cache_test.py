@@ -0,0 +1,38 @@
+import time
+import pytest
+from services.data.postgres_async_db import IdCache
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def test_id_cache_hits_and_misses():
+    cache = IdCache(max_size=10, ttl_seconds=60)
+
+    assert cache.get(("HelloFlow", "1")) is None
+    cache.put(("HelloFlow", "1"), (1, None))
+    assert cache.get(("HelloFlow", "1")) == (1, None)
+
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_id_cache_evicts_least_recently_used():
+    cache = IdCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # touch 'a' so that 'b' becomes the least recently used entry
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_id_cache_expires_entries():
+    cache = IdCache(max_size=10, ttl_seconds=0)
+    cache.put("a", 1)
+    time.sleep(0.01)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
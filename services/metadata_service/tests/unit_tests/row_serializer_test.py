@@ -0,0 +1,13 @@
+import pytest
+from services.data.db_utils import row_serializer
+from services.data.models import FlowRow
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def test_row_serializer_falls_back_to_row_objects():
+    # FlowRow does not declare its serialized fields
+    serialize_row = row_serializer(FlowRow, ["flow_id", "user_name", "ts_epoch", "tags", "system_tags"])
+    assert serialize_row(("HelloFlow", "test", 1, [], [])) == {
+        "flow_id": "HelloFlow", "user_name": "test", "ts_epoch": 1, "tags": [], "system_tags": []
+    }
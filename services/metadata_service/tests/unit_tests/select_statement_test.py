@@ -0,0 +1,65 @@
+import pytest
+from services.data import postgres_async_db
+from services.data.postgres_async_db import AsyncPostgresTable
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class ExampleTable(AsyncPostgresTable):
+    table_name = "example_v3"
+    keys = ["flow_id", "run_number"]
+    select_columns = keys
+    joins = ["LEFT JOIN other_v3 ON example_v3.flow_id = other_v3.flow_id"]
+    join_columns = ["other_v3.status AS status"]
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    async def execute_sql(self, select_sql, values=[], **kwargs):
+        self.queries.append(select_sql)
+        return None, None
+
+
+async def test_find_records_renders_statement():
+    table = ExampleTable()
+    await table.find_records(conditions=["flow_id = %s"], values=["HelloFlow"], order=["run_number DESC"],
+                             limit=10, offset=20, enable_joins=True)
+    await table.find_records()
+
+    assert [" ".join(sql.split()) for sql in table.queries] == [
+        "SELECT * FROM ( SELECT flow_id,run_number,other_v3.status AS status FROM example_v3 "
+        "LEFT JOIN other_v3 ON example_v3.flow_id = other_v3.flow_id ) T "
+        "WHERE flow_id = %s ORDER BY run_number DESC LIMIT 10 OFFSET 20",
+        "SELECT * FROM ( SELECT flow_id,run_number FROM example_v3 ) T"
+    ]
+
+
+async def test_find_records_caches_statements_by_shape():
+    table = ExampleTable()
+    await table.find_records(conditions=["flow_id = %s"], values=["HelloFlow"], limit=10)
+    await table.find_records(conditions=["flow_id = %s"], values=["OtherFlow"], limit=10, offset=10)
+    await table.find_records(conditions=["flow_id = %s"], values=["HelloFlow"], enable_joins=True)
+
+    assert len(table._select_statement_cache) == 2
+    assert table.queries[0].endswith(" LIMIT 10")
+    assert table.queries[1] == table.queries[0] + " OFFSET 10"
+    assert table.queries[2] != table.queries[0]
+
+
+def test_select_statement_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(postgres_async_db, "SELECT_STATEMENT_CACHE_SIZE", 2)
+    table = ExampleTable()
+    rendered = []
+
+    def _render(sql):
+        def _render_sql():
+            rendered.append(sql)
+            return sql
+        return _render_sql
+
+    for shape in ["a", "b", "a", "c", "a", "b"]:
+        assert table._select_statement((shape,), _render(shape)) == shape
+
+    assert rendered == ["a", "b", "c", "b"]
+    assert list(table._select_statement_cache) == [("a",), ("b",)]
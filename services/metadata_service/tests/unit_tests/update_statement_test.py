@@ -0,0 +1,29 @@
+import pytest
+from services.data.postgres_async_db import AsyncPostgresTable
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class ExampleTable(AsyncPostgresTable):
+    table_name = "example_v3"
+
+
+def test_update_statement_is_parameterized():
+    table = ExampleTable()
+    name, prepared_sql, update_sql = table._update_statement(("flow_id", "last_heartbeat_ts:<="), ("last_heartbeat_ts",))
+
+    assert prepared_sql == "UPDATE example_v3 SET last_heartbeat_ts = $1 " \
+        "WHERE flow_id = $2 and (last_heartbeat_ts IS NULL or last_heartbeat_ts <= $3)"
+    assert update_sql == "UPDATE example_v3 SET last_heartbeat_ts = %s " \
+        "WHERE flow_id = %s and (last_heartbeat_ts IS NULL or last_heartbeat_ts <= %s)"
+    assert name.startswith("update_")
+
+
+def test_update_statements_are_cached_by_shape():
+    table = ExampleTable()
+    statement = table._update_statement(("flow_id", "run_number"), ("tags",))
+
+    assert table._update_statement(("flow_id", "run_number"), ("tags",)) is statement
+    assert table._update_statement(("flow_id", "run_id"), ("tags",))[0] != statement[0]
+    # statements with the same content have the same name on every table object
+    assert ExampleTable()._update_statement(("flow_id", "run_number"), ("tags",))[0] == statement[0]
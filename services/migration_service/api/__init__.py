@@ -10,7 +10,10 @@ version_dict = {
     '20210260056859': '20210260056859',
     '20211202100726': '20211202100726',
     '20220503175500': '20220503175500',
-    '20230118020300': 'latest',
+    '20230118020300': '20230118020300',
+    '20261018120000': '20261018120000',
+    '20261018130000': '20261018130000',
+    '20261018140000': 'latest',
 }
 
 latest = "latest"
@@ -0,0 +1,24 @@
+-- +goose Up
+-- +goose StatementBegin
+
+-- Append-only log of realtime events broadcast by the UI service over websockets.
+-- Shared between all UI service instances so that reconnecting clients can be served
+-- missed events regardless of which instance they reconnect to.
+CREATE TABLE IF NOT EXISTS websocket_events_v3 (
+  id BIGSERIAL PRIMARY KEY,
+  ts_epoch BIGINT NOT NULL DEFAULT (EXTRACT(EPOCH FROM now()) * 1000)::BIGINT,
+  operation VARCHAR(255) NOT NULL,
+  resources JSONB NOT NULL,
+  data JSONB
+);
+
+CREATE INDEX IF NOT EXISTS websocket_events_v3_idx_ts_epoch ON websocket_events_v3 (ts_epoch);
+
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+
+DROP TABLE IF EXISTS websocket_events_v3;
+
+-- +goose StatementEnd
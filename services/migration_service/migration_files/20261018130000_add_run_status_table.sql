@@ -0,0 +1,94 @@
+-- +goose Up
+-- +goose StatementBegin
+
+-- Summary of the end step attempts of a run. Used for deriving the status, finished_at and duration of runs
+-- without scanning the metadata table for every run that is listed.
+CREATE TABLE IF NOT EXISTS run_status_v3 (
+  flow_id VARCHAR(255) NOT NULL,
+  run_number BIGINT NOT NULL,
+  end_attempt_ok_ts BIGINT,
+  end_attempt_ok BOOLEAN,
+  end_attempt_ts BIGINT,
+  PRIMARY KEY(flow_id, run_number)
+);
+
+-- Keep the summary up to date as 'attempt' and 'attempt_ok' metadata for the end step is inserted.
+-- Failures are ignored so that the summary can never block metadata from being recorded.
+CREATE OR REPLACE FUNCTION update_run_status_v3() RETURNS trigger
+  LANGUAGE plpgsql
+  AS $$
+  BEGIN
+    IF NEW.step_name = 'end' AND NEW.field_name = 'attempt_ok' THEN
+      BEGIN
+        INSERT INTO run_status_v3 (flow_id, run_number, end_attempt_ok_ts, end_attempt_ok)
+        VALUES (
+          NEW.flow_id,
+          NEW.run_number,
+          NEW.ts_epoch,
+          (CASE lower(btrim(NEW.value::text, '"'))
+            WHEN 'true' THEN true
+            WHEN 'false' THEN false
+            ELSE NULL
+          END)
+        )
+        ON CONFLICT (flow_id, run_number) DO UPDATE
+        SET
+          end_attempt_ok_ts = EXCLUDED.end_attempt_ok_ts,
+          end_attempt_ok = EXCLUDED.end_attempt_ok
+        WHERE
+          run_status_v3.end_attempt_ok_ts IS NULL OR
+          run_status_v3.end_attempt_ok_ts <= EXCLUDED.end_attempt_ok_ts;
+      EXCEPTION WHEN OTHERS THEN
+        RAISE WARNING 'Failed to update run_status_v3: %', SQLERRM;
+      END;
+    ELSIF NEW.step_name = 'end' AND NEW.field_name = 'attempt' THEN
+      BEGIN
+        INSERT INTO run_status_v3 (flow_id, run_number, end_attempt_ts)
+        VALUES (NEW.flow_id, NEW.run_number, NEW.ts_epoch)
+        ON CONFLICT (flow_id, run_number) DO UPDATE
+        SET end_attempt_ts = GREATEST(run_status_v3.end_attempt_ts, EXCLUDED.end_attempt_ts);
+      EXCEPTION WHEN OTHERS THEN
+        RAISE WARNING 'Failed to update run_status_v3: %', SQLERRM;
+      END;
+    END IF;
+    RETURN NULL;
+  END;
+  $$;
+
+DROP TRIGGER IF EXISTS update_run_status_v3 ON metadata_v3;
+
+CREATE TRIGGER update_run_status_v3
+  AFTER INSERT ON metadata_v3
+  FOR EACH ROW
+  WHEN (NEW.step_name = 'end' AND NEW.field_name IN ('attempt', 'attempt_ok'))
+  EXECUTE PROCEDURE update_run_status_v3();
+
+-- Backfill the summary for existing runs.
+INSERT INTO run_status_v3 (flow_id, run_number, end_attempt_ok_ts, end_attempt_ok, end_attempt_ts)
+SELECT
+  flow_id,
+  run_number,
+  (array_agg(ts_epoch ORDER BY ts_epoch DESC) FILTER (WHERE field_name = 'attempt_ok'))[1],
+  (array_agg(
+    (CASE lower(btrim(value::text, '"'))
+      WHEN 'true' THEN true
+      WHEN 'false' THEN false
+      ELSE NULL
+    END) ORDER BY ts_epoch DESC
+  ) FILTER (WHERE field_name = 'attempt_ok'))[1],
+  max(ts_epoch) FILTER (WHERE field_name = 'attempt')
+FROM metadata_v3
+WHERE step_name = 'end' AND field_name IN ('attempt', 'attempt_ok')
+GROUP BY flow_id, run_number
+ON CONFLICT (flow_id, run_number) DO NOTHING;
+
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+
+DROP TRIGGER IF EXISTS update_run_status_v3 ON metadata_v3;
+DROP FUNCTION IF EXISTS update_run_status_v3();
+DROP TABLE IF EXISTS run_status_v3;
+
+-- +goose StatementEnd
@@ -0,0 +1,155 @@
+-- +goose Up
+-- +goose StatementBegin
+
+-- Summary of task attempts. Used for deriving the timing and status of task attempts
+-- without scanning the metadata and artifact tables for every task that is listed.
+CREATE TABLE IF NOT EXISTS task_attempts_v3 (
+  flow_id VARCHAR(255) NOT NULL,
+  run_number BIGINT NOT NULL,
+  step_name VARCHAR(255) NOT NULL,
+  task_id BIGINT NOT NULL,
+  attempt_id INT NOT NULL,
+  started_at BIGINT,
+  attempt_finished_at BIGINT,
+  attempt_ok BOOLEAN,
+  task_ok_finished_at BIGINT,
+  task_ok_location VARCHAR(255),
+  PRIMARY KEY(flow_id, run_number, step_name, task_id, attempt_id)
+);
+
+-- Keep the summary up to date as 'attempt', 'attempt-done' and 'attempt_ok' metadata is inserted.
+-- Values that can not be parsed are skipped so that the summary never blocks metadata from being recorded.
+CREATE OR REPLACE FUNCTION update_task_attempts_v3_from_metadata() RETURNS trigger
+  LANGUAGE plpgsql
+  AS $$
+  DECLARE
+    _value TEXT := btrim(NEW.value::text, '"');
+    _attempt_id TEXT;
+  BEGIN
+    IF NEW.field_name = 'attempt' AND _value ~ '^\d{1,9}$' THEN
+      INSERT INTO task_attempts_v3 (flow_id, run_number, step_name, task_id, attempt_id, started_at)
+      VALUES (NEW.flow_id, NEW.run_number, NEW.step_name, NEW.task_id, _value::int, NEW.ts_epoch)
+      ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO UPDATE
+      SET started_at = GREATEST(task_attempts_v3.started_at, EXCLUDED.started_at);
+    ELSIF NEW.field_name = 'attempt-done' AND _value ~ '^\d{1,9}$' THEN
+      INSERT INTO task_attempts_v3 (flow_id, run_number, step_name, task_id, attempt_id, attempt_finished_at)
+      VALUES (NEW.flow_id, NEW.run_number, NEW.step_name, NEW.task_id, _value::int, NEW.ts_epoch)
+      ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO UPDATE
+      SET attempt_finished_at = GREATEST(task_attempts_v3.attempt_finished_at, EXCLUDED.attempt_finished_at);
+    ELSIF NEW.field_name = 'attempt_ok' THEN
+      _attempt_id := substring(NEW.tags::text from 'attempt_id:(\d{1,9})');
+      IF _attempt_id IS NOT NULL THEN
+        INSERT INTO task_attempts_v3 (flow_id, run_number, step_name, task_id, attempt_id, attempt_finished_at, attempt_ok)
+        VALUES (
+          NEW.flow_id, NEW.run_number, NEW.step_name, NEW.task_id, _attempt_id::int, NEW.ts_epoch,
+          (CASE lower(_value)
+            WHEN 'true' THEN true
+            WHEN 'false' THEN false
+            ELSE NULL
+          END)
+        )
+        ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO UPDATE
+        SET
+          attempt_finished_at = GREATEST(task_attempts_v3.attempt_finished_at, EXCLUDED.attempt_finished_at),
+          attempt_ok = GREATEST(task_attempts_v3.attempt_ok, EXCLUDED.attempt_ok);
+      END IF;
+    END IF;
+    RETURN NULL;
+  END;
+  $$;
+
+-- Keep the summary up to date as '_task_ok' artifacts are inserted.
+CREATE OR REPLACE FUNCTION update_task_attempts_v3_from_artifact() RETURNS trigger
+  LANGUAGE plpgsql
+  AS $$
+  BEGIN
+    INSERT INTO task_attempts_v3 (flow_id, run_number, step_name, task_id, attempt_id, task_ok_finished_at, task_ok_location)
+    VALUES (NEW.flow_id, NEW.run_number, NEW.step_name, NEW.task_id, NEW.attempt_id, NEW.ts_epoch, NEW.location)
+    ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO UPDATE
+    SET
+      task_ok_finished_at = GREATEST(task_attempts_v3.task_ok_finished_at, EXCLUDED.task_ok_finished_at),
+      task_ok_location = GREATEST(task_attempts_v3.task_ok_location, EXCLUDED.task_ok_location);
+    RETURN NULL;
+  END;
+  $$;
+
+DROP TRIGGER IF EXISTS update_task_attempts_v3 ON metadata_v3;
+
+CREATE TRIGGER update_task_attempts_v3
+  AFTER INSERT ON metadata_v3
+  FOR EACH ROW
+  WHEN (NEW.field_name IN ('attempt', 'attempt-done', 'attempt_ok'))
+  EXECUTE PROCEDURE update_task_attempts_v3_from_metadata();
+
+DROP TRIGGER IF EXISTS update_task_attempts_v3 ON artifact_v3;
+
+CREATE TRIGGER update_task_attempts_v3
+  AFTER INSERT ON artifact_v3
+  FOR EACH ROW
+  WHEN (NEW.name = '_task_ok')
+  EXECUTE PROCEDURE update_task_attempts_v3_from_artifact();
+
+-- Backfill the summary for existing tasks.
+INSERT INTO task_attempts_v3 (
+  flow_id, run_number, step_name, task_id, attempt_id,
+  started_at, attempt_finished_at, attempt_ok, task_ok_finished_at, task_ok_location
+)
+SELECT
+  flow_id, run_number, step_name, task_id, attempt_id,
+  max(started_at), max(attempt_finished_at), bool_or(attempt_ok), max(task_ok_finished_at), max(task_ok_location)
+FROM (
+  SELECT
+    flow_id, run_number, step_name, task_id,
+    btrim(value::text, '"')::int as attempt_id,
+    (CASE WHEN field_name = 'attempt' THEN ts_epoch END) as started_at,
+    (CASE WHEN field_name = 'attempt-done' THEN ts_epoch END) as attempt_finished_at,
+    NULL::boolean as attempt_ok,
+    NULL::bigint as task_ok_finished_at,
+    NULL::text as task_ok_location
+  FROM metadata_v3
+  WHERE
+    field_name IN ('attempt', 'attempt-done') AND
+    btrim(value::text, '"') ~ '^\d{1,9}$'
+  UNION ALL
+  SELECT
+    flow_id, run_number, step_name, task_id,
+    substring(tags::text from 'attempt_id:(\d{1,9})')::int as attempt_id,
+    NULL as started_at,
+    ts_epoch as attempt_finished_at,
+    (CASE lower(btrim(value::text, '"'))
+      WHEN 'true' THEN true
+      WHEN 'false' THEN false
+      ELSE NULL
+    END) as attempt_ok,
+    NULL as task_ok_finished_at,
+    NULL as task_ok_location
+  FROM metadata_v3
+  WHERE
+    field_name = 'attempt_ok' AND
+    substring(tags::text from 'attempt_id:(\d{1,9})') IS NOT NULL
+  UNION ALL
+  SELECT
+    flow_id, run_number, step_name, task_id, attempt_id,
+    NULL as started_at,
+    NULL as attempt_finished_at,
+    NULL as attempt_ok,
+    ts_epoch as task_ok_finished_at,
+    location as task_ok_location
+  FROM artifact_v3
+  WHERE name = '_task_ok'
+) a
+GROUP BY flow_id, run_number, step_name, task_id, attempt_id
+ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO NOTHING;
+
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+
+DROP TRIGGER IF EXISTS update_task_attempts_v3 ON metadata_v3;
+DROP TRIGGER IF EXISTS update_task_attempts_v3 ON artifact_v3;
+DROP FUNCTION IF EXISTS update_task_attempts_v3_from_metadata();
+DROP FUNCTION IF EXISTS update_task_attempts_v3_from_artifact();
+DROP TABLE IF EXISTS task_attempts_v3;
+
+-- +goose StatementEnd
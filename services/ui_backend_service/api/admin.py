@@ -23,8 +23,9 @@ class AdminApi(object):
     such as health checks, version info and custom navigation links.
     """
 
-    def __init__(self, app, cache_store):
+    def __init__(self, app, cache_store, listen_notify=None):
         self.cache_store = cache_store
+        self.listen_notify = listen_notify
 
         app.router.add_route("GET", "/ping", self.ping)
         app.router.add_route("GET", "/version", self.version)
@@ -176,7 +177,7 @@ class AdminApi(object):
     async def status(self, request):
         """
         ---
-        description: Display system status information, such as cache
+        description: Display system status information, such as cache and realtime notifications
         tags:
         - Admin
         produces:
@@ -249,6 +250,7 @@ class AdminApi(object):
                 "max_actions": store.cache._max_actions,
                 "max_size": store.cache._max_size,
                 "current_size": current_size,
+                "hot_tier": store.cache.hot_tier.stats() if store.cache.hot_tier else None,
                 "ping": ping,
                 "check_action": check,
                 "proc": {
@@ -258,8 +260,11 @@ class AdminApi(object):
                 "workers": worker_list
             }
 
+        notify_status = self.listen_notify.metrics.stats() if self.listen_notify else None
+
         return web_response(status=200, body={
-            "cache": cache_status
+            "cache": cache_status,
+            "notify": notify_status
         })
 
 
@@ -39,6 +39,7 @@ class ArtificatsApi(object):
           - $ref: '#/definitions/Params/Path/step_name'
           - $ref: '#/definitions/Params/Path/task_id'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -106,6 +107,7 @@ class ArtificatsApi(object):
           - $ref: '#/definitions/Params/Path/run_number'
           - $ref: '#/definitions/Params/Path/step_name'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -168,6 +170,7 @@ class ArtificatsApi(object):
           - $ref: '#/definitions/Params/Path/flow_id'
           - $ref: '#/definitions/Params/Path/run_number'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -48,6 +48,7 @@ class FlowApi(object):
         - Flow
         parameters:
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -1,10 +1,13 @@
 import asyncio
 import datetime
-from typing import Dict, Callable, Optional
+import heapq
+import os
+from typing import Dict, List
 
 from pyee import AsyncIOEventEmitter
 
-from .utils import postprocess_chain, apply_run_tags_postprocess
+from .utils import apply_run_tags_postprocess
+from services.data.db_utils import DBResponse
 from ..data.db.tables.base import HEARTBEAT_THRESHOLD
 from ..data.refiner import TaskRefiner
 from .notify import resource_list
@@ -12,6 +15,8 @@ from .notify import resource_list
 # interval for how often to check heartbeats. Use the heartbeat_threshold from the database queries with a margin (10sec),
 # not to check heartbeats too often and miss failures as a result.
 HEARTBEAT_INTERVAL = HEARTBEAT_THRESHOLD + 10
+# maximum number of expired objects that are loaded with a single query.
+HEARTBEAT_BATCH_SIZE = int(os.environ.get("HEARTBEAT_BATCH_SIZE", 500))
 
 
 class HeartbeatMonitor(object):
@@ -19,6 +24,10 @@ class HeartbeatMonitor(object):
     Generic class for starting an async watcher task that periodically checks timestamps for a list of objects,
     and performs load_and_broadcast() for expired ones.
 
+    Heartbeats are kept in a heap ordered by expiry, so that a check only visits the expired objects.
+    Updating or removing a heartbeat leaves its previous heap entry in place, and entries that no longer
+    match the watched heartbeat are skipped when they are popped.
+
     Listens on event_emitter for 'event_name' and calls heartbeat_handler() for processing events.
 
     Parameters
@@ -35,6 +44,7 @@ class HeartbeatMonitor(object):
 
     def __init__(self, event_name: str, db, event_emitter=None, cache=None):
         self.watched = {}
+        self._expiry_heap = []
         # Handle HB Events
         self.event_emitter = event_emitter or AsyncIOEventEmitter()
         event_emitter.on(event_name, self.heartbeat_handler)
@@ -53,14 +63,35 @@ class HeartbeatMonitor(object):
         "Adds object to heartbeat monitoring"
         raise NotImplementedError
 
+    def watch(self, key, heartbeat_ts: int):
+        "Sets the heartbeat of a monitored object"
+        if self.watched.get(key) == heartbeat_ts:
+            return
+        self.watched[key] = heartbeat_ts
+        heapq.heappush(self._expiry_heap, (heartbeat_ts, key))
+        if len(self._expiry_heap) > 2 * len(self.watched) + 1024:
+            # Drop stale entries once they outnumber the watched objects.
+            self._expiry_heap = [(hb, key) for key, hb in self.watched.items()]
+            heapq.heapify(self._expiry_heap)
+
     def remove_from_watch(self, key):
         "Removes object from heartbeat monitoring"
         self.watched.pop(key, None)
 
-    async def load_and_broadcast(self, key):
+    def pop_expired(self, time_now: int) -> List:
+        "Removes the objects with expired heartbeats from monitoring, and returns their keys"
+        expired = []
+        while self._expiry_heap and time_now - self._expiry_heap[0][0] > HEARTBEAT_INTERVAL:
+            hb, key = heapq.heappop(self._expiry_heap)
+            if self.watched.get(key) == hb:
+                del self.watched[key]
+                expired.append(key)
+        return expired
+
+    async def load_and_broadcast(self, keys: List):
         """
-        Triggered when a heartbeat for a key has expired.
-        Loads object based on key from watchlist, and broadcasts content to listeners.
+        Triggered when heartbeats for keys have expired.
+        Loads objects based on keys from watchlist with a single query, and broadcasts content to listeners.
         """
         raise NotImplementedError
 
@@ -70,11 +101,9 @@ class HeartbeatMonitor(object):
         and triggering handlers in case the heartbeat is too old.
         """
         while True:
-            time_now = heartbeat_time_now()
-            for key, hb in list(self.watched.items()):
-                if time_now - hb > HEARTBEAT_INTERVAL:
-                    self.loop.create_task(self.load_and_broadcast(key))
-                    self.remove_from_watch(key)
+            expired = self.pop_expired(heartbeat_time_now())
+            for i in range(0, len(expired), HEARTBEAT_BATCH_SIZE):
+                self.loop.create_task(self.load_and_broadcast(expired[i:i + HEARTBEAT_BATCH_SIZE]))
 
             await asyncio.sleep(HEARTBEAT_INTERVAL)
 
@@ -124,25 +153,25 @@ class RunHeartbeatMonitor(HeartbeatMonitor):
         if "last_heartbeat_ts" in run and "run_number" in run:
             run_number = run["run_number"]
             heartbeat_ts = run["last_heartbeat_ts"] or heartbeat_time_now()
-            self.watched[run_number] = heartbeat_ts
-
-    async def get_run(self, run_key: str) -> Optional[Dict]:
-        "Fetch run with a given id or number from the DB"
-        # NOTE: task being broadcast should contain the same fields as the GET request returns so UI can easily infer changes.
-        result = await self._run_table.get_expanded_run(run_key)
-        return result.body if result.response_code == 200 else None
-
-    async def load_and_broadcast(self, key):
-        run = await self.get_run(key)
-        resources = resource_list(self._run_table.table_name, run) if run else None
-        if not resources:
-            return
-        if run['status'] == "running":
-            await self.add_to_watch(run)
-        if run['status'] == "failed":
-            # The purpose of the monitor is to emit otherwise unnoticed failed attempts.
-            # Do not unnecessarily broadcast other statuses that already get propagated by Notify.
-            self.event_emitter.emit('notify', 'UPDATE', resources, run)
+            self.watch(run_number, heartbeat_ts)
+
+    async def get_runs(self, run_numbers: List[int]) -> List[Dict]:
+        "Fetch runs with the given numbers from the DB"
+        # NOTE: run being broadcast should contain the same fields as the GET request returns so UI can easily infer changes.
+        result = await self._run_table.get_expanded_runs(run_numbers)
+        return result.body if result.response_code == 200 else []
+
+    async def load_and_broadcast(self, keys: List[int]):
+        for run in await self.get_runs(keys):
+            resources = resource_list(self._run_table.table_name, run)
+            if not resources:
+                continue
+            if run['status'] == "running":
+                await self.add_to_watch(run)
+            if run['status'] == "failed":
+                # The purpose of the monitor is to emit otherwise unnoticed failed attempts.
+                # Do not unnecessarily broadcast other statuses that already get propagated by Notify.
+                self.event_emitter.emit('notify', 'UPDATE', resources, run)
 
 
 class TaskHeartbeatMonitor(HeartbeatMonitor):
@@ -155,7 +184,7 @@ class TaskHeartbeatMonitor(HeartbeatMonitor):
     Usage
     -----
     Responds to event_emitter emissions with messages:
-      "task-heartbeat", "update", data -> updates heartbeat timestamp that is found in database
+      "task-heartbeat", "update", data -> updates heartbeat timestamp that is passed as part of data.
       "task-heartbeat", "complete" data -> removes task from heartbeat checks
     """
 
@@ -191,51 +220,54 @@ class TaskHeartbeatMonitor(HeartbeatMonitor):
             self.remove_from_watch(key)
 
     async def add_to_watch(self, data):
-        # TODO: Optimize db trigger so we do not have to fetch a record in order to add it to the
-        # heartbeat monitor
-        task = await self._get_task(
-            data["flow_id"],
-            data["run_number"],
-            data["step_name"],
-            data["task_id"]
-        )
-
-        key = self.generate_dict_key(task)
-        if key and "last_heartbeat_ts" in task:
-            heartbeat_ts = task["last_heartbeat_ts"] or heartbeat_time_now()
-            self.watched[key] = heartbeat_ts
-
-    async def _get_task(self, flow_id: str, run_key: str, step_name: str, task_key: str, attempt_id: int = None, postprocess=None) -> Optional[Dict]:
+        # Task table events are emitted when a task is inserted, so the event is for the first attempt.
+        # Later attempts are watched again by load_and_broadcast with the attempt_id of the loaded task.
+        key = self.generate_dict_key({"attempt_id": 0, **data})
+        if key and "last_heartbeat_ts" in data:
+            heartbeat_ts = data["last_heartbeat_ts"] or heartbeat_time_now()
+            self.watch(key, heartbeat_ts)
+
+    async def _get_tasks(self, keys: List[str], postprocess=None) -> List[Dict]:
         """
-        Fetches task from DB. Specifying attempt_id will fetch the specific attempt.
-        Otherwise the newest attempt is returned.
+        Fetches the task attempts of the given keys from DB with a single query.
 
         Returns
         -------
-        Dict or None
-            either the task Dict object is returned, or if no task is found, None is returned.
+        List[Dict]
+            the task attempts that were found.
         """
         # NOTE: task being broadcast should contain the same fields as the GET request returns so UI can easily infer changes.
-        result = await self._task_table.get_task_attempt(flow_id, run_key, step_name, task_key,
-                                                         attempt_id=attempt_id,
-                                                         postprocess=postprocess_chain(
-                                                             [apply_run_tags_postprocess(flow_id, run_key, self._run_table), postprocess]))
-
-        return result.body if result.response_code == 200 else None
-
-    async def load_and_broadcast(self, key):
-        flow_id, run_number, step_name, task_id, attempt_id = self.decode_key_ids(key)
-        task = await self._get_task(flow_id, run_number, step_name, task_id, attempt_id, postprocess=self.refiner.postprocess)
-        resources = resource_list(self._task_table.table_name, task) if task else None
-        if not resources:
-            return
-
-        if task['status'] == "running":
-            await self.add_to_watch(task)
-        if task['status'] == "failed":
-            # The purpose of the monitor is to emit otherwise unnoticed failed attempts.
-            # Do not unnecessarily broadcast other statuses that already get propagated by Notify.
-            self.event_emitter.emit('notify', 'UPDATE', resources, task)
+        result = await self._task_table.get_task_attempts([self.decode_key_ids(key) for key in keys])
+        if result.response_code != 200:
+            return []
+
+        # Run tags are applied per run, and refined for all tasks at once.
+        tasks_by_run = {}
+        for task in result.body:
+            tasks_by_run.setdefault((task["flow_id"], task["run_number"]), []).append(task)
+        tasks = []
+        for (flow_id, run_number), run_tasks in tasks_by_run.items():
+            response = await apply_run_tags_postprocess(flow_id, run_number, self._run_table)(
+                DBResponse(response_code=200, body=run_tasks))
+            if response.response_code == 200:
+                tasks.extend(response.body)
+        if postprocess and tasks:
+            response = await postprocess(DBResponse(response_code=200, body=tasks))
+            tasks = response.body if response.response_code == 200 else tasks
+        return tasks
+
+    async def load_and_broadcast(self, keys: List[str]):
+        for task in await self._get_tasks(keys, postprocess=self.refiner.postprocess if self.refiner else None):
+            resources = resource_list(self._task_table.table_name, task)
+            if not resources:
+                continue
+
+            if task['status'] == "running":
+                await self.add_to_watch(task)
+            if task['status'] == "failed":
+                # The purpose of the monitor is to emit otherwise unnoticed failed attempts.
+                # Do not unnecessarily broadcast other statuses that already get propagated by Notify.
+                self.event_emitter.emit('notify', 'UPDATE', resources, task)
 
     def generate_dict_key(self, data):
         "Creates an unique key for the 'watched' dictionary for storing the heartbeat of a specific task"
@@ -245,8 +277,8 @@ class TaskHeartbeatMonitor(HeartbeatMonitor):
             return None
 
     def decode_key_ids(self, key):
-        flow, run, step, task, attempt = key.split("/")
-        return flow, run, step, task, attempt
+        flow, run, step, task, attempt = key.rsplit("/", 4)
+        return flow, int(run), step, int(task), int(attempt)
 
 
 def heartbeat_time_now():
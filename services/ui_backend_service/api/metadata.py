@@ -31,6 +31,7 @@ class MetadataApi(object):
           - $ref: '#/definitions/Params/Path/step_name'
           - $ref: '#/definitions/Params/Path/task_id'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -91,6 +92,7 @@ class MetadataApi(object):
           - $ref: '#/definitions/Params/Path/flow_id'
           - $ref: '#/definitions/Params/Path/run_number'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
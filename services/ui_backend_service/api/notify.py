@@ -1,6 +1,8 @@
+import os
 import json
+import time
 import asyncio
-from typing import Dict
+from typing import Dict, List
 from services.utils import logging
 from services.data.postgres_async_db import (
     FLOW_TABLE_NAME, RUN_TABLE_NAME,
@@ -9,6 +11,53 @@ from services.data.postgres_async_db import (
 )
 from pyee import AsyncIOEventEmitter
 
+# Interval for the 'NOTIFY listen' keepalive that detects broken listener connections.
+NOTIFY_KEEPALIVE_INTERVAL_SECONDS = float(os.environ.get("NOTIFY_KEEPALIVE_INTERVAL_SECONDS", 5))
+# Maximum number of queued notifications that are drained and dispatched as a single batch.
+NOTIFY_MAX_BATCH_SIZE = int(os.environ.get("NOTIFY_MAX_BATCH_SIZE", 100))
+
+
+class NotifyMetrics(object):
+    """
+    Counters for the notification delivery path of ListenNotify.
+
+    Tracks the depth of the connection notification queue when a batch is drained,
+    and the latency from receiving an event until its handler has finished dispatching it.
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.last_dispatch_latency = 0.0
+        self.max_dispatch_latency = 0.0
+        self.total_dispatch_latency = 0.0
+
+    def record_batch(self, queue_depth: int):
+        self.batches += 1
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def record_dispatch(self, latency: float):
+        self.events += 1
+        self.last_dispatch_latency = latency
+        self.max_dispatch_latency = max(self.max_dispatch_latency, latency)
+        self.total_dispatch_latency += latency
+
+    def stats(self) -> Dict:
+        "Metrics as a dictionary, latencies are in milliseconds."
+        avg = self.total_dispatch_latency / self.events if self.events else 0.0
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "last_dispatch_latency_ms": round(self.last_dispatch_latency * 1000, 3),
+            "avg_dispatch_latency_ms": round(avg * 1000, 3),
+            "max_dispatch_latency_ms": round(self.max_dispatch_latency * 1000, 3),
+        }
+
 
 class ListenNotify(object):
     """
@@ -24,12 +73,21 @@ class ListenNotify(object):
         initialized instance of a postgresDB adapter
     event_emitter : AsyncIOEventEmitter
         Any event emitter class that implements .emit('notify', *args)
+    keepalive_interval : float
+        Seconds between 'NOTIFY listen' keepalive messages on the listener connection.
+    max_batch_size : int
+        Maximum number of queued notifications to dispatch in one batch.
     """
 
-    def __init__(self, app, db, event_emitter=None):
+    def __init__(self, app, db, event_emitter=None,
+                 keepalive_interval=NOTIFY_KEEPALIVE_INTERVAL_SECONDS,
+                 max_batch_size=NOTIFY_MAX_BATCH_SIZE):
         self.event_emitter = event_emitter or AsyncIOEventEmitter()
         self.db = db
         self.logger = logging.getLogger("ListenNotify")
+        self.keepalive_interval = keepalive_interval
+        self.max_batch_size = max(1, max_batch_size)
+        self.metrics = NotifyMetrics()
 
         self.loop = asyncio.get_event_loop()
         self.loop.create_task(self._init(self.db.pool))
@@ -39,10 +97,21 @@ class ListenNotify(object):
             try:
                 async with pool.acquire() as conn:
                     self.logger.info("Connection acquired")
-                    await asyncio.gather(
-                        self.listen(conn),
-                        self.ping(conn)
-                    )
+                    # If either the listener or the keepalive fails the connection is
+                    # considered broken, so tear down both and acquire a new connection.
+                    tasks = [
+                        self.loop.create_task(self.listen(conn)),
+                        self.loop.create_task(self.ping(conn))
+                    ]
+                    try:
+                        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                        await asyncio.gather(*tasks, return_exceptions=True)
+                    for task in done:
+                        if not task.cancelled() and task.exception() is not None:
+                            raise task.exception()
             except Exception as ex:
                 self.logger.warning(str(ex))
             finally:
@@ -52,23 +121,27 @@ class ListenNotify(object):
         async with conn.cursor() as cur:
             await cur.execute("LISTEN notify")
             while not cur.closed:
-                try:
-                    msg = conn.notifies.get_nowait()
-                    self.loop.create_task(self.handle_trigger_msg(msg))
-                except asyncio.QueueEmpty:
-                    await asyncio.sleep(0.1)
-                except Exception:
-                    self.logger.exception("Exception when listening to notify.")
+                # Block until a notification is delivered, then drain whatever
+                # else is already queued so that bursts are dispatched as a batch.
+                # A closed connection raises here, which triggers a reconnect.
+                batch = [await conn.notifies.get()]
+                received_at = time.monotonic()
+                self.metrics.record_batch(conn.notifies.qsize() + 1)
+                while len(batch) < self.max_batch_size and not conn.notifies.empty():
+                    batch.append(conn.notifies.get_nowait())
+                await self.handle_trigger_batch(batch, received_at)
 
     async def ping(self, conn):
         async with conn.cursor() as cur:
             while not cur.closed:
-                try:
-                    await cur.execute("NOTIFY listen")
-                except Exception:
-                    self.logger.debug("Exception NOTIFY ping.")
-                finally:
-                    await asyncio.sleep(1)
+                await asyncio.sleep(self.keepalive_interval)
+                await cur.execute("NOTIFY listen")
+
+    async def handle_trigger_batch(self, batch: List, received_at: float):
+        "Dispatch a batch of messages received from 'LISTEN notify' in the order they arrived"
+        for msg in batch:
+            await self.handle_trigger_msg(msg)
+            self.metrics.record_dispatch(time.monotonic() - received_at)
 
     async def handle_trigger_msg(self, msg: str):
         "Handler for the messages received from 'LISTEN notify'"
@@ -68,6 +68,7 @@ class RunApi(object):
         - Run
         parameters:
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -140,6 +141,7 @@ class RunApi(object):
         parameters:
           - $ref: '#/definitions/Params/Path/flow_id'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
@@ -26,6 +26,7 @@ class StepApi(object):
           - $ref: '#/definitions/Params/Path/flow_id'
           - $ref: '#/definitions/Params/Path/run_number'
           - $ref: '#/definitions/Params/Builtin/_page'
+          - $ref: '#/definitions/Params/Builtin/_cursor'
           - $ref: '#/definitions/Params/Builtin/_limit'
           - $ref: '#/definitions/Params/Builtin/_order'
           - $ref: '#/definitions/Params/Builtin/_tags'
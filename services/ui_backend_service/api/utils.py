@@ -1,8 +1,9 @@
+import base64
+import binascii
 import json
 import os
 import re
 import time
-from collections import deque
 from typing import Callable, Dict, List, Tuple, Optional
 from urllib.parse import parse_qsl, urlsplit
 
@@ -17,6 +18,11 @@ from services.utils import logging
 
 logger = logging.getLogger("Utils")
 
+# Maximum number of realtime events kept in memory for replaying to reconnecting clients
+WS_QUEUE_MAX_SIZE = int(os.environ.get("WS_QUEUE_MAX_SIZE", 10000))
+# Minimum interval between deleting expired realtime events from the database
+WS_QUEUE_RETENTION_INTERVAL_SECONDS = int(os.environ.get("WS_QUEUE_RETENTION_INTERVAL_SECONDS", 60))
+
 
 # only look for config.json files in ui_backend_service root
 JSON_CONFIG_ROOT = os.environ["JSON_CONFIG_ROOT"] if "JSON_CONFIG_ROOT" in os.environ else os.path.normpath(
@@ -84,7 +90,8 @@ def format_response(request: web.BaseRequest, db_response: DBResponse) -> Tuple[
     return db_response.response_code, response_object
 
 
-def format_response_list(request: web.BaseRequest, db_response: DBResponse, pagination: DBPagination, page: int, page_count: int = None) -> Tuple[int, Dict]:
+def format_response_list(request: web.BaseRequest, db_response: DBResponse, pagination: DBPagination, page: int, page_count: int = None,
+                         keyset: bool = False, cursor: str = None) -> Tuple[int, Dict]:
     query = {}
     for key in request.query:
         query[key] = request.query.get(key)
@@ -96,16 +103,27 @@ def format_response_list(request: web.BaseRequest, db_response: DBResponse, pagi
     prevPage = max(page - 1, 1)
 
     baseurl = format_baseurl(request)
-    response_object = {
-        "data": db_response.body,
-        "status": db_response.response_code,
-        "links": {
+    if keyset:
+        # Keyset pagination can only move forward, starting from the first page.
+        links = {
+            "self": "{}{}".format(baseurl, format_qs(query)),
+            "first": "{}{}".format(baseurl, format_qs(query, {"_cursor": ""})),
+            "prev": None,
+            "next": "{}{}".format(baseurl, format_qs(query, {"_cursor": cursor})) if cursor else None,
+            "last": None
+        }
+    else:
+        links = {
             "self": "{}{}".format(baseurl, format_qs(query)),
             "first": "{}{}".format(baseurl, format_qs(query, {"_page": 1})),
             "prev": "{}{}".format(baseurl, format_qs(query, {"_page": prevPage})),
             "next": "{}{}".format(baseurl, format_qs(query, {"_page": nextPage})) if nextPage else None,
             "last": "{}{}".format(baseurl, format_qs(query, {"_page": page_count})) if page_count else None
-        },
+        }
+    response_object = {
+        "data": db_response.body,
+        "status": db_response.response_code,
+        "links": links,
         "pages": {
             "self": page,
             "first": 1,
@@ -186,6 +204,109 @@ def pagination_query(request: web.BaseRequest, allowed_order: List[str] = [], al
         group_limit
 
 
+def parse_order(order: List[str]) -> List[Tuple[str, str]]:
+    """
+    Parses ORDER BY expressions such as '"ts_epoch" DESC' or 'attempt_id DESC'
+    into (column, direction) tuples.
+    """
+    columns = []
+    for expression in order or []:
+        parts = expression.split()
+        direction = parts[-1].upper() if len(parts) > 1 and parts[-1].upper() in ("ASC", "DESC") else "ASC"
+        columns.append((parts[0].strip('"'), direction))
+    return columns
+
+
+def keyset_order(order: List[str], cursor_keys: List[str]) -> List[Tuple[str, str]]:
+    """
+    Returns the (column, direction) tuples to sort by for keyset pagination.
+    The cursor keys are appended as tie-breakers so that the sort order is total.
+    Defaults to sorting by the cursor keys in descending order.
+    """
+    columns = []
+    for column, direction in parse_order(order):
+        if column not in [c for c, _ in columns]:
+            columns.append((column, direction))
+    direction = columns[-1][1] if columns else "DESC"
+    for key in cursor_keys:
+        if key not in [c for c, _ in columns]:
+            columns.append((key, direction))
+    return columns
+
+
+def encode_cursor(columns: List[Tuple[str, str]], row: Dict) -> Optional[str]:
+    "Encodes the sort key of a row as an opaque cursor. Returns None if the row can not be used as a cursor."
+    values = [row.get(column) for column, _ in columns]
+    if any(not isinstance(value, (str, int, float, type(None))) for value in values):
+        return None
+    payload = json.dumps({"c": [column for column, _ in columns], "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: List[Tuple[str, str]]) -> Optional[List]:
+    "Decodes the sort key values from a cursor. Returns None if the cursor is empty, malformed or for a different sort order."
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("c") != [column for column, _ in columns]:
+        return None
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(columns) or \
+            any(not isinstance(value, (str, int, float, type(None))) for value in values):
+        return None
+    return values
+
+
+def keyset_conditions(columns: List[Tuple[str, str]], values: List, non_null_keys: List[str] = []) -> Tuple[str, List]:
+    """
+    Builds a condition matching the rows that sort after the given key values.
+
+    When the sort is in a single direction over non-null columns, this is a row comparison
+    `("a", "b") < (%s, %s)`. Otherwise the comparison is expanded column by column, taking into account
+    that Postgres sorts NULLs last in ascending and first in descending order.
+    """
+    if len(set(direction for _, direction in columns)) == 1 and \
+            all(column in non_null_keys for column, _ in columns) and \
+            all(value is not None for value in values):
+        condition = "({}) {} ({})".format(
+            ", ".join("\"{}\"".format(column) for column, _ in columns),
+            "<" if columns[0][1] == "DESC" else ">",
+            ", ".join(["%s"] * len(values)))
+        return condition, list(values)
+
+    alternatives = []
+    condition_values = []
+    for idx, (column, direction) in enumerate(columns):
+        value = values[idx]
+        if direction == "DESC":
+            after = ("\"{}\" < %s".format(column), [value]) if value is not None else ("\"{}\" IS NOT NULL".format(column), [])
+        elif value is not None:
+            after = ("\"{0}\" > %s OR \"{0}\" IS NULL".format(column), [value])
+        else:
+            # Nothing sorts after NULL in ascending order, except by the following columns.
+            after = None
+
+        if after is not None:
+            equals = []
+            equals_values = []
+            for (prev_column, _), prev_value in zip(columns[:idx], values[:idx]):
+                if prev_value is None:
+                    equals.append("\"{}\" IS NULL".format(prev_column))
+                else:
+                    equals.append("\"{}\" = %s".format(prev_column))
+                    equals_values.append(prev_value)
+            after_sql = "({})".format(after[0]) if equals and " OR " in after[0] else after[0]
+            alternatives.append("({})".format(" AND ".join(equals + [after_sql])))
+            condition_values += equals_values + after[1]
+
+    if not alternatives:
+        return "false", []
+    return "({})".format(" OR ".join(alternatives)), condition_values
+
+
 # Built-in conditions (always prefixed with _)
 def builtin_conditions_query(request: web.BaseRequest):
     return builtin_conditions_query_dict(request.query)
@@ -472,6 +593,31 @@ async def find_records(request: web.BaseRequest, async_table=None, initial_condi
     benchmark = query_param_enabled(request, "benchmark")
     invalidate_cache = query_param_enabled(request, "invalidate")
 
+    # Keyset pagination (opt-in with `_cursor`) continues after the sort key of the last row
+    # of the previous page, instead of skipping over all the preceding rows with OFFSET.
+    keyset = "_cursor" in request.query and not fetch_single and not groups
+    next_cursor = None
+    if keyset:
+        cursor_keys = async_table.cursor_keys or async_table.primary_keys
+        sort_columns = keyset_order(ordering, cursor_keys)
+        ordering = ["\"{}\" {}".format(column, direction) for column, direction in sort_columns]
+        offset = 0
+
+        cursor_values = decode_cursor(request.query.get("_cursor"), sort_columns)
+        if cursor_values is not None:
+            cursor_condition, cursor_vals = keyset_conditions(sort_columns, cursor_values, cursor_keys)
+            conditions = conditions + [cursor_condition]
+            values = values + cursor_vals
+
+        async def _capture_cursor(db_response: DBResponse, invalidate_cache=False):
+            nonlocal next_cursor
+            # Encode the cursor from the rows as they are in the database, before any refining takes place.
+            if db_response.response_code == 200 and isinstance(db_response.body, list) and \
+                    limit and len(db_response.body) >= limit:
+                next_cursor = encode_cursor(sort_columns, db_response.body[-1])
+            return db_response
+        postprocess = postprocess_chain([_capture_cursor, postprocess])
+
     results, pagination, benchmark_result = await async_table.find_records(
         conditions=conditions, values=values, limit=limit, offset=offset,
         order=ordering if len(ordering) > 0 else None, groups=groups, group_limit=group_limit,
@@ -486,7 +632,7 @@ async def find_records(request: web.BaseRequest, async_table=None, initial_condi
     if fetch_single:
         status, res = format_response(request, results)
     else:
-        status, res = format_response_list(request, results, pagination, page)
+        status, res = format_response_list(request, results, pagination, page, keyset=keyset, cursor=next_cursor)
 
     if benchmark_result:
         res["benchmark_result"] = benchmark_result
@@ -500,28 +646,103 @@ def query_param_enabled(request: web.BaseRequest, name: str) -> bool:
 
 
 class TTLQueue:
-    def __init__(self, ttl_in_seconds: int):
+    """
+    In-memory replay store for realtime events.
+
+    Values are kept in a fixed size ring buffer in the order they were appended,
+    so expired values are dropped from the head and lookups by time use binary search.
+
+    Parameters
+    ----------
+    ttl_in_seconds : int
+        time to keep values in the queue for.
+    max_size : int
+        maximum number of values to keep. The oldest value is dropped when the buffer is full.
+    """
+
+    def __init__(self, ttl_in_seconds: int, max_size: int = WS_QUEUE_MAX_SIZE):
         self._ttl: int = ttl_in_seconds
-        self._queue = deque()
+        self._max_size = max(1, int(max_size))
+        self._buffer = [None] * self._max_size
+        self._start = 0
+        self._size = 0
+
+    def _item(self, index: int):
+        return self._buffer[(self._start + index) % self._max_size]
+
+    def _bisect(self, timestamp: float) -> int:
+        "Index of the first value appended at or after timestamp"
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._item(mid)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _drop(self, count: int):
+        for _ in range(count):
+            self._buffer[self._start] = None
+            self._start = (self._start + 1) % self._max_size
+        self._size -= count
 
     async def append(self, value: any):
-        self._queue.append((time.time(), value))
+        if self._size == self._max_size:
+            self._drop(1)
+        self._buffer[(self._start + self._size) % self._max_size] = (time.time(), value)
+        self._size += 1
         await self.discard_expired_values()
 
     async def discard_expired_values(self):
-        cutoff_time = time.time() - self._ttl
-        try:
-            while self._queue[0][0] < cutoff_time:
-                self._queue.popleft()
-        except IndexError:
-            pass
+        self._drop(self._bisect(time.time() - self._ttl))
 
     async def values(self):
         await self.discard_expired_values()
-        return self._queue
+        return [self._item(i) for i in range(self._size)]
+
+    async def values_since(self, since_epoch: int):
+        await self.discard_expired_values()
+        return [self._item(i) for i in range(self._bisect(since_epoch), self._size)]
+
+
+class DBTTLQueue:
+    """
+    Replay store for realtime events backed by a database table shared by all UI service instances,
+    so that reconnecting clients receive the same missed events regardless of the instance they connect to.
+
+    Expired values are deleted at most once per retention interval.
+
+    Parameters
+    ----------
+    table : AsyncWebsocketEventTablePostgres
+        table adapter for the event log.
+    ttl_in_seconds : int
+        time to keep values in the queue for.
+    retention_interval : int
+        minimum number of seconds between deletions of expired values.
+    """
+
+    def __init__(self, table, ttl_in_seconds: int, retention_interval: int = WS_QUEUE_RETENTION_INTERVAL_SECONDS):
+        self._table = table
+        self._ttl: int = ttl_in_seconds
+        self._retention_interval = retention_interval
+        self._last_discard = 0
+
+    async def append(self, value: any):
+        await self._table.add_event(value)
+        if time.time() - self._last_discard >= self._retention_interval:
+            await self.discard_expired_values()
+
+    async def discard_expired_values(self):
+        self._last_discard = time.time()
+        await self._table.delete_events_before(time.time() - self._ttl)
+
+    async def values(self):
+        return await self.values_since(0)
 
     async def values_since(self, since_epoch: int):
-        return [value for value in await self.values() if value[0] >= since_epoch]
+        return await self._table.get_events_since(max(since_epoch, time.time() - self._ttl))
 
 
 def get_pathspec_from_request(request: MultiDict) -> Tuple[str, str, str, str, Optional[str]]:
@@ -5,20 +5,28 @@ import asyncio
 import collections
 
 from aiohttp import web, WSMsgType
-from typing import List, Dict, Any, Callable
+from typing import List, Dict, Any, Callable, Tuple
 
-from .utils import resource_conditions, TTLQueue, postprocess_chain
+from .utils import resource_conditions, TTLQueue, DBTTLQueue, postprocess_chain
 from services.utils import logging
 from pyee import AsyncIOEventEmitter
 from ..data.refiner import TaskRefiner, ArtifactRefiner
+from ..data.db.tables import AsyncWebsocketEventTablePostgres
 
 from throttler import throttle_simultaneous
 
 from services.data.db_utils import DBResponse
 from services.data.tagging_utils import apply_run_tags_to_db_response
 
-WS_QUEUE_TTL_SECONDS = os.environ.get("WS_QUEUE_TTL_SECONDS", 60 * 5)  # 5 minute TTL by default
+WS_QUEUE_TTL_SECONDS = int(os.environ.get("WS_QUEUE_TTL_SECONDS", 60 * 5))  # 5 minute TTL by default
+# Where realtime events are kept for replaying to reconnecting clients, either 'memory' or 'postgres'.
+# The 'postgres' store is shared between all UI service instances.
+WS_REPLAY_STORE = os.environ.get("WS_REPLAY_STORE", "memory")
 WS_POSTPROCESS_CONCURRENCY_LIMIT = int(os.environ.get("WS_POSTPROCESS_CONCURRENCY_LIMIT", 8))
+# Window for coalescing table events into a single batched database load before broadcasting
+WS_BATCH_WINDOW_SECONDS = float(os.environ.get("WS_BATCH_WINDOW_SECONDS", 0.05))
+# Pending events that trigger an immediate flush regardless of the batch window
+WS_BATCH_MAX_SIZE = int(os.environ.get("WS_BATCH_MAX_SIZE", 500))
 
 SUBSCRIBE = 'SUBSCRIBE'
 UNSUBSCRIBE = 'UNSUBSCRIBE'
@@ -27,6 +35,80 @@ WSSubscription = collections.namedtuple(
     "WSSubscription", "ws disconnected_ts fullpath resource query uuid filter")
 
 
+class SubscriptionRegistry(object):
+    """
+    Websocket subscriptions indexed by resource path and by websocket connection.
+
+    Subscriptions are unique per (ws, uuid). Adding and removing a subscription is O(1),
+    and lookups by resource only visit the subscriptions of that resource.
+    Disconnected websockets are kept in order of disconnection, so that expired
+    subscriptions can be removed without visiting the others.
+    """
+
+    def __init__(self):
+        self._by_resource: Dict[str, Dict[Tuple, WSSubscription]] = {}
+        self._by_ws: Dict[Any, Dict[str, WSSubscription]] = {}
+        self._disconnected: "collections.OrderedDict[Any, float]" = collections.OrderedDict()
+
+    def add(self, subscription: WSSubscription):
+        self.remove(subscription.ws, subscription.uuid)
+        self._by_resource.setdefault(subscription.resource, {})[(subscription.ws, subscription.uuid)] = subscription
+        self._by_ws.setdefault(subscription.ws, {})[subscription.uuid] = subscription
+
+    def remove(self, ws, uuid: str = None):
+        "Remove subscription with uuid of the websocket, or all subscriptions of the websocket if no uuid is provided"
+        ws_subscriptions = self._by_ws.get(ws)
+        if not ws_subscriptions:
+            return
+        uuids = [uuid] if uuid else list(ws_subscriptions.keys())
+        for _uuid in uuids:
+            subscription = ws_subscriptions.pop(_uuid, None)
+            if subscription is None:
+                continue
+            resource_subscriptions = self._by_resource.get(subscription.resource, {})
+            resource_subscriptions.pop((ws, _uuid), None)
+            if not resource_subscriptions:
+                self._by_resource.pop(subscription.resource, None)
+        if not ws_subscriptions:
+            self._by_ws.pop(ws, None)
+            self._disconnected.pop(ws, None)
+
+    def mark_disconnected(self, ws, disconnected_ts: float):
+        if ws not in self._by_ws:
+            return
+        for subscription in list(self._by_ws[ws].values()):
+            updated = subscription._replace(disconnected_ts=disconnected_ts)
+            self._by_ws[ws][subscription.uuid] = updated
+            self._by_resource[subscription.resource][(ws, subscription.uuid)] = updated
+        self._disconnected[ws] = disconnected_ts
+        self._disconnected.move_to_end(ws)
+
+    def expire(self, cutoff_ts: float):
+        "Remove all subscriptions of websockets that disconnected before cutoff_ts"
+        while self._disconnected:
+            ws, disconnected_ts = next(iter(self._disconnected.items()))
+            if disconnected_ts >= cutoff_ts:
+                break
+            self.remove(ws)
+
+    def has_any(self, resources: List[str]) -> bool:
+        return any(resource in self._by_resource for resource in resources)
+
+    def matching(self, resources: List[str]) -> List[Tuple[str, WSSubscription]]:
+        "List of (resource, subscription) pairs subscribed to any of the resources"
+        return [
+            (resource, subscription)
+            for resource in resources
+            for subscription in list(self._by_resource.get(resource, {}).values())
+        ]
+
+    def __iter__(self):
+        return (subscription for subs in self._by_ws.values() for subscription in list(subs.values()))
+
+    def __len__(self):
+        return sum(len(subs) for subs in self._by_ws.values())
+
+
 class Websocket(object):
     '''
     Adds a '/ws' endpoint and support for broadcasting realtime resource events to subscribed frontend clients.
@@ -47,17 +129,29 @@ class Websocket(object):
     Example event:
     {"type": "UPDATE", "uuid": "myst3rySh4ck", "resource": "/runs", "data": {"foo": "bar"}}
     '''
-    subscriptions: List[WSSubscription] = []
-
-    def __init__(self, app, db, event_emitter=None, queue_ttl: int = WS_QUEUE_TTL_SECONDS, cache=None):
+    def __init__(self, app, db, event_emitter=None, queue_ttl: int = WS_QUEUE_TTL_SECONDS, cache=None,
+                 batch_window: float = WS_BATCH_WINDOW_SECONDS, batch_max_size: int = WS_BATCH_MAX_SIZE,
+                 replay_store: str = WS_REPLAY_STORE):
         self.event_emitter = event_emitter or AsyncIOEventEmitter()
         self.db = db
-        self.queue = TTLQueue(queue_ttl)
+        if replay_store == "postgres":
+            self.queue = DBTTLQueue(AsyncWebsocketEventTablePostgres(db), queue_ttl)
+        else:
+            self.queue = TTLQueue(queue_ttl)
+        self.subscriptions = SubscriptionRegistry()
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        # Pending table events waiting for a batched load, keyed by table name and then by
+        # the primary key (and filters) of the record so that duplicate events are coalesced.
+        self._pending: Dict[str, Dict[Tuple, Dict]] = {}
+        self._pending_count = 0
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
         self.task_refiner = TaskRefiner(cache=cache.artifact_cache) if cache else None
         self.artifact_refiner = ArtifactRefiner(cache=cache.artifact_cache) if cache else None
         self.logger = logging.getLogger("Websocket")
 
-        event_emitter.on('notify', self.event_handler)
+        self.event_emitter.on('notify', self.event_handler)
         app.router.add_route('GET', '/ws', self.websocket_handler)
         self.loop = asyncio.get_event_loop()
 
@@ -83,56 +177,117 @@ class Websocket(object):
             a dictionary of filters used in the query when fetching complete data.
         """
         # Check if event needs to be broadcast (if anyone is subscribed to the resource)
-        if any(subscription.resource in resources for subscription in self.subscriptions):
-            # load the data and postprocessor for broadcasting if table
-            # is provided (otherwise data has already been loaded in advance)
+        if self.subscriptions.has_any(resources):
+            # Events with a table require a database load before broadcasting. These are
+            # coalesced and loaded in batches, otherwise data has already been loaded in advance.
             if table_name:
-                table = self.db.get_table_by_name(table_name)
-                _postprocess = await self.get_table_postprocessor(table_name)
-                _data = await load_data_from_db(table, data, filter_dict, postprocess=_postprocess)
+                self._enqueue_table_event(operation, resources, data, table_name, filter_dict)
             else:
-                _data = data
-
-            if not _data:
-                # Skip sending this event to subscriptions in case data is None or empty.
-                # This could be caused by insufficient/broken data and can break the UI.
-                return
-
-            # Append event to the queue so that we can later dispatch them in case of disconnections
-            #
-            # NOTE: server instance specific ws queue will not work when scaling across multiple instances.
-            # but on the other hand loading data and pushing everything into the queue for every server instance is also
-            # a suboptimal solution.
-            await self.queue.append({
-                'operation': operation,
-                'resources': resources,
-                'data': _data
-            })
-            for subscription in self.subscriptions:
+                await self._broadcast(operation, resources, data)
+
+    def _enqueue_table_event(self, operation: str, resources: List[str], data: Dict, table_name: str, filter_dict: Dict):
+        table = self.db.get_table_by_name(table_name)
+        if table is None:
+            return
+        key = (
+            tuple((k, data[k]) for k in table.primary_keys if k in data),
+            tuple(sorted(filter_dict.items()))
+        )
+        pending = self._pending.setdefault(table_name, {})
+        event = pending.get(key)
+        if event:
+            # The record is loaded only once per batch, so the latest state is broadcast.
+            # Keep INSERT if the record was created within this batch so that clients register it.
+            if event["operation"] != "INSERT":
+                event["operation"] = operation
+            event["resources"] = resources
+            event["data"] = data
+        else:
+            pending[key] = {
+                "operation": operation,
+                "resources": resources,
+                "data": data,
+                "filter_dict": filter_dict
+            }
+            self._pending_count += 1
+
+        if self._pending_count >= self.batch_max_size:
+            self.loop.create_task(self._flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = self.loop.create_task(self._flush(delay=self.batch_window))
+
+    async def _flush(self, delay: float = 0):
+        "Load all pending table events in batches and broadcast them"
+        if delay:
+            await asyncio.sleep(delay)
+        async with self._flush_lock:
+            pending, self._pending, self._pending_count = self._pending, {}, 0
+            for table_name, events in pending.items():
                 try:
-                    if subscription.disconnected_ts and time.time() - subscription.disconnected_ts > WS_QUEUE_TTL_SECONDS:
-                        await self.unsubscribe_from(subscription.ws, subscription.uuid)
-                    else:
-                        await self._event_subscription(subscription, operation, resources, _data)
-                except ConnectionResetError:
-                    self.logger.debug("Trying to broadcast to a stale subscription. Unsubscribing")
-                    await self.unsubscribe_from(subscription.ws, subscription.uuid)
+                    await self._load_and_broadcast(table_name, list(events.values()))
                 except Exception:
-                    self.logger.exception("Broadcasting to subscription failed")
+                    self.logger.exception("Broadcasting batch of events for {} failed".format(table_name))
+
+    async def _load_and_broadcast(self, table_name: str, events: List[Dict]):
+        table = self.db.get_table_by_name(table_name)
+        _postprocess = await self.get_table_postprocessor(table_name)
+
+        # Events can only share a query when they have the same filters and the same
+        # values for all but the last available primary key.
+        groups: Dict[Tuple, List[Dict]] = {}
+        for event in events:
+            key_columns = [k for k in table.primary_keys if k in event["data"]]
+            group_key = (
+                tuple((k, event["data"][k]) for k in key_columns[:-1]),
+                key_columns[-1] if key_columns else None,
+                tuple(sorted(event["filter_dict"].items()))
+            )
+            groups.setdefault(group_key, []).append(event)
+
+        for (_, _, filters), group in groups.items():
+            results = await load_batch_from_db(
+                table, [event["data"] for event in group], dict(filters), postprocess=_postprocess)
+            for event, _data in zip(group, results):
+                if not _data:
+                    # Skip sending this event to subscriptions in case data is None or empty.
+                    # This could be caused by insufficient/broken data and can break the UI.
+                    continue
+                await self._broadcast(event["operation"], event["resources"], _data)
+
+    async def _broadcast(self, operation: str, resources: List[str], data: Dict):
+        # Append event to the queue so that we can later dispatch them in case of disconnections
+        #
+        # NOTE: the default in-memory queue is server instance specific and will not work when scaling across
+        # multiple instances. Use WS_REPLAY_STORE=postgres to share the queue between instances.
+        await self.queue.append({
+            'operation': operation,
+            'resources': resources,
+            'data': data
+        })
+        self.subscriptions.expire(time.time() - WS_QUEUE_TTL_SECONDS)
+        # Serialize the event data once and share it between all matching subscriptions
+        serialized_data = json.dumps(data)
+        for resource, subscription in self.subscriptions.matching(resources):
+            try:
+                await self._send_event(subscription, operation, resource, data, serialized_data)
+            except ConnectionResetError:
+                self.logger.debug("Trying to broadcast to a stale subscription. Unsubscribing")
+                await self.unsubscribe_from(subscription.ws, subscription.uuid)
+            except Exception:
+                self.logger.exception("Broadcasting to subscription failed")
 
     async def _event_subscription(self, subscription: WSSubscription, operation: str, resources: List[str], data: Dict):
-        for resource in resources:
-            if subscription.resource == resource:
-                # Check if possible filters match this event
-                # only if the subscription actually provided conditions.
-                if subscription.filter:
-                    filters_match_request = subscription.filter(data)
-                else:
-                    filters_match_request = True
-                if filters_match_request:
-                    payload = {'type': operation, 'uuid': subscription.uuid,
-                               'resource': resource, 'data': data}
-                    await subscription.ws.send_str(json.dumps(payload))
+        if subscription.resource in resources:
+            await self._send_event(subscription, operation, subscription.resource, data, json.dumps(data))
+
+    async def _send_event(self, subscription: WSSubscription, operation: str, resource: str, data: Dict, serialized_data: str):
+        # Check if possible filters match this event
+        # only if the subscription actually provided conditions.
+        if subscription.filter and not subscription.filter(data):
+            return
+        payload = '{{"type": {}, "uuid": {}, "resource": {}, "data": {}}}'.format(
+            json.dumps(operation), json.dumps(subscription.uuid), json.dumps(resource), serialized_data)
+        await subscription.ws.send_str(payload)
 
     async def subscribe_to(self, ws, uuid: str, resource: str, since: int):
         # Always unsubscribe existing duplicate identifiers
@@ -142,7 +297,7 @@ class Websocket(object):
         subscription = WSSubscription(
             ws=ws, fullpath=resource, resource=_resource, query=query, uuid=uuid,
             filter=filter_fn, disconnected_ts=None)
-        self.subscriptions.append(subscription)
+        self.subscriptions.add(subscription)
 
         # Send previous events that client might have missed due to disconnection
         if since:
@@ -154,23 +309,17 @@ class Websocket(object):
                 )
 
     async def unsubscribe_from(self, ws, uuid: str = None):
-        if uuid:
-            self.subscriptions = list(
-                filter(lambda s: uuid != s.uuid or ws != s.ws, self.subscriptions))
-        else:
-            self.subscriptions = list(
-                filter(lambda s: ws != s.ws, self.subscriptions))
+        self.subscriptions.remove(ws, uuid)
 
     async def handle_disconnect(self, ws):
         """
-        Sets disconnected timestamp on websocket subscription without removing it from the list.
-        Removing is handled by event_handler that checks for expired subscriptions before emitting
+        Sets disconnected timestamp on websocket subscription without removing it from the registry.
+        Subscriptions that have been disconnected for longer than WS_QUEUE_TTL_SECONDS are removed
+        on every broadcast and disconnect, whichever resource they are subscribed to.
         """
-        self.subscriptions = list(
-            map(
-                lambda sub: sub._replace(disconnected_ts=time.time()) if sub.ws == ws else sub,
-                self.subscriptions)
-        )
+        now = time.time()
+        self.subscriptions.mark_disconnected(ws, now)
+        self.subscriptions.expire(now - WS_QUEUE_TTL_SECONDS)
 
     async def websocket_handler(self, request):
         "Handler for received messages from the open Web Socket connection."
@@ -214,15 +363,19 @@ class Websocket(object):
         table = None
         if table_name == self.db.task_table_postgres.table_name:
             table = self.db.run_table_postgres
-            refiner_postprocess = self.task_refiner.postprocess
+            refiner_postprocess = self.task_refiner.postprocess if self.task_refiner else None
         elif table_name == self.db.artifact_table_postgres.table_name:
             table = self.db.run_table_postgres
-            refiner_postprocess = self.artifact_refiner.postprocess
+            refiner_postprocess = self.artifact_refiner.postprocess if self.artifact_refiner else None
 
         if table:
             async def _tags_postprocess(db_response: DBResponse, invalidate_cache=False):
-                flow_id = db_response.body.get('flow_id')
-                run_id = db_response.body.get('run_id') or db_response.body.get('run_number')
+                # Batched loads are grouped so that all records belong to the same run.
+                record = db_response.body[0] if isinstance(db_response.body, list) and db_response.body else db_response.body
+                if not isinstance(record, dict):
+                    return db_response
+                flow_id = record.get('flow_id')
+                run_id = record.get('run_id') or record.get('run_number')
                 if not flow_id or not run_id:
                     self.logger.warning("Missing flow_id or run_id (or run_number) for a record from table {}".format(table.table_name))
                     return db_response
@@ -253,3 +406,48 @@ async def load_data_from_db(table, data: Dict[str, Any],
         postprocess=postprocess
     )
     return results.body
+
+
+async def load_batch_from_db(table, data_list: List[Dict[str, Any]],
+                             filter_dict: Dict = {},
+                             postprocess: Callable = None) -> List[Dict]:
+    """
+    Load the records for a list of partial records with a single query.
+
+    All partial records must have the same values for all but the last available primary key,
+    which is matched with '= ANY(%s)'. Postprocessing is applied once for the whole batch.
+
+    Returns
+    -------
+    List
+        Loaded record for each item of data_list, or None if no record was found.
+    """
+    key_columns = [key for key in table.primary_keys if key in data_list[0]]
+    if len(data_list) == 1 or not key_columns:
+        return [await load_data_from_db(table, data, filter_dict, postprocess=postprocess) for data in data_list]
+
+    *prefix_columns, last_column = key_columns
+    conditions, values = [], []
+    for k in prefix_columns:
+        conditions.append("{} = %s".format(k))
+        values.append(data_list[0][k])
+    conditions.append("{} = ANY(%s)".format(last_column))
+    values.append(list({data[last_column] for data in data_list}))
+    for k, v in filter_dict.items():
+        conditions.append("{} = %s".format(k))
+        values.append(v)
+
+    results, *_ = await table.find_records(
+        conditions=conditions, values=values,
+        enable_joins=True,
+        expanded=True,
+        postprocess=postprocess
+    )
+    if results.response_code != 200 or not isinstance(results.body, list):
+        return [None] * len(data_list)
+
+    # Keep the first record per key, matching the behavior of a single record load.
+    records = {}
+    for record in results.body:
+        records.setdefault(str(record.get(last_column)), record)
+    return [records.get(str(data[last_column])) for data in data_list]
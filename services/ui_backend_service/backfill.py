@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+
+from services.utils import DBConfiguration, logging
+
+from .data.db import AsyncPostgresDB
+
+logger = logging.getLogger("Backfill")
+
+# Summary tables that can be backfilled, mapped to the attribute of their table on AsyncPostgresDB
+SUMMARY_TABLES = {
+    "run_status": "run_status_table_postgres",
+    "task_attempts": "task_attempt_table_postgres",
+}
+
+
+async def backfill(tables=SUMMARY_TABLES.keys(), flow_id: str = None):
+    db = AsyncPostgresDB('ui:backfill')
+    await db._init(db_conf=DBConfiguration(), create_triggers=False)
+    try:
+        results = {}
+        for table in tables:
+            results[table] = await getattr(db, SUMMARY_TABLES[table]).backfill(flow_id=flow_id)
+        return results
+    finally:
+        db.pool.close()
+        await db.pool.wait_closed()
+
+
+def main():
+    """
+    Recompute summary tables from existing metadata.
+
+    Usage: python -m services.ui_backend_service.backfill [--table {run_status,task_attempts,all}] [--flow-id FLOW_ID]
+    """
+    parser = argparse.ArgumentParser(description="Backfill summary tables from existing metadata.")
+    parser.add_argument("--table", default="all", choices=list(SUMMARY_TABLES.keys()) + ["all"],
+                        help="summary table to backfill (default: all)")
+    parser.add_argument("--flow-id", default=None, help="only backfill the rows of a single flow")
+    args = parser.parse_args()
+
+    tables = SUMMARY_TABLES.keys() if args.table == "all" else [args.table]
+    results = asyncio.get_event_loop().run_until_complete(backfill(tables=tables, flow_id=args.flow_id))
+    failed = False
+    for table, result in results.items():
+        if result.response_code != 200:
+            logger.error("Backfill of {} failed: {}".format(table, result.body))
+            failed = True
+        else:
+            logger.info("Backfilled {} rows of {}".format(result.body["updated"], table))
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
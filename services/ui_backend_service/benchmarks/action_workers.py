@@ -0,0 +1,148 @@
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+# NOTE: The services modules import Metaflow, whose configuration is read on import.
+# They are imported once the environment points Metaflow at the benchmark datastore.
+
+FLOW = textwrap.dedent("""
+    from metaflow import FlowSpec, step
+
+
+    class ActionWorkersBenchmarkFlow(FlowSpec):
+        @step
+        def start(self):
+            self.items = list(range({tasks}))
+            self.next(self.fanout, foreach="items")
+
+        @step
+        def fanout(self):
+            self.value = {{"item": self.input, "values": list(range(100))}}
+            self.next(self.join)
+
+        @step
+        def join(self, inputs):
+            self.next(self.end)
+
+        @step
+        def end(self):
+            pass
+
+
+    if __name__ == "__main__":
+        ActionWorkersBenchmarkFlow()
+""")
+
+
+def create_run(root, tasks):
+    "Run a flow with `tasks` foreach tasks, using a local datastore and metadata in `root`."
+    flow_file = os.path.join(root, "flow.py")
+    with open(flow_file, "w") as f:
+        f.write(FLOW.format(tasks=tasks))
+    subprocess.run([sys.executable, flow_file, "run", "--max-workers", "8"],
+                   cwd=root, env=os.environ.copy(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def list_targets():
+    "Returns the GetTask and GetArtifacts targets of the foreach tasks of the latest run."
+    from metaflow import Flow, namespace
+    namespace(None)
+    run = Flow("ActionWorkersBenchmarkFlow").latest_run
+    tasks = ["%s/0" % task.pathspec for task in run["fanout"]]
+    artifacts = ["%s/value/0" % task.pathspec for task in run["fanout"]]
+    return tasks, artifacts
+
+
+def run_in_process(func):
+    "Call `func` in a short-lived worker process, to keep Metaflow client state out of the benchmark process."
+    from services.ui_backend_service.data.cache.client.cache_worker import ActionWorkerPool
+    pool = ActionWorkerPool(1)
+    results = queue.Queue()
+    try:
+        pool.apply_async(func, callback=results.put, error_callback=results.put)
+        result = results.get(timeout=60)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    finally:
+        pool.close()
+
+
+def measure(action_cls, targets, processes, warm, root):
+    """
+    Execute one `action_cls` request per target and return the number of requests per second.
+
+    Cold workers are recycled after every action, so each action starts with empty
+    Metaflow client and datastore caches. Warm workers are kept across actions.
+    """
+    from services.ui_backend_service.data.cache.client.cache_store import key_filename
+    from services.ui_backend_service.data.cache.client.cache_worker import ActionWorkerPool, execute_action
+
+    pool = ActionWorkerPool(processes, max_rss_growth=512 * 1024 * 1024 if warm else -1)
+    action_spec = "%s.%s" % (action_cls.__module__, action_cls.__name__)
+    done = queue.Queue()
+    try:
+        start = time.time()
+        for target in targets:
+            msg, keys, _, _, _, _ = action_cls.format_request([target])
+            request = {
+                "message": msg,
+                "keys": {key: key_filename(key) for key in keys},
+                "existing_keys": {},
+                "stream_key": None,
+                "notify_key": None,
+                "invalidate_cache": False,
+            }
+            tempdir = tempfile.mkdtemp(dir=root)
+            pool.apply_async(execute_action, (tempdir, action_spec, request),
+                             callback=done.put, error_callback=done.put)
+        for _ in targets:
+            done.get(timeout=600)
+        return len(targets) / (time.time() - start)
+    finally:
+        pool.close()
+
+
+def main():
+    """
+    Compare the throughput of GetTask and GetArtifacts actions on cold and warm worker processes.
+
+    Usage: python -m services.ui_backend_service.benchmarks.action_workers [--tasks N] [--processes N] [--rounds N]
+    """
+    parser = argparse.ArgumentParser(description="Compare cache action throughput of cold and warm worker processes.")
+    parser.add_argument("--tasks", type=int, default=50, help="number of tasks in the benchmark run (default: 50)")
+    parser.add_argument("--processes", type=int, default=4, help="number of worker processes (default: 4)")
+    parser.add_argument("--rounds", type=int, default=3, help="requests per task and action (default: 3)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        os.environ.update({
+            "METAFLOW_DEFAULT_METADATA": "local",
+            "METAFLOW_DEFAULT_DATASTORE": "local",
+            "METAFLOW_DATASTORE_SYSROOT_LOCAL": root,
+            "USERNAME": os.environ.get("USERNAME", "benchmark"),
+        })
+        from services.ui_backend_service.data.cache.get_artifacts_action import GetArtifacts
+        from services.ui_backend_service.data.cache.get_task_action import GetTask
+
+        create_run(root, args.tasks)
+        tasks, artifacts = run_in_process(list_targets)
+        cache_root = os.path.join(root, "cache_data")
+        os.makedirs(cache_root)
+
+        for action_cls, targets in [(GetTask, tasks), (GetArtifacts, artifacts)]:
+            targets = targets * args.rounds
+            for warm in (False, True):
+                rate = measure(action_cls, targets, args.processes, warm, cache_root)
+                print("%s, %s workers: %d requests, %.1f requests/s" % (
+                    action_cls.__name__, "warm" if warm else "cold", len(targets), rate))
+
+
+if __name__ == "__main__":
+    main()
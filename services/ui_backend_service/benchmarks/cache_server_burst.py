@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from services.ui_backend_service.data.cache.client.cache_action import Check
+from services.ui_backend_service.data.cache.client.cache_async_client import OP_WORKER_TERMINATE
+from services.ui_backend_service.data.cache.client.cache_client import server_request, subprocess_cmd_and_env
+
+
+def drain_burst(requests: int = 1000, max_actions: int = 16):
+    """
+    Start a cache server, send it a burst of `requests` Check actions at once and
+    measure how long it takes until every worker has terminated.
+
+    Returns the number of seconds it took to drain the burst.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        cmd, env = subprocess_cmd_and_env('cache_server')
+        cmdline = cmd + [
+            '--root', root,
+            '--max-actions', str(max_actions),
+            '--max-size', str(1024 ** 3)
+        ]
+        proc = subprocess.Popen(cmdline, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            action = '.'.join((Check.__module__, Check.__name__))
+            init = server_request('init', message={'actions': [[Check.__module__, Check.__name__]]})
+            burst = []
+            for _ in range(requests):
+                msg, keys, stream_key, disposable_keys, invalidate_cache, ephemeral_path = Check.format_request()
+                burst.append(server_request('action', action=action, prio=Check.PRIORITY, keys=keys,
+                                            stream_key=stream_key, message=msg, disposable_keys=disposable_keys,
+                                            invalidate_cache=invalidate_cache, ephemeral_path=ephemeral_path))
+
+            proc.stdin.write(json.dumps(init).encode('utf-8') + b'\n')
+            proc.stdin.flush()
+
+            start = time.time()
+            proc.stdin.write(b''.join(json.dumps(req).encode('utf-8') + b'\n' for req in burst))
+            proc.stdin.flush()
+
+            terminated = 0
+            while terminated < requests:
+                line = proc.stdout.readline()
+                if not line:
+                    raise Exception("Cache server exited after %d of %d requests" % (terminated, requests))
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    # Log lines of the cache server
+                    continue
+                if message.get('op') == OP_WORKER_TERMINATE:
+                    terminated += 1
+            return time.time() - start
+        finally:
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    """
+    Measure how fast the cache server drains a burst of requests.
+
+    Usage: python -m services.ui_backend_service.benchmarks.cache_server_burst [--requests N] [--max-actions N] [--repeat N]
+    """
+    parser = argparse.ArgumentParser(description="Measure how fast the cache server drains a burst of requests.")
+    parser.add_argument("--requests", type=int, default=1000, help="number of requests in the burst (default: 1000)")
+    parser.add_argument("--max-actions", type=int, default=16, help="maximum number of concurrent cache actions (default: 16)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of measurements (default: 3)")
+    args = parser.parse_args()
+
+    for _ in range(args.repeat):
+        elapsed = drain_burst(args.requests, args.max_actions)
+        print("drained %d requests in %.2fs (%.1f requests/s)" % (args.requests, elapsed, args.requests / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from services.ui_backend_service.data.cache.get_log_file_action import paginated_log, paginated_result, \
+    stream_sorted_logs
+from services.ui_backend_service.data.cache.log_index import LogIndex
+
+SOURCES = ["runtime", "task"]
+START = datetime.datetime(2024, 1, 1)
+
+
+def write_lines(paths, first, count):
+    "Append `count` MFLog lines to each log source, starting from line number `first`"
+    for index, (source, path) in enumerate(paths.items()):
+        with open(path, "ab") as f:
+            for lineno in range(first, first + count):
+                ts = (START + datetime.timedelta(milliseconds=2 * lineno + index)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+                f.write(("[MFLOG|0|%s|%s|123-abc]%s line %d of the log\n" % (ts, source, source, lineno)).encode("utf-8"))
+
+
+def poll_full(paths, limit):
+    "Build the tail page the way it is built from whole log files."
+    line_total = 0
+    for path in paths.values():
+        with open(path, "r") as f:
+            line_total += sum(1 for _ in f)
+    return paginated_result(lambda: stream_sorted_logs(list(paths.values())), 1, line_total, limit, True)
+
+
+def poll_incremental(paths, log_path, limit):
+    "Build the tail page from a log index, appending only the new bytes of the log sources."
+    with LogIndex(log_path) as log:
+        chunks = {}
+        for source, path in paths.items():
+            with open(path, "rb") as f:
+                f.seek(log.offset(source))
+                chunks[source] = f.read()
+        log.append(chunks, SOURCES)
+        return paginated_log(log, 1, limit, True)
+
+
+def main():
+    """
+    Compare the cost of polling the tail page of a growing task log, when the whole log is read
+    on every poll and when new lines are appended to a log index.
+
+    Usage: python -m services.ui_backend_service.benchmarks.log_tail [--polls N] [--lines-per-poll N] [--initial-lines N]
+    """
+    parser = argparse.ArgumentParser(description="Compare the cost of polling the tail of a growing task log.")
+    parser.add_argument("--initial-lines", type=int, default=500000,
+                        help="lines per log source before polling starts (default: 500000)")
+    parser.add_argument("--lines-per-poll", type=int, default=100, help="new lines per log source per poll (default: 100)")
+    parser.add_argument("--polls", type=int, default=10, help="number of polls (default: 10)")
+    parser.add_argument("--limit", type=int, default=100, help="lines per page (default: 100)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = {source: os.path.join(root, source) for source in SOURCES}
+        write_lines(paths, 0, args.initial_lines)
+        log_path = os.path.join(root, "index")
+        # The first poll indexes the whole log
+        start = time.time()
+        poll_incremental(paths, log_path, args.limit)
+        print("indexed %d lines in %.2fs" % (args.initial_lines * len(SOURCES), time.time() - start))
+
+        timings = {"full": 0.0, "incremental": 0.0}
+        lineno = args.initial_lines
+        for _ in range(args.polls):
+            write_lines(paths, lineno, args.lines_per_poll)
+            lineno += args.lines_per_poll
+
+            start = time.time()
+            full = poll_full(paths, args.limit)
+            timings["full"] += time.time() - start
+
+            start = time.time()
+            incremental = poll_incremental(paths, log_path, args.limit)
+            timings["incremental"] += time.time() - start
+            assert full == incremental, "tail pages differ"
+
+        for name, total in timings.items():
+            print("%s: %.1fms per poll" % (name, 1000 * total / args.polls))
+
+
+if __name__ == "__main__":
+    main()
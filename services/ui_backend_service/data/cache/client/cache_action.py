@@ -23,6 +23,9 @@ def import_action_class(mod, cls):
 class CacheAction(object):
 
     PRIORITY = LO_PRIO
+    # Keep decoded values of the keys in the in-memory hot tier of the client.
+    # Only enable for actions whose responses are not mutated by their callers.
+    HOT_TIER = False
 
     @classmethod
     def format_request(cls, *args, **kwargs):
@@ -48,13 +51,26 @@ class CacheAction(object):
         # return message, obj_keys, stream_key, disposable_keys, invalidate_cache, ephemeral_storage_path
         raise NotImplementedError
 
+    @classmethod
+    def decode(cls, key, blob):
+        """
+        Decodes the cached value of a single key. This method is
+        called by `cache_client` for each key, and the decoded values
+        are passed to `response`. Decoded values may be kept in the
+        hot tier of the client, see `HOT_TIER`.
+
+        By default the blob is returned as is.
+        """
+        return blob
+
     @classmethod
     def response(cls, keys_objs):
         """
         Decodes and refines `execute` output before it is returned
         to the client. The argument `keys_objs` is the return value
-        of `execute`. This method is called by `cache_client` to
-        convert serialized, cached results to a client-facing object.
+        of `execute`, with each value passed through `decode`. This
+        method is called by `cache_client` to convert serialized,
+        cached results to a client-facing object.
 
         The function may return anything.
         """
@@ -4,21 +4,95 @@ import asyncio
 import json
 from asyncio.subprocess import PIPE, STDOUT
 
-from .cache_client import CacheClient, CacheServerUnreachable, CacheClientTimeout
+from .cache_client import CacheClient, CacheFuture, CacheServerUnreachable, CacheClientTimeout, FOREVER
 
 from services.utils import logging
 
 OP_WORKER_CREATE = "worker_create"
 OP_WORKER_TERMINATE = "worker_terminate"
+# Sent once the keys produced by a worker have been committed to the cache store
+OP_KEYS_READY = "keys_ready"
+# Sent by a worker process whenever it has written a new event to a stream
+OP_STREAM_CHUNK = "stream_chunk"
+# Sent when the garbage collector of the cache store has marked objects for deletion
+OP_OBJECTS_DELETED = "objects_deleted"
 
+# Waiting for results is driven by notifications from the cache server.
+# Files are still polled at this frequency as a fallback, in case a notification is missed.
 WAIT_FREQUENCY = 0.2
 HEARTBEAT_FREQUENCY = 1
 
 
+class SharedCacheFuture(CacheFuture):
+    """
+    CacheFuture shared by concurrent callers of the same streaming action.
+
+    The stream is read once, by a single reader task, and its events are
+    broadcast to every caller iterating over stream(). Callers that start
+    streaming late receive all the events from the beginning of the stream.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reader = None
+        self._events = []
+        self._stream_error = None
+        self._stream_done = False
+        self._new_events = None
+
+    def stream(self, timeout=FOREVER):
+        if not self.stream_key:
+            return None
+        if self._reader is None:
+            self._new_events = asyncio.get_event_loop().create_future()
+            self._reader = asyncio.ensure_future(self._read_stream())
+        return self._subscribe(timeout)
+
+    async def _read_stream(self):
+        try:
+            async for event in super().stream():
+                self._events.append(event)
+                self._broadcast()
+        except Exception as ex:
+            self._stream_error = ex
+        finally:
+            self._stream_done = True
+            self._broadcast()
+
+    def _broadcast(self):
+        new_events, self._new_events = self._new_events, asyncio.get_event_loop().create_future()
+        new_events.set_result(True)
+
+    async def _subscribe(self, timeout):
+        end = time.time() + timeout
+        index = 0
+        while True:
+            if index < len(self._events):
+                yield self._events[index]
+                index += 1
+            elif self._stream_done:
+                if self._stream_error is not None:
+                    raise self._stream_error
+                return
+            else:
+                try:
+                    # Shielded, as the future is shared by all the subscribers
+                    await asyncio.wait_for(asyncio.shield(self._new_events), timeout=max(end - time.time(), 0))
+                except asyncio.TimeoutError:
+                    raise CacheClientTimeout()
+
+
 class CacheAsyncClient(CacheClient):
     _drain_lock = asyncio.Lock()
     _restart_requested = False
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # asyncio futures waiting for a notification, by stream key or object key
+        self._waiters = {}
+        # SharedCacheFutures of the streaming actions in flight, by stream key
+        self._in_flight = {}
+
     async def start_server(self, cmdline, env):
         self.logger = logging.getLogger(
             "CacheAsyncClient:{root}".format(root=self._root)
@@ -47,12 +121,26 @@ class CacheAsyncClient(CacheClient):
             # We check for isEnabledFor because some things may be very long to print
             # (in particularly pending_requests)
             message = json.loads(line)
+            if message["op"] == OP_STREAM_CHUNK:
+                # Stream chunks are frequent, so they are not logged.
+                self._notify([message["stream_key"]])
+                return
             if self.logger.isEnabledFor(logging.INFO):
                 self.logger.info(message)
             if message["op"] == OP_WORKER_CREATE:
                 self.pending_requests.add(message["stream_key"])
             elif message["op"] == OP_WORKER_TERMINATE:
                 self.pending_requests.remove(message["stream_key"])
+                self._in_flight.pop(message["stream_key"], None)
+                self._notify([message["stream_key"]])
+            elif message["op"] == OP_KEYS_READY:
+                if self.hot_tier is not None:
+                    # The objects of the keys may have been replaced
+                    self.hot_tier.invalidate(message["keys"])
+                self._notify([message["stream_key"]] + message["keys"])
+            elif message["op"] == OP_OBJECTS_DELETED:
+                if self.hot_tier is not None:
+                    self.hot_tier.invalidate_paths(message["paths"])
 
             if self.logger.isEnabledFor(logging.INFO):
                 self.logger.info(
@@ -64,6 +152,36 @@ class CacheAsyncClient(CacheClient):
         except Exception as ex:
             self.logger.exception(ex)
 
+    def _action(self, cls):
+
+        def _call(*args, **kwargs):
+            msg, keys, stream_key, disposable_keys, invalidate_cache, ephemeral_path =\
+                cls.format_request(*args, **kwargs)
+            if not stream_key:
+                future = CacheFuture(keys, stream_key, self, cls, self._root)
+            else:
+                future = SharedCacheFuture(keys, stream_key, self, cls, self._root)
+
+            if future.key_paths_ready() and not invalidate_cache:
+                # cache hit
+                return self.request_and_return([], future)
+
+            in_flight = self._in_flight.get(stream_key)
+            if in_flight is not None and in_flight.action is cls and in_flight.keys == keys \
+                    and self.has_pending_request(stream_key):
+                # An identical request is already being processed, share its future
+                # instead of sending the request and reading the stream again.
+                return self.request_and_return([], in_flight)
+
+            # cache miss
+            if stream_key:
+                self._in_flight[stream_key] = future
+            req = self._send_action(cls, msg, keys, stream_key, disposable_keys,
+                                    invalidate_cache, ephemeral_path)
+            return self.request_and_return([req], future)
+
+        return _call
+
     async def check(self):
         ret = await self.Check()  # pylint: disable=no-member
         await ret.wait()
@@ -98,24 +216,51 @@ class CacheAsyncClient(CacheClient):
             self._restart_requested = True
             raise CacheServerUnreachable()
 
-    async def wait_iter(self, it, timeout):
+    def _add_waiter(self, notify_key):
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(notify_key, set()).add(waiter)
+        return waiter
+
+    def _remove_waiter(self, notify_key, waiter):
+        waiters = self._waiters.get(notify_key)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self._waiters[notify_key]
+
+    def _notify(self, notify_keys):
+        "Resolve the futures waiting for a notification on any of the keys."
+        for notify_key in notify_keys:
+            for waiter in self._waiters.pop(notify_key, ()):
+                if not waiter.done():
+                    waiter.set_result(True)
+
+    async def wait_iter(self, it, timeout, notify_key=None):
         end = time.time() + timeout
-        for obj in it:
-            if obj is None:
-                await asyncio.sleep(WAIT_FREQUENCY)
-                if not self._is_alive:
-                    raise CacheServerUnreachable()
-                elif time.time() > end:
-                    raise CacheClientTimeout()
-            else:
-                yield obj
+        # The waiter is registered before the iterator checks for results,
+        # so that notifications arriving in between are not missed.
+        waiter = self._add_waiter(notify_key)
+        try:
+            for obj in it:
+                if obj is None:
+                    await asyncio.wait([waiter], timeout=WAIT_FREQUENCY)
+                    self._remove_waiter(notify_key, waiter)
+                    waiter = self._add_waiter(notify_key)
+                    if not self._is_alive:
+                        raise CacheServerUnreachable()
+                    elif time.time() > end:
+                        raise CacheClientTimeout()
+                else:
+                    yield obj
+        finally:
+            self._remove_waiter(notify_key, waiter)
 
-    async def wait(self, fun, timeout):
+    async def wait(self, fun, timeout, notify_key=None):
         def _repeat():
             while True:
                 yield fun()
 
-        async for obj in self.wait_iter(_repeat(), timeout):
+        async for obj in self.wait_iter(_repeat(), timeout, notify_key=notify_key):
             return obj
 
     async def request_and_return(self, reqs, ret):
@@ -127,6 +272,8 @@ class CacheAsyncClient(CacheClient):
         while self._is_alive:
             try:
                 await self.ping()
+                if self.touched_keys:
+                    await self.send_touched_keys()
             except CacheServerUnreachable:
                 self._is_alive = False
             await asyncio.sleep(HEARTBEAT_FREQUENCY)
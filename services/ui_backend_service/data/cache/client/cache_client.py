@@ -4,8 +4,10 @@ import sys
 import hashlib
 import time
 
-from .cache_store import object_path, stream_path, is_safely_readable
+from .cache_store import PackedObjects, object_path, stream_path, is_safely_readable
+from .cache_segments import CorruptedRecord, read_record
 from .cache_action import Check
+from .cache_hot_tier import HotTier, MISSING
 
 
 FOREVER = 60 * 60 * 24 * 3650
@@ -36,8 +38,20 @@ class CacheFuture(object):
             self.key_paths[stream_key] = object_path(root, stream_key)
         self.key_objs = None
 
+    @property
+    def hot_tier(self):
+        return self.client.hot_tier if self.action.HOT_TIER else None
+
     def key_paths_ready(self):
-        return all(map(is_safely_readable, self.key_paths.values()))
+        # Keys in the hot tier are readable, as entries are invalidated when their objects are deleted.
+        hot_tier = self.hot_tier
+        unreadable = [path for key, path in self.key_paths.items()
+                      if (hot_tier is None or key not in hot_tier) and not is_safely_readable(path)]
+        return not unreadable or len(self._locate_packed(unreadable)) == len(unreadable)
+
+    def _locate_packed(self, paths):
+        packed_objects = self.client.packed_objects
+        return packed_objects.locate(paths) if packed_objects is not None and paths else {}
 
     def is_ready(self):
         return self.key_paths_ready() or not self.has_pending_request()
@@ -51,22 +65,52 @@ class CacheFuture(object):
 
     def wait(self, timeout=FOREVER):
         return self.client.wait(lambda: None if self.has_pending_request() else True,
-                                timeout)
+                                timeout, notify_key=self.stream_key)
 
     def get(self):
-        def _read(path):
-            with open(path, 'rb') as f:
-                return f.read()
-
-        _safe_key_paths = {key: path for key, path in self.key_paths.items() if is_safely_readable(path)}
         if self.key_objs is None and self.is_ready():
-            self.key_objs = {key: _read(path)
-                             for key, path in _safe_key_paths.items()
-                             if key != self.stream_key}
+            self.key_objs = self._read_key_objs()
+            self.client.touch(self.key_objs)
 
         if self.key_objs:
             return self.action.response(self.key_objs)
 
+    def _read_key_objs(self):
+        def _read(path):
+            with open(path, 'rb') as f:
+                return f.read()
+
+        hot_tier = self.hot_tier
+        key_objs = {}
+        blobs = {}
+        unreadable = {}
+        for key, path in self.key_paths.items():
+            if key == self.stream_key:
+                continue
+            obj = hot_tier.get(key) if hot_tier is not None else MISSING
+            if obj is not MISSING:
+                key_objs[key] = obj
+            elif is_safely_readable(path):
+                blobs[key] = _read(path)
+            else:
+                unreadable[key] = path
+
+        # Objects that are not files may be packed into segments
+        packed = self._locate_packed(list(unreadable.values()))
+        for key, path in unreadable.items():
+            if path in packed:
+                try:
+                    blobs[key] = read_record(*packed[path])
+                except (OSError, CorruptedRecord):
+                    pass
+
+        for key, blob in blobs.items():
+            obj = self.action.decode(key, blob)
+            if hot_tier is not None:
+                hot_tier.put(key, obj, len(blob))
+            key_objs[key] = obj
+        return {key: key_objs[key] for key in self.key_paths if key in key_objs}
+
     def stream(self, timeout=FOREVER):
 
         def _wait_paths(paths):
@@ -141,16 +185,16 @@ class CacheFuture(object):
             # 2) action.stream_response() reformats the raw events into
             #    action-specific output. Note that (2) may produce more
             #    or fewer events than (1).
-            # 3) client.wait_iter() handles sync/async sleeping when no
-            #    events are available.
+            # 3) client.wait_iter() handles sync/async waiting for a notification
+            #    from the server when no events are available.
             it = _readlines([self.stream_path, self.key_paths[self.stream_key]])
             return self.client.wait_iter(self.action.stream_response(it),
-                                         timeout)
+                                         timeout, notify_key=self.stream_key)
 
 
 class CacheClient(object):
 
-    def __init__(self, root, action_classes, max_actions=16, max_size=10000):
+    def __init__(self, root, action_classes, max_actions=16, max_size=10000, hot_tier_size=0, pack_threshold=0):
 
         action_classes.append(Check)
         for cls in action_classes:
@@ -162,15 +206,24 @@ class CacheClient(object):
         self._action_classes = action_classes
         self._max_actions = max_actions
         self._max_size = max_size
+        self._pack_threshold = pack_threshold
+
+        # In-memory LRU of decoded values for actions that enable HOT_TIER, disabled with a size of 0.
+        self.hot_tier = HotTier(hot_tier_size) if hot_tier_size else None
+        # Objects of at most pack_threshold bytes are packed into segment files by the server.
+        self.packed_objects = PackedObjects(root) if pack_threshold else None
 
         self.pending_requests = set()
+        # Keys read since the last time accesses were reported to the server
+        self.touched_keys = set()
 
     def start(self):
         cmd, env = subprocess_cmd_and_env('cache_server')
         cmdline = cmd + [
             '--root', os.path.abspath(self._root),
             '--max-actions', str(self._max_actions),
-            '--max-size', str(self._max_size)
+            '--max-size', str(self._max_size),
+            '--pack-threshold', str(self._pack_threshold)
         ]
 
         msg = {
@@ -205,25 +258,40 @@ class CacheClient(object):
                 # cache hit
                 req = None
             else:
-                # Set stream_key as pending
-                self.pending_requests.add(stream_key)
-
                 # cache miss
-                action_spec = '%s.%s' % (cls.__module__, cls.__name__)
-                req = self._send('action',
-                                 prio=cls.PRIORITY,
-                                 action=action_spec,
-                                 keys=keys,
-                                 stream_key=stream_key,
-                                 message=msg,
-                                 disposable_keys=disposable_keys,
-                                 invalidate_cache=invalidate_cache,
-                                 ephemeral_path=ephemeral_path)
+                req = self._send_action(cls, msg, keys, stream_key, disposable_keys,
+                                        invalidate_cache, ephemeral_path)
 
             return self.request_and_return([req] if req else [], future)
 
         return _call
 
+    def _send_action(self, cls, msg, keys, stream_key, disposable_keys, invalidate_cache, ephemeral_path):
+        # Set stream_key as pending
+        self.pending_requests.add(stream_key)
+
+        action_spec = '%s.%s' % (cls.__module__, cls.__name__)
+        return self._send('action',
+                          prio=cls.PRIORITY,
+                          action=action_spec,
+                          keys=keys,
+                          stream_key=stream_key,
+                          message=msg,
+                          disposable_keys=disposable_keys,
+                          invalidate_cache=invalidate_cache,
+                          ephemeral_path=ephemeral_path)
+
+    def touch(self, keys):
+        """
+        Record that keys were read, so that the least recently read objects
+        are garbage collected first. Accesses are reported to the server in batches.
+        """
+        self.touched_keys.update(keys)
+
+    def send_touched_keys(self):
+        keys, self.touched_keys = list(self.touched_keys), set()
+        return self._send('touch', keys=keys)
+
     def has_pending_request(self, stream_key: str) -> bool:
         """
         Check if stream_key is listed as pending request.
@@ -257,16 +325,18 @@ class CacheClient(object):
         """
         raise NotImplementedError
 
-    def wait_iter(self, it, timeout):
+    def wait_iter(self, it, timeout, notify_key=None):
         """
-        Refine an iterator `it`, taking a pause when `None` is encountered.
+        Refine an iterator `it`, taking a pause when `None` is encountered,
+        until the server sends a notification for `notify_key`.
         Yields not-`None` objects as is.
         """
         raise NotImplementedError
 
-    def wait(self, fun, timeout):
+    def wait(self, fun, timeout, notify_key=None):
         """
-        Keep calling `fun` until it stops returning `None`. Returns the first
+        Keep calling `fun` until it stops returning `None`, pausing between calls
+        until the server sends a notification for `notify_key`. Returns the first
         not-`None` result of the function.
         """
         raise NotImplementedError
@@ -0,0 +1,95 @@
+import os
+from collections import OrderedDict
+
+from .cache_store import key_filename
+
+MISSING = object()
+
+
+class HotTier(object):
+    """
+    Bounded in-memory LRU of decoded cache values, keyed by cache key.
+
+    Entries are accounted by the size in bytes of the blob they were decoded
+    from. The least recently used entries are evicted once `max_size` bytes
+    are exceeded, and blobs larger than `max_entry_size` are not kept at all.
+    Entries have to be invalidated when the store replaces or deletes the
+    object of their key, either by key or by the path of the object.
+    """
+
+    def __init__(self, max_size, max_entry_size=None):
+        self.max_size = max_size
+        self.max_entry_size = max_size // 8 if max_entry_size is None else max_entry_size
+        self.entries = OrderedDict()
+        self.size = 0
+        # object file names to keys, for invalidating the entries of deleted objects
+        self.filenames = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        "Returns the decoded value of `key`, or MISSING"
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_entry_size:
+            return
+        self._remove(key)
+        filename = key_filename(key)
+        self.entries[key] = (value, size, filename)
+        self.filenames[filename] = key
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size, evicted_filename) = self.entries.popitem(last=False)
+            del self.filenames[evicted_filename]
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, keys):
+        for key in keys:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_paths(self, paths):
+        self.invalidate([self.filenames[os.path.basename(path)] for path in paths
+                         if os.path.basename(path) in self.filenames])
+
+    def clear(self):
+        self.entries.clear()
+        self.filenames.clear()
+        self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+            del self.filenames[entry[2]]
+        return entry is not None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,140 @@
+import os
+import time
+import struct
+
+from collections import OrderedDict
+
+SEGMENT_DIRNAME = "segments"
+SEGMENT_SUFFIX = ".seg"
+# Segments are sealed once they grow past this size, and a new one is started.
+SEGMENT_SIZE = 64 * 1024 * 1024
+# Sealed segments are compacted once this fraction of their bytes is garbage.
+COMPACTION_THRESHOLD = 0.5
+# Every record starts with the sha1 digest of its key and the length of the blob.
+RECORD_HEADER = struct.Struct(">20sI")
+
+
+class CorruptedRecord(Exception):
+    pass
+
+
+def segment_path(root, segment):
+    return os.path.join(root, SEGMENT_DIRNAME, "%08d%s" % (segment, SEGMENT_SUFFIX))
+
+
+def record_size(blob):
+    return RECORD_HEADER.size + len(blob)
+
+
+def read_record(path, position, length, filename):
+    """
+    Read the blob of a packed object at `position` of a segment file, checking
+    that the record header matches the object file name and the length.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.pread(fd, RECORD_HEADER.size + length, position - RECORD_HEADER.size)
+    finally:
+        os.close(fd)
+    if len(data) != RECORD_HEADER.size + length:
+        raise CorruptedRecord("Truncated record at %s:%d" % (path, position))
+    digest, size = RECORD_HEADER.unpack_from(data)
+    if size != length or digest.hex() != filename:
+        raise CorruptedRecord("Unexpected record at %s:%d" % (path, position))
+    return data[RECORD_HEADER.size:]
+
+
+class Segments(object):
+    """
+    Append-only segment files that pack the small objects of a cache store.
+
+    Records are never rewritten in place. Replaced and deleted records are
+    accounted as garbage of their segment, and compacting a segment copies its
+    live records to the active segment. The compacted segment is retired, and
+    only removed after a quarantine, as clients may still be reading from it.
+    """
+
+    def __init__(self, root, max_segment_size=SEGMENT_SIZE):
+        self.root = root
+        self.dir = os.path.join(root, SEGMENT_DIRNAME)
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_segment_size = max_segment_size
+
+        # bytes written and bytes of garbage, by segment
+        self.sizes = {}
+        for fname in os.listdir(self.dir):
+            name, ext = os.path.splitext(fname)
+            if ext == SEGMENT_SUFFIX and name.isdigit():
+                self.sizes[int(name)] = os.path.getsize(os.path.join(self.dir, fname))
+        self.garbage = dict.fromkeys(self.sizes, 0)
+        # segments that have been compacted, by time of retirement
+        self.retired = OrderedDict()
+
+        # Records are only appended to segments created by this process.
+        self.next_segment = max(self.sizes, default=-1) + 1
+        self.active = None
+        self.active_file = None
+
+    def path(self, segment):
+        return segment_path(self.root, segment)
+
+    def append(self, filename, blob):
+        "Append the blob of an object to the active segment. Returns the segment and the position of the blob."
+        size = record_size(blob)
+        if self.active_file is None or \
+                (self.sizes[self.active] and self.sizes[self.active] + size > self.max_segment_size):
+            self._open_next()
+        position = self.sizes[self.active] + RECORD_HEADER.size
+        self.active_file.write(RECORD_HEADER.pack(bytes.fromhex(filename), len(blob)) + blob)
+        # Clients read the record as soon as it is in the index
+        self.active_file.flush()
+        self.sizes[self.active] += size
+        return self.active, position
+
+    def _open_next(self):
+        if self.active_file is not None:
+            self.active_file.close()
+        self.active = self.next_segment
+        self.next_segment += 1
+        self.active_file = open(self.path(self.active), "ab")
+        self.sizes[self.active] = 0
+        self.garbage[self.active] = 0
+
+    def release(self, segment, size):
+        "Account a record that is not referenced anymore as garbage."
+        if segment in self.garbage:
+            self.garbage[segment] += size
+
+    def compactable(self, threshold=COMPACTION_THRESHOLD):
+        "Sealed segments with enough garbage to be compacted"
+        return [segment for segment, size in self.sizes.items()
+                if segment != self.active and segment not in self.retired
+                and size and self.garbage[segment] >= size * threshold]
+
+    def retire(self, segment):
+        self.retired[segment] = time.time()
+
+    def remove_retired(self, quarantine):
+        "Remove the retired segments that are past their quarantine. Returns the removed segments."
+        limit = time.time() - quarantine
+        removed = []
+        for segment, tstamp in list(self.retired.items()):
+            if tstamp >= limit:
+                break
+            self.remove(segment)
+            removed.append(segment)
+        return removed
+
+    def remove(self, segment):
+        try:
+            os.unlink(self.path(segment))
+        except FileNotFoundError:
+            pass
+        self.sizes.pop(segment, None)
+        self.garbage.pop(segment, None)
+        self.retired.pop(segment, None)
+
+    def close(self):
+        if self.active_file is not None:
+            self.active_file.close()
+            self.active_file = None
@@ -5,14 +5,16 @@ import json
 import uuid
 import time
 import fcntl
+import selectors
+import threading
 import multiprocessing
 from datetime import datetime
 from collections import deque
 from itertools import chain
 import time
 
-from .cache_worker import execute_action
-from .cache_async_client import OP_WORKER_CREATE, OP_WORKER_TERMINATE
+from .cache_worker import ActionWorkerPool, execute_action
+from .cache_async_client import OP_WORKER_CREATE, OP_WORKER_TERMINATE, OP_KEYS_READY, OP_OBJECTS_DELETED
 
 import sys
 
@@ -28,15 +30,51 @@ from .cache_store import CacheStore, \
     is_safely_readable
 
 
+# Messages are sent from the scheduler loop, the pool callbacks and the
+# store sweeper, so every line has to be written at once. Worker processes
+# do not share this stdout, their messages and output are relayed by the pool.
+stdout_lock = threading.Lock()
+
+
+def _reset_stdout_lock():
+    # A forked child only runs the forking thread, so a lock held by any other thread would never be released.
+    global stdout_lock
+    stdout_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_stdout_lock)
+
+
+def write_line(line: str):
+    with stdout_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
 def send_message(op: str, data: dict):
-    print(json.dumps({
+    write_line(json.dumps({
         'op': op,
         **data
-    }), flush=True)
+    }))
+
+
+# Worker processes are replaced once their peak memory has grown by this many bytes since their first action
+CACHE_WORKER_MAX_RSS_GROWTH = int(os.environ.get("CACHE_WORKER_MAX_RSS_GROWTH", 512 * 1024 * 1024))
+# Worker processes running an action for longer than this many seconds are killed, 0 disables the timeout
+CACHE_ACTION_TIMEOUT = int(os.environ.get("CACHE_ACTION_TIMEOUT", 20 * 60))
+# Interval in seconds for logging the number of workers and pending requests
+STATS_INTERVAL = 30
+# Maximum number of paths per objects_deleted message, to keep the messages short
+OBJECTS_DELETED_BATCH_SIZE = 1000
+
 
+def objects_deleted(paths):
+    for i in range(0, len(paths), OBJECTS_DELETED_BATCH_SIZE):
+        send_message(OP_OBJECTS_DELETED, {'paths': paths[i:i + OBJECTS_DELETED_BATCH_SIZE]})
 
-CACHE_PROCESS_POOL_REFRESH_DURATION = int(os.environ.get("CACHE_PROCESS_POOL_REFRESH_DURATION", 20 * 60))
-CACHE_PROCESS_POOL_FORCE_REFRESH_DURATION = int(os.environ.get("CACHE_PROCESS_POOL_FORCE_REFRESH_DURATION", 2 * 60))
+
+def init_worker_process():
+    echo("Init process %s pid: %s" % (multiprocessing.current_process().name, os.getpid()))
 
 
 class CacheServerException(Exception):
@@ -45,7 +83,7 @@ class CacheServerException(Exception):
 
 def echo(msg):
     now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')
-    sys.stdout.write('CACHE [%s] %s\n' % (now, msg))
+    write_line('CACHE [%s] %s' % (now, msg))
 
 
 class MessageReader(object):
@@ -56,12 +94,14 @@ class MessageReader(object):
         fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
         self.buf = io.BytesIO()
         self.fd = fd
+        self.eof = False
 
     def messages(self):
         while True:
             try:
                 b = os.read(self.fd, 65536)
                 if not b:
+                    self.eof = True
                     return
             except OSError as e:
                 if e.errno == 11:  # EAGAIN
@@ -122,25 +162,27 @@ class Worker(object):
 
     def start(self):
         keys = self.request['keys']
-        ex_paths = map(self.filestore.object_path, keys)
-        ex_keys = {key: path for key, path in zip(keys, ex_paths)
-                   if is_safely_readable(path)}
-
-        with open(os.path.join(self.tempdir, 'request.json'), 'w') as f:
-            stream = self.request['stream_key']
-            request = {
-                'message': self.request['message'],
-                'keys': {key: key_filename(key) for key in keys},
-                'existing_keys': ex_keys,
-                'stream_key': key_filename(stream) if stream else None,
-                'invalidate_cache': self.request.get('invalidate_cache', False)
-            }
-            json.dump(request, f)
+        ex_paths = {key: self.filestore.object_path(key) for key in keys}
+        # Existing objects are passed to the action by path, or by location if they are packed
+        packed = self.filestore.locate(ex_paths.values())
+        ex_keys = {key: packed.get(path, path) for key, path in ex_paths.items()
+                   if path in packed or is_safely_readable(path)}
+        self.filestore.touch(ex_paths[key] for key in ex_keys)
+
+        stream = self.request['stream_key']
+        request = {
+            'message': self.request['message'],
+            'keys': {key: key_filename(key) for key in keys},
+            'existing_keys': ex_keys,
+            'stream_key': key_filename(stream) if stream else None,
+            'notify_key': stream,
+            'invalidate_cache': self.request.get('invalidate_cache', False)
+        }
 
         send_message(OP_WORKER_CREATE, self._worker_details())
 
         self.pool.apply_async(
-            func=execute_action, args=(self.tempdir, self.request['action'], 'request.json'),
+            func=execute_action, args=(self.tempdir, self.request['action'], request),
             callback=self._callback, error_callback=self._error_callback)
 
     def _callback(self, res):
@@ -176,6 +218,11 @@ class Worker(object):
             self.echo("failed to produce the following keys: %s"
                       % ','.join(missing))
 
+        send_message(OP_KEYS_READY, {
+            'stream_key': self.request['stream_key'],
+            'keys': [key for key in self.request['keys'] if key not in missing]
+        })
+
         self.filestore.close_tempdir(self.tempdir)
 
         send_message(OP_WORKER_TERMINATE, self._worker_details())
@@ -202,15 +249,26 @@ class Scheduler(object):
         self.actions = []
         self.workers = []
 
-        self.pool = multiprocessing.Pool(
+        # Worker callbacks run in a thread of the pool, and wake up the loop
+        # by writing to this pipe.
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.stdin_fileno, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ)
+
+        # Worker processes are long-lived, so that actions can keep warm per-process
+        # caches, e.g. of the Metaflow client and datastores.
+        self.pool = ActionWorkerPool(
             processes=max_workers,
-            initializer=self.init_process,
-            maxtasksperchild=512,  # Recycle each worker once 512 tasks have been completed
+            initializer=init_worker_process,
+            max_rss_growth=CACHE_WORKER_MAX_RSS_GROWTH,
+            task_timeout=CACHE_ACTION_TIMEOUT,
+            message_callback=send_message,
+            output_callback=write_line,
         )
-        self._pool_started_on = time.time()
-
-    def init_process(self):
-        echo("Init process %s pid: %s" % (multiprocessing.current_process().name, os.getpid()))
 
     def process_incoming_request(self):
         for msg in self.stdin_reader.messages():
@@ -220,6 +278,9 @@ class Scheduler(object):
 
             if op == 'ping':
                 pass
+            elif op == 'touch':
+                # Keys read by the client
+                self.filestore.touch(map(self.filestore.object_path, msg['keys']))
             elif op == 'init':
                 actions = msg['message']['actions']
                 self.validate_actions(actions)
@@ -250,93 +311,78 @@ class Scheduler(object):
                                            % (mod_str, cls_str))
 
     def schedule(self):
+        "Start workers for queued requests, as many as there are free slots in the pool."
         def queued_request(queue):
-            while queue:
+            while queue and len(self.workers) < self.max_workers:
                 yield queue.popleft()
 
         for request in chain(queued_request(self.hi_prio_requests),
                              queued_request(self.lo_prio_requests)):
             worker = Worker(request, self.filestore, self.pool, self._callback, self._error_callback)
+            # The worker is added before it is started, as its callback may run before start() returns.
+            self.workers.append(worker)
             try:
                 if worker.tempdir:
                     worker.start()
-                    return worker
+                    continue
             except Exception as ex:
                 echo("Failed to start worker %s" % ex)
 
+            self.workers.remove(worker)
+            self.pending_requests.discard(request['idempotency_token'])
             send_message(OP_WORKER_TERMINATE, worker._worker_details())
-            return None
+
+    def wakeup(self):
+        try:
+            os.write(self.wakeup_w, b'\0')
+        except BlockingIOError:
+            # The pipe is full, so the loop is going to wake up anyway.
+            pass
+
+    def drain_wakeups(self):
+        try:
+            while os.read(self.wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
 
     def verify_stale_workers(self):
-        time_to_pool_refresh = CACHE_PROCESS_POOL_REFRESH_DURATION - (time.time() - self._pool_started_on)
-        # active_pids = ",".join([f"{c.name}[{c.pid}]" for c in multiprocessing.active_children()])
         echo(
-            "number of workers: %d, number of pending requests: %d; Pool Refresh in : %d" % (
-                len(self.workers), len(self.pending_requests), time_to_pool_refresh)
+            "number of workers: %d, number of pending requests: %d, worker processes recycled: %d" % (
+                len(self.workers), len(self.pending_requests), self.pool.recycled)
         )
 
-    def cleanup_if_necessary(self):
-        time_to_pool_refresh = CACHE_PROCESS_POOL_REFRESH_DURATION - (time.time() - self._pool_started_on)
-        if time_to_pool_refresh > 0:
-            return
-        # if workers are still running 30 seconds after the pool refresh timeout, then cleanup
-        no_workers_are_running = len(self.workers) == 0 and len(self.pending_requests) == 1
-        pool_needs_refresh = time_to_pool_refresh <= 0
-        pool_force_refresh = time_to_pool_refresh < - CACHE_PROCESS_POOL_FORCE_REFRESH_DURATION
-        if pool_force_refresh:
-            echo("Refreshing the pool as no workers are running and no pending requests are there.")
-            self.cleanup_workers()
-        elif no_workers_are_running and pool_needs_refresh:
-            echo("Refreshing the pool as no workers are running and no pending requests are there.")
-            self.cleanup_workers()
-
-    def cleanup_workers(self):
-        for worker in self.workers:
-            worker.echo("Terminating worker")
-            worker.terminate()
-            self.pending_requests.remove(worker.request['idempotency_token'])
-        self.workers = []
-        self.cleanup_pool()
-
-    def cleanup_pool(self):
-        self.pool.terminate()
-        self.pool.join()
-        del self.pool
-        self.pool = multiprocessing.Pool(
-            processes=self.max_workers,
-            initializer=self.init_process,
-            maxtasksperchild=512,  # Recycle each worker once 512 tasks have been completed
-        )
-        self._pool_started_on = time.time()
-
     def loop(self):
-        def new_worker_from_request():
-            worker = self.schedule()
-            if worker:
-                self.workers.append(worker)
-                return worker
         _counter = time.time()
 
         while True:
+            # Block until there is input, a worker has finished, or periodic work is due.
+            timeout = _counter + STATS_INTERVAL - time.time()
+            for key, _ in self.selector.select(timeout=max(timeout, 0)):
+                if key.fd == self.wakeup_r:
+                    self.drain_wakeups()
+
             self.process_incoming_request()
-            new_worker_from_request()
-            if time.time() - _counter > 30:
+            if self.stdin_reader.eof and self.stdin_fileno in self.selector.get_map():
+                # No more requests can arrive, stop polling stdin so that select() does not spin.
+                self.selector.unregister(self.stdin_fileno)
+            self.schedule()
+            if time.time() - _counter > STATS_INTERVAL:
                 self.verify_stale_workers()
                 _counter = time.time()
 
-            self.cleanup_if_necessary()
-            time.sleep(0.1)
-
     def _callback(self, worker, res):
         token = worker.request['idempotency_token']
         self.pending_requests.remove(token)
         self.workers.remove(worker)
+        self.wakeup()
 
     def _error_callback(self, worker, res):
         echo("Error from worker %s" % worker.uuid)
         token = worker.request['idempotency_token']
         self.pending_requests.remove(token)
         self.workers.remove(worker)
+        self.wakeup()
 
 
 @click.command()
@@ -349,13 +395,17 @@ class Scheduler(object):
 @click.option("--max-size",
               default=10000,
               help="Maximum amount of disk space to use in bytes.")
+@click.option("--pack-threshold",
+              default=0,
+              help="Maximum size in bytes of objects packed into segment files, 0 disables packing.")
 def cli(root=None,
         max_actions=None,
-        max_size=None):
+        max_size=None,
+        pack_threshold=None):
     # NOTE: The store will only be accessed by this process. The processes
     # in the pool never touch the store itself. This is done in the __init__ and
     # terminate methods in Worker which all happen in this process.
-    store = CacheStore(root, max_size, echo)
+    store = CacheStore(root, max_size, echo, on_mark_deleted=objects_deleted, pack_threshold=pack_threshold)
     Scheduler(store, max_actions).loop()
 
 
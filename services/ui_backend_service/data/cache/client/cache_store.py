@@ -2,14 +2,26 @@ import math
 import os
 import time
 import shutil
+import sqlite3
 import hashlib
 import tempfile
+import threading
 
 from collections import OrderedDict
 
+from .cache_segments import Segments, SEGMENT_DIRNAME, record_size, read_record, segment_path
+
+# Objects marked for deletion have this mtime, so that clients know not to read them anymore.
 TIMESTAMP_FOR_DELETABLE = 1
+# Disposable objects used to be marked with this mtime. It is only read when
+# building the index of a cache root that does not have one yet.
 TIMESTAMP_FOR_DISPOSABLE = 10
 GC_MARKER_QUARANTINE = 60
+# Seconds between background GC sweeps, sweeps also run as soon as the store grows past its watermark.
+GC_SWEEP_INTERVAL = 5
+INDEX_FILENAME = "index.sqlite"
+# Maximum number of paths per query of the index, below the limit of sqlite on query parameters.
+INDEX_QUERY_BATCH_SIZE = 500
 
 
 class CacheFullException(Exception):
@@ -33,9 +45,9 @@ def key_filename(key):
 
 
 def object_path(root, key):
+    # Two levels of directories keep the number of entries per directory low.
     hsh = key_filename(key)
-    prefix = hsh[:2]
-    return os.path.join(root, prefix, hsh)
+    return os.path.join(root, hsh[:2], hsh[2:4], hsh)
 
 
 def stream_path(root, key):
@@ -61,27 +73,174 @@ def filesize(path):
         return None
 
 
+class CacheIndex(object):
+    """
+    Persistent index of the objects of a cache store, kept in an sqlite database.
+
+    Each object is recorded by path with its size, whether it is disposable,
+    the time it was last accessed and the time it was marked for deletion.
+    Packed objects also record the segment and the position and length of
+    their blob, the path of a packed object is the path it would have as a file.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.root = os.path.dirname(path)
+        if readonly:
+            self.db = sqlite3.connect("file:%s?mode=ro" % path, uri=True, check_same_thread=False)
+            return
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "path TEXT PRIMARY KEY, "
+            "size INTEGER NOT NULL, "
+            "disposable INTEGER NOT NULL, "
+            "last_access REAL NOT NULL, "
+            "marked_at REAL, "
+            "segment INTEGER, "
+            "position INTEGER, "
+            "length INTEGER)"
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(objects)")}
+        for column in ("segment", "position", "length"):
+            if column not in columns:
+                self.db.execute("ALTER TABLE objects ADD COLUMN %s INTEGER" % column)
+
+    def is_empty(self):
+        return self.db.execute("SELECT 1 FROM objects LIMIT 1").fetchone() is None
+
+    def load(self):
+        "Returns (path, size, disposable, last_access, marked_at, segment) rows, from the least recently accessed object"
+        return self.db.execute(
+            "SELECT path, size, disposable, last_access, marked_at, segment FROM objects ORDER BY last_access"
+        )
+
+    def put(self, rows):
+        "Insert or replace (path, size, disposable, last_access, segment, position, length) rows"
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO objects (path, size, disposable, last_access, marked_at, segment, position, length) "
+                "VALUES (?, ?, ?, ?, NULL, ?, ?, ?)", rows)
+
+    def locate(self, paths):
+        """
+        Returns the location of the packed objects among `paths` that are not marked
+        for deletion, as (segment path, position, length, file name) by path.
+        """
+        paths = list(paths)
+        locations = {}
+        for i in range(0, len(paths), INDEX_QUERY_BATCH_SIZE):
+            batch = paths[i:i + INDEX_QUERY_BATCH_SIZE]
+            rows = self.db.execute(
+                "SELECT path, segment, position, length FROM objects "
+                "WHERE path IN (%s) AND segment IS NOT NULL AND marked_at IS NULL" % ",".join("?" * len(batch)),
+                batch)
+            for path, segment, position, length in rows:
+                locations[path] = (segment_path(self.root, segment), position, length, os.path.basename(path))
+        return locations
+
+    def packed(self, segment):
+        "Returns (path, position, length, marked_at) rows of the objects packed in a segment"
+        return self.db.execute(
+            "SELECT path, position, length, marked_at FROM objects WHERE segment = ?", (segment,)
+        ).fetchall()
+
+    def move(self, rows):
+        "Update the location of (segment, position, path) rows"
+        with self.db:
+            self.db.executemany("UPDATE objects SET segment = ?, position = ? WHERE path = ?", rows)
+
+    def touch(self, rows):
+        "Update the access time of (last_access, path) rows"
+        with self.db:
+            self.db.executemany("UPDATE objects SET last_access = ? WHERE path = ?", rows)
+
+    def mark(self, rows):
+        "Record the deletion marker of (marked_at, path) rows"
+        with self.db:
+            self.db.executemany("UPDATE objects SET marked_at = ? WHERE path = ?", rows)
+
+    def delete(self, paths):
+        with self.db:
+            self.db.executemany("DELETE FROM objects WHERE path = ?", ((path,) for path in paths))
+
+    def close(self):
+        self.db.close()
+
+
+class PackedObjects(object):
+    """
+    Read access to the packed objects of a cache store, for the clients of the cache server.
+
+    The index is opened once the cache server has created it. Lookups fail
+    softly, as clients fall back to requesting the objects from the server.
+    """
+
+    def __init__(self, root):
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self.index = None
+
+    def locate(self, paths):
+        paths = list(paths)
+        if not paths:
+            return {}
+        try:
+            if self.index is None:
+                if not os.path.exists(self.index_path):
+                    return {}
+                self.index = CacheIndex(self.index_path, readonly=True)
+            return self.index.locate(paths)
+        except sqlite3.Error:
+            return {}
+
+
 class CacheStore(object):
-    def __init__(self, root, max_size, echo, fill_factor=0.8):
+    def __init__(self, root, max_size, echo, fill_factor=0.8, on_mark_deleted=None, sweep_interval=GC_SWEEP_INTERVAL,
+                 pack_threshold=0):
         self.root = os.path.abspath(root)
         self.tmproot = self._init_temp(self.root)
         self.echo = echo
         self.active_streams = {}
+        # Called with the paths of the objects marked for deletion by the GC
+        self.on_mark_deleted = on_mark_deleted
 
-        # GC state
+        # GC state. The object queues are ordered from the least to the most
+        # recently accessed object, the gc_queue by time of marking.
         self.objects_queue = OrderedDict()
         self.disposables_queue = OrderedDict()
         self.gc_queue = OrderedDict()
+        # Access times that have not been written to the index yet, by path
+        self.accessed = {}
+        # Objects of at most pack_threshold bytes are packed into segments
+        # instead of being stored as files. Segments of packed objects, by path.
+        self.pack_threshold = pack_threshold
+        self.segments = Segments(self.root)
+        self.packed = {}
+        # Commits run in a thread of the worker pool, and GC in the sweeper thread.
+        self.lock = threading.RLock()
 
         self.total_size = 0
         self.max_size = max_size
         self.gc_watermark = max_size * fill_factor
 
+        self.index = CacheIndex(os.path.join(self.root, INDEX_FILENAME))
         self._init_gc(self.root)
 
+        self.sweep_interval = sweep_interval
+        self.sweep_requested = threading.Event()
+        self.sweeper = threading.Thread(target=self._sweep, name="CacheStoreSweeper", daemon=True)
+        self.sweeper.start()
+
     def object_path(self, key):
         return object_path(self.root, key)
 
+    def locate(self, paths):
+        "Returns the location of the packed objects among `paths`, see CacheIndex.locate()"
+        with self.lock:
+            return self.index.locate(paths)
+
     def warn(self, ex, msg):
         self.echo("IO ERROR: (%s) %s" % (ex, msg))
 
@@ -93,10 +252,61 @@ class CacheStore(object):
         return tmproot
 
     def _init_gc(self, root):
-        objects = []
-        for dirr, _, files in os.walk(root):
+        if self.index.is_empty():
+            # The cache root has no index yet, or it is empty.
+            self._index_existing_objects(root)
+
+        marked = []
+        live_sizes = {}
+        for path, size, disposable, _, marked_at, segment in self.index.load():
+            if segment is not None:
+                self.packed[path] = segment
+                live_sizes[segment] = live_sizes.get(segment, 0) + size
+            if marked_at is not None:
+                marked.append(path)
+                self.gc_queue[path] = (marked_at, size)
+            elif disposable:
+                self.disposables_queue[path] = size
+            else:
+                self.objects_queue[path] = size
+            self.total_size += size
+
+        # Bytes of the segments that are not referenced by the index are garbage,
+        # and segments without any object can be removed right away.
+        for segment, size in list(self.segments.sizes.items()):
+            if segment in live_sizes:
+                self.segments.garbage[segment] = size - live_sizes[segment]
+            else:
+                self.segments.remove(segment)
+
+        # It is possible that the datastore contains more than gc_watermark
+        # bytes. To ensure that we start below the gc_watermark, we run the GC.
+        # We assume that no clients are accessing the objects since the server
+        # hasn't started yet, so we can safely delete the marked objects without
+        # a quarantine:
+        self._gc_objects(quarantine=-1)
+        self._gc_objects(quarantine=-1)
+
+        self.warn(
+            None,
+            "Cache initialized with %d permanents objects, "
+            "%d disposable objects (%d packed in %d segments), totaling %d bytes."
+            % (len(self.objects_queue), len(self.disposables_queue), len(self.packed),
+               len(self.segments.sizes), self.total_size)
+        )
+
+    def _index_existing_objects(self, root):
+        "Build the index from the files of the cache root, reading the state of the objects from their mtime."
+        rows = []
+        index_files = frozenset(self.index.path + suffix for suffix in ("", "-wal", "-shm", "-journal"))
+        for dirr, dirnames, files in os.walk(root):
+            if dirr == root and SEGMENT_DIRNAME in dirnames:
+                # Packed objects can only be found through the index
+                dirnames.remove(SEGMENT_DIRNAME)
             for fname in files:
                 path = os.path.join(dirr, fname)
+                if path in index_files:
+                    continue
                 if os.path.islink(path):
                     self.safe_fileop(os.unlink, path)
                 else:
@@ -105,80 +315,137 @@ class CacheStore(object):
                     if stat_res and sz is not None:
                         _, info = stat_res
                         if info.st_mtime == TIMESTAMP_FOR_DELETABLE:
-                            # If we can't unlink it, we add it to the gc_queue
-                            # to try at least another time
-                            if not self.safe_fileop(os.unlink, path):
-                                self.gc_queue[path] = (time.time(), sz)
-                        elif info.st_mtime == TIMESTAMP_FOR_DISPOSABLE:
-                            self.disposables_queue[path] = sz
+                            self.safe_fileop(os.unlink, path)
                         else:
-                            objects.append((info.st_mtime, (path, sz)))
-
-        self.objects_queue.update(x for _, x in sorted(objects))
-        self.total_size = sum(self.disposables_queue.values()) + sum(
-            self.objects_queue.values()
-        )
-
-        # It is possible that the datastore contains more than gc_watermark
-        # bytes. To ensure that we start below the gc_watermark, we run the GC:
-        self._gc_objects()
-        # the above method may have marked objects for deletion. We assume that
-        # no clients are accessing the objects since the server hasn't started
-        # yet, so we can safely delete the marked objects without a quarantine:
-        self._gc_objects(quarantine=-1)
+                            disposable = info.st_mtime == TIMESTAMP_FOR_DISPOSABLE
+                            rows.append((path, sz, int(disposable), info.st_mtime, None, None, None))
+        if rows:
+            self.index.put(rows)
+
+    def _sweep(self):
+        while True:
+            self.sweep_requested.wait(self.sweep_interval)
+            self.sweep_requested.clear()
+            try:
+                self._gc_objects()
+                self._compact_segments()
+                self._flush_accessed()
+            except Exception as ex:
+                self.warn(ex, "Cache GC sweep failed")
 
-        self.warn(
-            None,
-            "Cache initialized with %d permanents objects, "
-            "%d disposable objects, totaling %d bytes."
-            % (len(self.objects_queue), len(self.disposables_queue), self.total_size)
-        )
+    def request_sweep(self):
+        "Wake up the sweeper thread if the store has grown past its watermark."
+        if self.total_size > self.gc_watermark:
+            self.sweep_requested.set()
 
     def _gc_objects(self, quarantine=GC_MARKER_QUARANTINE):
+        marked = []
+        deleted = []
+
         def mark_for_deletion(path, size):
-            if self.safe_fileop(
+            # Packed objects are only marked in the index
+            if path in self.packed or self.safe_fileop(
                 os.utime, path, (TIMESTAMP_FOR_DELETABLE, TIMESTAMP_FOR_DELETABLE)
             ):
                 self.gc_queue[path] = (time.time(), size)
-
-        # 1) delete marked objects that are past their quarantine period
-        limit = time.time() - quarantine
-        for path in list(self.gc_queue):
-            tstamp, size = self.gc_queue[path]
-            if tstamp < limit:
-                if self.safe_fileop(os.unlink, path):
-                    del self.gc_queue[path]
-                    self.total_size -= size
-                else:
-                    self.echo(
-                        "Could not remove file at '%s' -- removing from GC" % path
-                    )
+                marked.append(path)
+            else:
+                # The object is not there anymore
+                self.total_size -= size
+                deleted.append(path)
+
+        with self.lock:
+            # 1) delete marked objects that are past their quarantine period
+            limit = time.time() - quarantine
+            for path in list(self.gc_queue):
+                tstamp, size = self.gc_queue[path]
+                if tstamp < limit:
+                    if path in self.packed:
+                        self.segments.release(self.packed.pop(path), size)
+                    elif not self.safe_fileop(os.unlink, path):
+                        self.echo(
+                            "Could not remove file at '%s' -- removing from GC" % path
+                        )
                     # We still remove to prevent the garbage collector from
                     # being stuck a few lines below.
                     del self.gc_queue[path]
-            else:
-                break
-
-        # if there are still objects marked for deletion, we can just wait
-        # for them to age past quarantine. Without this check, we could GC
-        # objects too eagerly during the quarantine period.
-        if not self.gc_queue:
-
-            # 2) if we are still using too much space, mark disposable
-            # objects for deletion
-            unmarked_size = self.total_size
-            while self.disposables_queue and unmarked_size > self.gc_watermark:
-                path, size = self.disposables_queue.popitem(last=False)
-                mark_for_deletion(path, size)
-                unmarked_size -= size
-
-            # 3) after we have exhausted all disposables, we need to start
-            # marking non-disposable objects for deletion, starting from the
-            # oldest.
-            while self.objects_queue and unmarked_size > self.gc_watermark:
-                path, size = self.objects_queue.popitem(last=False)
-                mark_for_deletion(path, size)
-                unmarked_size -= size
+                    self.total_size -= size
+                    deleted.append(path)
+                else:
+                    break
+
+            # if there are still objects marked for deletion, we can just wait
+            # for them to age past quarantine. Without this check, we could GC
+            # objects too eagerly during the quarantine period.
+            if not self.gc_queue:
+
+                # 2) if we are still using too much space, mark disposable
+                # objects for deletion
+                unmarked_size = self.total_size
+                while self.disposables_queue and unmarked_size > self.gc_watermark:
+                    path, size = self.disposables_queue.popitem(last=False)
+                    mark_for_deletion(path, size)
+                    unmarked_size -= size
+
+                # 3) after we have exhausted all disposables, we need to start
+                # marking non-disposable objects for deletion, starting from the
+                # least recently accessed.
+                while self.objects_queue and unmarked_size > self.gc_watermark:
+                    path, size = self.objects_queue.popitem(last=False)
+                    mark_for_deletion(path, size)
+                    unmarked_size -= size
+
+            if deleted:
+                self.index.delete(deleted)
+            if marked:
+                self.index.mark([(self.gc_queue[path][0], path) for path in marked])
+
+        if marked and self.on_mark_deleted:
+            self.on_mark_deleted(marked)
+
+    def _compact_segments(self, quarantine=GC_MARKER_QUARANTINE):
+        """
+        Copy the live objects of segments that are mostly garbage to the active
+        segment, and remove compacted segments once they are past their quarantine.
+        """
+        with self.lock:
+            for segment in self.segments.compactable():
+                moved = []
+                path_of_segment = self.segments.path(segment)
+                for path, position, length, marked_at in self.index.packed(segment):
+                    if marked_at is not None:
+                        # Marked objects are deleted from the index after their
+                        # quarantine, which ends before the one of the segment.
+                        continue
+                    try:
+                        blob = read_record(path_of_segment, position, length, os.path.basename(path))
+                    except Exception as ex:
+                        self.warn(ex, "Could not read packed object %s" % path)
+                        continue
+                    new_segment, new_position = self.segments.append(os.path.basename(path), blob)
+                    self.packed[path] = new_segment
+                    moved.append((new_segment, new_position, path))
+                if moved:
+                    self.index.move(moved)
+                self.segments.retire(segment)
+            self.segments.remove_retired(quarantine)
+
+    def touch(self, paths):
+        "Record an access of objects, so that the least recently accessed objects are deleted first."
+        now = time.time()
+        with self.lock:
+            for path in paths:
+                for queue in (self.objects_queue, self.disposables_queue):
+                    if path in queue:
+                        queue.move_to_end(path)
+                        self.accessed[path] = now
+                        break
+
+    def _flush_accessed(self):
+        with self.lock:
+            if self.accessed:
+                self.index.touch([(tstamp, path) for path, tstamp in self.accessed.items()])
+                self.accessed.clear()
 
     def ensure_path(self, path):
         "Ensures that the directory for a given path exists, creating it if missing."
@@ -194,13 +461,13 @@ class CacheStore(object):
                 self.warn(ex, "Could not create dir: %s" % dirr)
 
     def open_tempdir(self, token, action_name, stream_key):
-        self._gc_objects()
         if self.total_size > self.max_size:
             self.warn(
                 None,
                 "Cache soft limit reached! Used %d bytes, max %s bytes"
                 % (self.total_size, self.max_size),
             )
+        self.request_sweep()
 
         try:
             self.ensure_dir(self.tmproot)
@@ -233,7 +500,9 @@ class CacheStore(object):
                         self.warn(ex, "Unknown error")
                     else:
                         self.active_streams[tmp] = src
-                    return tmp
+                else:
+                    return None
+            return tmp
 
     def safe_fileop(self, fun, *args, **kwargs):
         try:
@@ -249,65 +518,87 @@ class CacheStore(object):
         self.safe_fileop(shutil.rmtree, tempdir)
 
     def commit(self, tempdir, keys, stream_key, disposable_keys, ephemeral_path=None):
-        def _insert(queue, key, value):
-            # we want to update the object's location in the
-            # OrderedDict, so we will need to delete any possible
-            # previous entry first
-            queue.pop(key, None)
-            queue[key] = value
-            # If we are inserting something in disposables_queue or objects_queue,
-            # we make sure it is no longer in the gc_queue. This can happen if, for
-            # example, an object is marked as deletable, is therefore not "readable"
-            # and is therefore re-created.
-            if key in self.gc_queue:
-                del self.gc_queue[key]
+        now = time.time()
+        rows = []
+
+        # Files replaced by packed objects, removed once the index points at the packed objects
+        replaced = []
+
+        def _insert(queue, path, size, location=(None, None, None)):
+            # An object may be replaced, or re-created after it was marked for
+            # deletion, so remove any previous entry of the path first. This
+            # also moves the object to the most recently accessed position.
+            previous = None
+            for q in (self.objects_queue, self.disposables_queue):
+                if path in q:
+                    previous = q.pop(path)
+            marked = self.gc_queue.pop(path, None)
+            if marked is not None:
+                previous = marked[1]
+            if previous is not None:
+                self.total_size -= previous
+                if path in self.packed:
+                    self.segments.release(self.packed.pop(path), previous)
+                elif location[0] is not None:
+                    replaced.append(path)
+            if location[0] is not None:
+                self.packed[path] = location[0]
+            queue[path] = size
+            self.total_size += size
+            self.accessed.pop(path, None)
+            rows.append((path, size, int(queue is self.disposables_queue), now) + location)
+
+        def _pack(src, key):
+            with open(src, "rb") as f:
+                blob = f.read()
+            segment, position = self.segments.append(key_filename(key), blob)
+            return record_size(blob), (segment, position, len(blob))
 
         disposables = frozenset(disposable_keys)
         missing = []
 
-        # note that by including stream_key in the commit list we
-        # will invalidate the corresponding symlink that points at
-        # a file in the temp directory. The dangling symlink will get
-        # removed in close_tempdir.
-        #
-        # The cache client is expected to fall back to the object_path
-        # when it detects an invalid symlink.
-        for key in keys + ([stream_key] if stream_key else []):
-            src = os.path.join(tempdir, key_filename(key))
-            if os.path.exists(src):
-                dst = object_path(self.root, key)
-                self.ensure_path(dst)
-                sz = filesize(src)
-                if sz is not None and self.safe_fileop(os.rename, src, dst):
-                    if key in disposables:
-                        # we proceed even if we fail to mark the object as
-                        # disposable. It just means that during a possible
-                        # restart the object is treated as a non-disposable
-                        # object
-                        tstamp = TIMESTAMP_FOR_DISPOSABLE
-                        self.safe_fileop(os.utime, dst, (tstamp, tstamp))
-                        _insert(self.disposables_queue, dst, sz)
-                    else:
-                        _insert(self.objects_queue, dst, sz)
-                    self.total_size += sz
-            else:
-                missing.append(key)
-
-        # Additionally, if the ephemeral path contains anything,
-        # we want to make sure that these objects are tracked for GC as well.
-        if ephemeral_path is not None and os.path.exists(ephemeral_path):
-            for dirpath, dirnames, files in os.walk(ephemeral_path):
-                for file in files:
-                    p = os.path.join(dirpath, file)
-                    sz = filesize(p)
-                    if sz is None:
-                        continue
-                    if p in self.objects_queue:
-                        # cover possible file size changes
-                        old_size = self.objects_queue[p]
-                        sz = (sz - old_size)
-                    self.total_size += sz
-                    _insert(self.objects_queue, p, sz)
-
-        self._gc_objects()
+        with self.lock:
+            # note that by including stream_key in the commit list we
+            # will invalidate the corresponding symlink that points at
+            # a file in the temp directory. The dangling symlink will get
+            # removed in close_tempdir.
+            #
+            # The cache client is expected to fall back to the object_path
+            # when it detects an invalid symlink.
+            for key in keys + ([stream_key] if stream_key else []):
+                src = os.path.join(tempdir, key_filename(key))
+                if os.path.exists(src):
+                    dst = object_path(self.root, key)
+                    queue = self.disposables_queue if key in disposables else self.objects_queue
+                    # Streams are read line by line from their file, so they are never packed.
+                    if key != stream_key and self.pack_threshold and os.path.getsize(src) <= self.pack_threshold:
+                        packed = self.safe_fileop(_pack, src, key)
+                        if packed:
+                            _insert(queue, dst, *packed[1])
+                            continue
+                    self.ensure_path(dst)
+                    sz = filesize(src)
+                    if sz is not None and self.safe_fileop(os.rename, src, dst):
+                        _insert(queue, dst, sz)
+                else:
+                    missing.append(key)
+
+            # Additionally, if the ephemeral path contains anything,
+            # we want to make sure that these objects are tracked for GC as well.
+            if ephemeral_path is not None and os.path.exists(ephemeral_path):
+                for dirpath, dirnames, files in os.walk(ephemeral_path):
+                    for file in files:
+                        p = os.path.join(dirpath, file)
+                        sz = filesize(p)
+                        if sz is None:
+                            continue
+                        _insert(self.objects_queue, p, sz)
+
+            if rows:
+                self.index.put(rows)
+
+            for path in replaced:
+                self.safe_fileop(os.unlink, path)
+
+        self.request_sweep()
         return missing
@@ -1,34 +1,71 @@
 import os
+import sys
 import json
+import time
+import resource
+import threading
+import multiprocessing
 
 import signal
 
+from collections import deque
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+
 from .cache_action import import_action_class_spec
+from .cache_async_client import OP_STREAM_CHUNK
+from .cache_segments import read_record
+
+# Messages sent by worker processes to their pool
+MSG_RESULT = 'result'
+MSG_NOTIFY = 'notify'
+
+# Connection of a worker process to its pool
+_pool_conn = None
+
+
+def notify(op, data):
+    """
+    Send a message to the clients of the cache server from a worker process.
+
+    The stdout of the cache server carries its messages to the clients, so
+    worker processes do not write to it. The message is relayed by the pool.
+    """
+    _pool_conn.send((MSG_NOTIFY, (op, data)))
 
 
 def best_effort_read(key_paths):
     for key, path in key_paths:
         try:
-            with open(path, 'rb') as f:
-                yield key, f.read()
+            if isinstance(path, list):
+                # location of a packed object
+                yield key, read_record(*path)
+            else:
+                with open(path, 'rb') as f:
+                    yield key, f.read()
         except:
             pass
 
 
-def execute_action(tempdir, action_spec, request_file, timeout=0):
+# Action classes imported by this process, by action spec
+_action_classes = {}
+
+
+def execute_action(tempdir, action_spec, request, timeout=0):
     def timeout_handler(signum, frame):
         raise WorkerTimeoutException()
 
     signal.signal(signal.SIGALRM, timeout_handler)
     signal.alarm(timeout)  # Activate timeout, 0 = no timeout
 
-    action_cls = import_action_class_spec(action_spec)
-    with open(os.path.join(tempdir, request_file)) as f:
-        request = json.load(f)
-
-    execute(tempdir, action_cls, request)
+    action_cls = _action_classes.get(action_spec)
+    if action_cls is None:
+        action_cls = _action_classes[action_spec] = import_action_class_spec(action_spec)
 
-    signal.alarm(0)  # Disable timeout
+    try:
+        execute(tempdir, action_cls, request)
+    finally:
+        signal.alarm(0)  # Disable timeout
 
 
 def execute(tempdir, action_cls, req):
@@ -40,6 +77,8 @@ def execute(tempdir, action_cls, req):
 
             def stream_output(obj):
                 stream.write(json.dumps(obj) + '\n')
+                # Notify clients of new events
+                notify(OP_STREAM_CHUNK, {'stream_key': req.get('notify_key')})
         else:
             stream_output = None
 
@@ -74,3 +113,263 @@ def execute(tempdir, action_cls, req):
 
 class WorkerTimeoutException(Exception):
     pass
+
+
+class WorkerProcessDied(Exception):
+    pass
+
+
+def max_rss():
+    "Peak resident set size of this process in bytes"
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# Worker processes are started by a fork server. It is a single threaded process, unlike the
+# cache server, whose threads may hold locks at the time of a fork that would stay held in the child.
+# Workers only receive their own end of a pipe, and see it end once the server exits.
+_context = multiprocessing.get_context("forkserver")
+# Workers start from a fork server that has imported the cache modules, instead of importing them again.
+_context.set_forkserver_preload([__name__])
+
+
+def _worker_main(conn, output, initializer, max_rss_growth):
+    global _pool_conn
+    _pool_conn = conn
+    # Output of the worker is relayed line by line by the pool
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(output.fileno(), sys.stdout.fileno())
+    os.dup2(output.fileno(), sys.stderr.fileno())
+    output.close()
+    sys.stdout.reconfigure(line_buffering=True)
+
+    if initializer:
+        initializer()
+
+    baseline = None
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            return
+        try:
+            ok, value = True, func(*args)
+        except Exception as ex:
+            ok, value = False, ex
+
+        # Memory held by warm caches after the first action is the baseline
+        rss = max_rss()
+        if baseline is None:
+            baseline = rss
+        recycle = rss - baseline > max_rss_growth
+        try:
+            conn.send((MSG_RESULT, (ok, value, recycle)))
+        except Exception as ex:
+            # The result or exception can not be pickled
+            conn.send((MSG_RESULT, (False, Exception(repr(ex)), recycle)))
+        if recycle:
+            return
+
+
+class ActionWorkerPool(object):
+    """
+    Long-lived processes that execute cache actions, with the interface of
+    `multiprocessing.Pool.apply_async`.
+
+    Processes are kept across actions, so that the state actions keep per
+    process, like the Metaflow client and datastore caches, stays warm. A
+    process is only replaced once its peak memory has grown by more than
+    `max_rss_growth` bytes since its first action, when it dies, or when
+    an action runs for longer than `task_timeout` seconds (0 = no timeout).
+
+    Worker processes send messages with `notify`, which are passed to the
+    `message_callback` of the pool before the result of the task. The stdout
+    and stderr of worker processes are relayed to the `output_callback` of
+    the pool, one line at a time.
+
+    Callbacks run in the result handler thread of the pool. The initializer
+    is pickled for the worker processes, so it has to be a module level function.
+    """
+
+    def __init__(self, processes, initializer=None, max_rss_growth=512 * 1024 * 1024, task_timeout=0,
+                 message_callback=None, output_callback=print):
+        self.initializer = initializer
+        self.message_callback = message_callback
+        self.output_callback = output_callback
+        self.max_rss_growth = max_rss_growth
+        self.task_timeout = task_timeout
+        self.lock = threading.Lock()
+
+        # Process by connection. Connections are idle, or busy with
+        # (callback, error_callback, started_on) of their task.
+        self.processes = {}
+        self.idle = deque()
+        self.busy = {}
+        self.pending = deque()
+        self.recycled = 0
+        self.closed = False
+
+        # Wakes up the result handler when a task is dispatched
+        self.wakeup_r, self.wakeup_w = Pipe(duplex=False)
+        # Unterminated output of the worker processes, by output pipe
+        self.outputs = {}
+        for _ in range(processes):
+            conn, process = self._start()
+            self.processes[conn] = process
+            self.idle.append(conn)
+
+        self.result_handler = threading.Thread(target=self._handle_results, name="ActionWorkerPoolResults", daemon=True)
+        self.result_handler.start()
+
+    def _start(self):
+        conn, child_conn = Pipe()
+        # Every process has its own output pipe, so that its lines are not interleaved with the lines of others
+        output_r, output_w = Pipe(duplex=False)
+        process = _context.Process(target=_worker_main,
+                                   args=(child_conn, output_w, self.initializer, self.max_rss_growth),
+                                   daemon=True)
+        process.start()
+        child_conn.close()
+        output_w.close()
+        with self.lock:
+            self.outputs[output_r] = b''
+        return conn, process
+
+    def _retire(self, conn):
+        "Remove a process from the pool. Must be called with the lock held, the process is replaced after releasing it."
+        process = self.processes.pop(conn)
+        conn.close()
+        if process.is_alive():
+            process.terminate()
+        self.recycled += 1
+        return process
+
+    def _replace(self, retired):
+        "Reap retired processes and start their replacements, without holding the lock."
+        while retired:
+            for process in retired:
+                process.join(1)
+            started = [] if self.closed else [self._start() for _ in retired]
+            with self.lock:
+                if self.closed:
+                    for conn, process in started:
+                        conn.close()
+                        process.terminate()
+                    return
+                for conn, process in started:
+                    self.processes[conn] = process
+                    self.idle.append(conn)
+                retired = self._dispatch()
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        with self.lock:
+            self.pending.append((func, args, callback, error_callback))
+            retired = self._dispatch()
+        self._replace(retired)
+
+    def _dispatch(self):
+        "Send pending tasks to idle processes, returns the processes that turned out to be gone"
+        dispatched = False
+        retired = []
+        while self.pending and self.idle:
+            conn = self.idle.popleft()
+            func, args, callback, error_callback = self.pending.popleft()
+            try:
+                conn.send((func, args))
+            except Exception:
+                # The process is gone, retry the task with another one
+                self.pending.appendleft((func, args, callback, error_callback))
+                retired.append(self._retire(conn))
+                continue
+            self.busy[conn] = (callback, error_callback, time.time())
+            dispatched = True
+        if dispatched:
+            self.wakeup_w.send_bytes(b'')
+        return retired
+
+    def _handle_results(self):
+        while not self.closed:
+            with self.lock:
+                conns = list(self.busy)
+                outputs = list(self.outputs)
+                deadlines = [started_on + self.task_timeout for _, _, started_on in self.busy.values()]
+            timeout = None
+            if self.task_timeout and deadlines:
+                timeout = max(min(deadlines) - time.time(), 0)
+
+            for conn in wait(conns + outputs + [self.wakeup_r], timeout):
+                if conn is self.wakeup_r:
+                    conn.recv_bytes()
+                    continue
+                if conn in outputs:
+                    self._relay_output(conn)
+                    continue
+                try:
+                    msg, data = conn.recv()
+                except (EOFError, OSError) as ex:
+                    msg, data = MSG_RESULT, (False, WorkerProcessDied(str(ex)), True)
+                if msg == MSG_NOTIFY:
+                    if self.message_callback:
+                        self.message_callback(*data)
+                    continue
+                self._finish(conn, *data)
+
+            if self.task_timeout:
+                with self.lock:
+                    expired = [conn for conn, (_, _, started_on) in self.busy.items()
+                               if time.time() - started_on > self.task_timeout]
+                for conn in expired:
+                    self._finish(conn, False, WorkerTimeoutException(), True)
+
+    def _relay_output(self, output):
+        "Pass the complete lines written by a worker process to the output callback"
+        try:
+            data = os.read(output.fileno(), 65536)
+        except OSError:
+            data = b''
+        with self.lock:
+            buf = self.outputs[output] + data
+            if data:
+                *lines, self.outputs[output] = buf.split(b'\n')
+            else:
+                # The process has exited
+                lines = [buf] if buf else []
+                del self.outputs[output]
+                output.close()
+        for line in lines:
+            if self.output_callback:
+                self.output_callback(line.decode('utf-8', errors='replace'))
+
+    def _finish(self, conn, ok, value, recycle):
+        with self.lock:
+            if conn not in self.busy:
+                return
+            callback, error_callback, _ = self.busy.pop(conn)
+            retired = []
+            if recycle:
+                retired.append(self._retire(conn))
+            else:
+                self.idle.append(conn)
+            retired += self._dispatch()
+
+        handler = callback if ok else error_callback
+        if handler:
+            handler(value)
+        self._replace(retired)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for conn, process in self.processes.items():
+                conn.close()
+                process.terminate()
+                process.join(1)
+            self.processes.clear()
+        self.wakeup_w.send_bytes(b'')
+        self.result_handler.join(1)
+        with self.lock:
+            for output in self.outputs:
+                output.close()
+            self.outputs.clear()
@@ -2,7 +2,7 @@ import json
 import hashlib
 
 from .client import CacheAction
-from .utils import cacheable_exception_value
+from .utils import cacheable_exception_value, fetch_concurrently, synchronized
 
 from metaflow import namespace
 
@@ -13,6 +13,9 @@ class GetData(CacheAction):
     """
     Fetches data by target list and returning their contents.
 
+    Decoded values are kept in the hot tier of the cache client, as they are small
+    and read often, e.g. the status of a finished task or the parameters of a run.
+
     Parameters
     ----------
     targets : List[str]
@@ -29,6 +32,8 @@ class GetData(CacheAction):
         }
     """
 
+    HOT_TIER = True
+
     @classmethod
     def format_request(cls, *args, **kwargs):
         targets = kwargs.get('targets', [])
@@ -52,6 +57,10 @@ class GetData(CacheAction):
             invalidate_cache, \
             None
 
+    @classmethod
+    def decode(cls, key, blob):
+        return json.loads(blob)
+
     @classmethod
     def response(cls, keys_objs):
         '''Action should respond with a dictionary of
@@ -64,7 +73,7 @@ class GetData(CacheAction):
 
         collected = {}
         for key, val in target_keys:
-            collected[target_from_cache_key(key, "data:{}:".format(cls.__name__))] = json.loads(val)
+            collected[target_from_cache_key(key, "data:{}:".format(cls.__name__))] = val
 
         return collected
 
@@ -111,10 +120,16 @@ class GetData(CacheAction):
             # Make a list of artifact locations that require fetching (not cached previously)
             targets_to_fetch = [loc for loc in targets if not cache_key_from_target(loc, "data:{}:".format(cls.__name__)) in existing_keys]
 
-        for target in targets_to_fetch:
+        # Targets are fetched concurrently, so the stream output is shared by the fetch threads.
+        stream_output = synchronized(stream_output)
+
+        def _fetch(target):
+            return cls.fetch_data(target, stream_output)
+
+        for target, future in fetch_concurrently(_fetch, targets_to_fetch):
             target_key = cache_key_from_target(target, "data:{}:".format(cls.__name__))
             try:
-                result = cls.fetch_data(target, stream_output)
+                result = future.result()
                 if result is None or result is False:
                     # Do not persist None or False return values
                     continue
@@ -1,11 +1,13 @@
 import hashlib
 import json
 
-import shutil
 from typing import Callable, Dict, List, Optional, Tuple
 from .client import CacheAction
+from .log_index import LogIndex, _datetime_to_epoch
 from .utils import streamed_errors
 from metaflow.client.filecache import FileCache
+from metaflow.datastore.datastore_storage import DataStoreStorage
+from metaflow.plugins.datatools.s3 import S3, S3GetObject
 from metaflow.mflog import LOG_SOURCES
 from metaflow.mflog.mflog import MFLogline, parse, MISSING_TIMESTAMP_STR, MISSING_TIMESTAMP
 from metaflow.util import to_unicode
@@ -144,28 +146,27 @@ class GetLogFile(CacheAction):
             current_hash = log_provider.get_log_hash(task, logtype)
             log_hash_changed = previous_log_hash is None or previous_log_hash != current_hash
 
-            log_path = os.path.join(".", "cache_data", "log", "BLOBS", log_key)
-            local_paths = fetch_logs(task, log_path, logtype, log_hash_changed)
-            if log_hash_changed:
-                total_lines = count_total_lines(local_paths)
-                results[log_key] = json.dumps({"log_hash": current_hash, "content_paths": local_paths, "line_count": total_lines})
-            else:
+            if not log_hash_changed:
                 results = {**existing_keys}
 
-            def _gen():
-                return stream_sorted_logs(json.loads(results[log_key])["content_paths"])
-
             if log_hash_changed or result_key not in existing_keys:
-                results[result_key] = json.dumps(
-                    paginated_result(
-                        _gen,
-                        page,
-                        json.loads(results[log_key])["line_count"],
-                        limit,
-                        reverse,
-                        output_raw
-                    )
-                )
+                if isinstance(log_provider, FullLogProvider):
+                    log_path = os.path.join(".", "cache_data", "log", "BLOBS", log_key)
+                    with LogIndex(log_path) as log:
+                        if log_hash_changed or log.is_empty:
+                            # Only the bytes that were appended to the log files since the last time are loaded.
+                            update_log(log, task, logtype)
+                        line_count = log.line_count
+                        result = paginated_log(log, page, limit, reverse, output_raw)
+                else:
+                    # The blurb and the tail of a log are bounded in size, and are not indexed.
+                    content = list(log_provider.get_log_content(task, logtype))
+                    line_count = len(content)
+                    result = paginated_result(lambda: iter(content), page, line_count, limit, reverse, output_raw)
+
+                if log_hash_changed:
+                    results[log_key] = json.dumps({"log_hash": current_hash, "line_count": line_count})
+                results[result_key] = json.dumps(result)
 
         return results
 
@@ -206,16 +207,20 @@ task = Task("{task.pathspec}", attempt={task.current_attempt})
     return blurb
 
 
-def fetch_logs(task: Task, to_path: str, logtype: str, force_reload: bool = False) -> List[str]:
+def log_sources(task: Task, logtype: str) -> Tuple[Optional[DataStoreStorage], Dict[str, str]]:
+    """
+    Locate the log files of a task.
+
+    Returns
+    -------
+    Tuple
+        the datastore storage of the log files, and the paths of the log files by name in the order of merging
+    """
     # TODO: This could theoretically be a part of the Metaflow client instead.
-    paths = []
     stream = 'stderr' if logtype == STDERR else 'stdout'
     meta_dict = task.metadata_dict
     log_location = meta_dict.get('log_location_%s' % stream)
 
-    os.makedirs(to_path, exist_ok=True)
-    log_paths = {}
-
     filecache = FileCache()
     flow_name, run_id, step_name, task_id = task.path_components
     if log_location:
@@ -235,15 +240,13 @@ def fetch_logs(task: Task, to_path: str, logtype: str, force_reload: bool = Fals
             attempt,
             allow_not_done=True
         )
-        name = ds._metadata_name_for_attempt("%s.log" % stream)
-        to_load = [ds._storage_impl.path_join(ds._path, name)]
-        log_paths[name] = os.path.join(to_path, name)
+        names = [ds._metadata_name_for_attempt("%s.log" % stream)]
     else:
         # MFLog support
         ds_type = meta_dict.get("ds-type")
         ds_root = meta_dict.get("ds-root")
         if ds_type is None or ds_root is None:
-            return []
+            return None, {}
 
         attempt = task.current_attempt
 
@@ -255,45 +258,56 @@ def fetch_logs(task: Task, to_path: str, logtype: str, force_reload: bool = Fals
             attempt,
             allow_not_done=True
         )
-        paths = dict(
-            map(
-                lambda s: (
-                    ds._metadata_name_for_attempt(
-                        ds._get_log_location(s, stream),
-                        attempt_override=attempt,
-                    ),
-                    s,
-                ),
-                LOG_SOURCES,
-            )
-        )
-        to_load = []
-        for name in paths.keys():
-            path = ds._storage_impl.path_join(ds._path, name)
-            to_load.append(path)
-            log_paths[name] = os.path.join(to_path, name)
-
-    # skip downloading as all files are on disk.
-    skip_dl = not force_reload and all(os.path.exists(path) for path in log_paths.values())
-    if not skip_dl:
-        # Load the log files to disk
-        with ds._storage_impl.load_bytes(to_load) as load_results:
-            for key, path, meta in load_results:
-                name = ds._storage_impl.basename(key)
-                if path is None:
-                    # no log file existed in the location. Usually not an error.
-                    log_paths[name] = None
-                else:
-                    shutil.move(path, log_paths[name])
-    return [val for val in log_paths.values() if val is not None]
+        names = [
+            ds._metadata_name_for_attempt(ds._get_log_location(s, stream), attempt_override=attempt)
+            for s in LOG_SOURCES
+        ]
+    return ds._storage_impl, {name: ds._storage_impl.path_join(ds._path, name) for name in names}
 
 
-def count_total_lines(paths):
-    linecount = 0
-    for path in paths:
-        with open(path, "r") as f:
-            linecount += sum(1 for _ in f)
-    return linecount
+def load_log_range(storage: DataStoreStorage, path: str, offset: int) -> Tuple[Optional[int], bytes]:
+    """
+    Load the bytes of a log file that follow `offset`.
+
+    Returns
+    -------
+    Tuple
+        the size of the log file, or None if it does not exist, and the bytes following the offset
+    """
+    size = storage.size_file(path)
+    if size is None or size <= offset:
+        return size, b""
+    if storage.TYPE == "local":
+        with open(storage.full_uri(path), "rb") as f:
+            f.seek(offset)
+            return size, f.read(size - offset)
+    if storage.TYPE == "s3":
+        with S3(s3root=storage.datastore_root, external_client=storage.s3_client) as s3:
+            return size, s3.get(S3GetObject(path, offset, size - offset)).blob
+    # Other datastores can only load whole files
+    with storage.load_bytes([path]) as load_results:
+        for _, local_path, _ in load_results:
+            if local_path is None:
+                return None, b""
+            with open(local_path, "rb") as f:
+                f.seek(offset)
+                return size, f.read(size - offset)
+    return None, b""
+
+
+def update_log(log: LogIndex, task: Task, logtype: str):
+    "Append the new content of the log files of a task to the log index."
+    storage, paths = log_sources(task, logtype)
+    chunks = {}
+    for name, path in paths.items():
+        size, data = load_log_range(storage, path, log.offset(name))
+        if size is not None and size < log.offset(name):
+            # The log file was replaced, read all log files again.
+            log.reset()
+            return update_log(log, task, logtype)
+        if data:
+            chunks[name] = data
+    log.append(chunks, list(paths))
 
 
 def stream_sorted_logs(paths):
@@ -365,10 +379,8 @@ def get_log_content(task: Task, logtype: str):
         for line in task._load_log_legacy(log_location, stream).split("\n"):
             yield (None, line)
     else:
-        return [
-            (_datetime_to_epoch(datetime), line)
-            for datetime, line in task.loglines(stream)
-        ]
+        for datetime, line in task.loglines(stream):
+            yield (_datetime_to_epoch(datetime), line)
 
 
 class LogProviderBase:
@@ -487,6 +499,33 @@ def paginated_result(content_iterator: Callable, page: int = 1, line_total: int
     }
 
 
+def paginated_log(log: LogIndex, page: int = 1, limit: int = 0, reverse_order: bool = False, output_raw=False):
+    "Same as paginated_result, but only reads the lines of the requested page from a log index"
+    line_total = log.line_count
+    # take the ceil for the number of pages so we dont end up with discarded lines
+    total_pages = max(-(line_total // -limit), 1) if limit else 1
+    _offset = limit * (total_pages - page) if reverse_order else limit * (page - 1)
+    loglines = []
+
+    # OOB guard
+    if page <= total_pages:
+        # lines included in the page should be [start, end[
+        end = _offset + limit if limit else line_total
+        for lineno, (ts, line) in enumerate(log.read(_offset, end), start=_offset):
+            loglines.append(line if output_raw else {"row": lineno, "timestamp": ts, "line": line})
+        if reverse_order:
+            loglines.reverse()
+
+    if page != total_pages and loglines and output_raw:
+        # we want a trailing newline so raw logs get pieced together correctly
+        loglines.append("")
+
+    return {
+        "content": "\n".join(loglines) if output_raw else loglines,
+        "pages": total_pages
+    }
+
+
 def format_loglines(content: List[Tuple[Optional[int], str]], page: int = 1, limit: int = 0, reverse: bool = False) -> \
         Tuple[List, int]:
     "format, order and limit the log content. Return a list of log lines with row numbers"
@@ -548,12 +587,3 @@ def pathspec_for_task(task: Dict):
         step_name=task['step_name'],
         task_name=task.get('task_name') or task['task_id']
     )
-
-
-def _datetime_to_epoch(datetime) -> Optional[int]:
-    """convert datetime safely into an epoch in milliseconds"""
-    try:
-        return int(datetime.timestamp() * 1000)
-    except Exception:
-        # consider timestamp to be none if handling failed
-        return None
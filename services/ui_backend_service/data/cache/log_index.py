@@ -0,0 +1,258 @@
+import os
+import json
+import fcntl
+import heapq
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from metaflow.mflog.mflog import parse, MISSING_TIMESTAMP
+from metaflow.util import to_unicode
+
+LINES_FILENAME = "log.lines"
+OFFSETS_FILENAME = "log.offsets"
+STATE_FILENAME = "log.state"
+LOCK_FILENAME = "log.lock"
+
+# Every stored line has an entry in the offsets file with the position of its record
+# in the lines file, and its merge key: a timestamp in microseconds and the source index.
+ENTRY = struct.Struct(">QqB")
+EPOCH = datetime(1970, 1, 1)
+
+EMPTY_STATE = {
+    # bytes of each log source that are stored as lines, by source name
+    "sources": {},
+    # merge key of the last line of each source, by source name
+    "source_keys": {},
+    # number of stored lines, and the size of the lines file
+    "line_count": 0,
+    "size": 0,
+    # lines of unterminated log source tails, by source name
+    "tails": {},
+}
+
+
+def _merge_key(line):
+    return line[:2]
+
+
+class LogIndex(object):
+    """
+    Merged log lines of the sources of a task log, stored incrementally on disk.
+
+    New bytes of each log source are appended as lines, and the position of every
+    line is kept in an offset index, so that any range of lines can be read by
+    seeking. Unterminated lines at the end of a source are not stored, but kept
+    as a tail that is served after the stored lines until the line is complete.
+
+    Lines of multiple sources are merged by timestamp. Log sources are uploaded
+    independently, so new lines of a source may be older than the most recent
+    stored lines of another source. Only the stored lines that sort after the
+    new lines are rewritten, and they are found by a binary search of the
+    offset index.
+
+    The index is locked for the lifetime of the context, as concurrent cache
+    actions may request pages of the same log.
+
+    Parameters
+    ----------
+    path : str
+        directory of the log files
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_file = None
+        self.state = None
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.lock_file = open(self._file(LOCK_FILENAME), "a")
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        self.state = self._load_state()
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_state(self):
+        try:
+            with open(self._file(STATE_FILENAME), "r") as f:
+                state = json.load(f)
+            # Files of the log can be garbage collected individually, and appends that
+            # were interrupted before the state was saved are discarded.
+            with open(self._file(LINES_FILENAME), "r+b") as f:
+                if os.fstat(f.fileno()).st_size < state["size"]:
+                    raise ValueError("Truncated log lines")
+                f.truncate(state["size"])
+            with open(self._file(OFFSETS_FILENAME), "r+b") as f:
+                if os.fstat(f.fileno()).st_size < state["line_count"] * ENTRY.size:
+                    raise ValueError("Truncated log offsets")
+                f.truncate(state["line_count"] * ENTRY.size)
+            return state
+        except (OSError, ValueError, KeyError):
+            return self.reset()
+
+    def reset(self):
+        "Remove all lines, so that the log sources are read again from the start."
+        for name in (LINES_FILENAME, OFFSETS_FILENAME):
+            open(self._file(name), "wb").close()
+        self.state = json.loads(json.dumps(EMPTY_STATE))
+        self._save_state()
+        return self.state
+
+    def _save_state(self):
+        tmp = self._file(STATE_FILENAME + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._file(STATE_FILENAME))
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.state["sources"]
+
+    @property
+    def line_count(self) -> int:
+        return self.state["line_count"] + sum(len(lines) for lines in self.state["tails"].values())
+
+    def offset(self, source: str) -> int:
+        "Number of bytes of a log source that are stored as lines"
+        return self.state["sources"].get(source, 0)
+
+    def append(self, chunks: Dict[str, bytes], sources: List[str]):
+        """
+        Append the bytes of log sources that follow their current offsets.
+
+        Parameters
+        ----------
+        chunks : Dict[str, bytes]
+            new bytes by source name
+        sources : List[str]
+            names of all sources of the log, lines with the same timestamp are merged in this order
+        """
+        new_lines = []
+        for source, data in chunks.items():
+            index = sources.index(source)
+            end = data.rfind(b"\n") + 1
+            lines, key = parse_lines(data[:end], index, self.state["source_keys"].get(source))
+            new_lines.append(lines)
+            self.state["sources"][source] = self.offset(source) + end
+            self.state["source_keys"][source] = key
+            self.state["tails"][source] = parse_lines(data[end:], index, key)[0]
+
+        new_lines = list(heapq.merge(*new_lines, key=_merge_key))
+        if new_lines:
+            # Stored lines that sort after the first new line are merged with the new lines, and rewritten.
+            position = self._bisect(_merge_key(new_lines[0]))
+            stored = self._read_lines(position, self.state["line_count"])
+            self._truncate(position)
+            self._write(heapq.merge(stored, new_lines, key=_merge_key))
+        self._save_state()
+
+    def read(self, start: int, stop: int) -> List[Tuple[Optional[int], str]]:
+        "Returns the (timestamp, line) tuples of the lines from `start` up to, but not including, `stop`."
+        stored = self.state["line_count"]
+        lines = self._read_lines(start, min(stop, stored))
+        if stop > stored:
+            tail = sorted((tuple(line) for lines in self.state["tails"].values() for line in lines), key=_merge_key)
+            lines.extend(tail[max(start - stored, 0):stop - stored])
+        return [(ts, msg) for _, _, ts, msg in lines]
+
+    def _entries(self, start, stop):
+        "Returns the (position, key, source index) entries of the stored lines from `start` to `stop`"
+        if start >= stop:
+            return []
+        with open(self._file(OFFSETS_FILENAME), "rb") as f:
+            f.seek(start * ENTRY.size)
+            return list(ENTRY.iter_unpack(f.read((stop - start) * ENTRY.size)))
+
+    def _read_lines(self, start, stop):
+        "Returns the (key, source index, timestamp, line) tuples of the stored lines from `start` to `stop`"
+        entries = self._entries(start, stop)
+        if not entries:
+            return []
+        # The position of the line following the range is where the range ends
+        end = self._entries(stop, stop + 1)[0][0] if stop < self.state["line_count"] else self.state["size"]
+        with open(self._file(LINES_FILENAME), "rb") as f:
+            f.seek(entries[0][0])
+            records = f.read(end - entries[0][0]).split(b"\n")[:-1]
+        return [(key, index, *json.loads(record)) for (_, key, index), record in zip(entries, records)]
+
+    def _bisect(self, merge_key):
+        "Index of the first stored line that sorts after a merge key"
+        lo, hi = 0, self.state["line_count"]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, key, index = self._entries(mid, mid + 1)[0]
+            if (key, index) <= merge_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _truncate(self, position):
+        if position < self.state["line_count"]:
+            size = self._entries(position, position + 1)[0][0]
+            with open(self._file(LINES_FILENAME), "r+b") as f:
+                f.truncate(size)
+            with open(self._file(OFFSETS_FILENAME), "r+b") as f:
+                f.truncate(position * ENTRY.size)
+            self.state["line_count"] = position
+            self.state["size"] = size
+
+    def _write(self, lines):
+        records = []
+        entries = []
+        size = self.state["size"]
+        for key, index, ts, msg in lines:
+            record = (json.dumps([ts, msg]) + "\n").encode("utf-8")
+            entries.append(ENTRY.pack(size, key, index))
+            records.append(record)
+            size += len(record)
+        with open(self._file(LINES_FILENAME), "ab") as f:
+            f.write(b"".join(records))
+        with open(self._file(OFFSETS_FILENAME), "ab") as f:
+            f.write(b"".join(entries))
+        self.state["line_count"] += len(records)
+        self.state["size"] = size
+
+
+def parse_lines(data: bytes, index: int, key: Optional[int] = None) -> Tuple[List[Tuple[int, int, Optional[int], str]], int]:
+    """
+    Parse the log lines of a source into (key, source index, epoch timestamp in milliseconds, line) tuples.
+
+    The merge key of a line is its timestamp in microseconds, but never less than the key of the
+    previous line of the source, so that the lines of a source stay in order. Lines without a
+    timestamp have the key of the previous line.
+
+    Returns
+    -------
+    Tuple
+        the parsed lines, and the key of the last line
+    """
+    key = key or 0
+    if not data:
+        return [], key
+    *terminated, last = data.decode("utf-8", errors="replace").split("\n")
+    lines = []
+    for val in [line + "\n" for line in terminated] + ([last] if last else []):
+        res = parse(val)
+        if res:
+            key = max(key, (res.utc_tstamp - EPOCH) // timedelta(microseconds=1))
+            lines.append((key, index, _datetime_to_epoch(res.utc_tstamp), to_unicode(res.msg)))
+        else:
+            lines.append((key, index, _datetime_to_epoch(MISSING_TIMESTAMP), val))
+    return lines, key
+
+
+def _datetime_to_epoch(datetime) -> Optional[int]:
+    """convert datetime safely into an epoch in milliseconds"""
+    try:
+        return int(datetime.timestamp() * 1000)
+    except Exception:
+        # consider timestamp to be none if handling failed
+        return None
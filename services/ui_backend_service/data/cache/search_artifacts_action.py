@@ -1,12 +1,13 @@
 import hashlib
 import json
+from contextlib import closing
 
 from .client import CacheAction
+from .search_index import ArtifactSearchIndex
 from .utils import (cacheable_artifact_value, cacheable_exception_value,
                     progress_event_msg,
-                    artifact_cache_id, unpack_pathspec_with_attempt_id,
-                    streamed_errors)
-from services.ui_backend_service.data import unpack_processed_value
+                    unpack_pathspec_with_attempt_id,
+                    streamed_errors, fetch_concurrently)
 from services.ui_backend_service.api.utils import operators_to_filters
 
 
@@ -17,7 +18,8 @@ namespace(None)  # Always use global namespace by default
 class SearchArtifacts(CacheAction):
     """
     Fetches artifacts by pathspecs and performs a search against the object contents.
-    Caches artifacts based on pathspec, and search results based on a combination of query&artifacts searched
+    Artifact values are indexed by pathspec in an ArtifactSearchIndex, so that each value is only fetched
+    and decoded once. Caches search results based on a combination of query&artifacts searched
 
     Parameters
     ----------
@@ -50,16 +52,12 @@ class SearchArtifacts(CacheAction):
             'operator': operator
         }
 
-        artifact_keys = []
-        for pathspec in pathspecs:
-            artifact_keys.append(artifact_cache_id(pathspec))
-
         request_id = lookup_id(pathspecs, searchterm, operator)
         stream_key = 'search:stream:%s' % request_id
         result_key = 'search:result:%s' % request_id
 
         return msg, \
-            [result_key, *artifact_keys], \
+            [result_key], \
             stream_key, \
             [stream_key, result_key], \
             invalidate_cache, \
@@ -96,69 +94,62 @@ class SearchArtifacts(CacheAction):
                 invalidate_cache=False,
                 **kwargs):
         pathspecs = message['pathspecs']
-
-        if invalidate_cache:
-            results = {}
-            pathspecs_to_fetch = [loc for loc in pathspecs]
-        else:
-            # make a copy of already existing results, as the cache action has to produce all keys it promised
-            # in the format_request response.
-            results = {**existing_keys}
-            # Make a list of artifact pathspecs that require fetching (not cached previously)
-            pathspecs_to_fetch = [loc for loc in pathspecs if not artifact_cache_id(loc) in existing_keys]
-
-        artifact_keys = [key for key in keys if key.startswith('search:artifactdata')]
         result_key = [key for key in keys if key.startswith('search:result')][0]
 
-        # Helper functions for streaming status updates.
-        def stream_progress(num):
-            return stream_output(progress_event_msg(num))
-
-        with streamed_errors(stream_output, re_raise=False):
-            # Fetch artifacts that are not cached already
-            for idx, pathspec in enumerate(pathspecs_to_fetch):
-                stream_progress((idx + 1) / len(pathspecs_to_fetch))
-
-                try:
-                    pathspec_without_attempt, attempt_id = unpack_pathspec_with_attempt_id(pathspec)
-                    artifact_key = "search:artifactdata:{}".format(pathspec)
-                    artifact = DataArtifact(pathspec_without_attempt, attempt=attempt_id)
-                    results[artifact_key] = cacheable_artifact_value(artifact)
-                except Exception as ex:
-                    results[artifact_key] = cacheable_exception_value(ex)
-                    raise ex from None  # re-raise errors in order to stream it in context
-
-        # Perform search on loaded artifacts.
-        search_results = {}
-        searchterm = message['searchterm']
-        operator = message['operator']
-        filter_fn = operators_to_filters[operator] if operator in operators_to_filters else operators_to_filters["eq"]
-
-        def format_loc(x):
-            "extract pathspec from the artifact cache key"
-            return x[len("search:artifactdata:"):]
-
-        for key in artifact_keys:
-            if key in results:
-                load_success, value, detail, trace = unpack_processed_value(json.loads(results[key]))
+        with closing(ArtifactSearchIndex()) as index:
+            if invalidate_cache:
+                pathspecs_to_fetch = [loc for loc in pathspecs]
             else:
-                load_success, value, detail, trace = False, None, None, None
-            # keep the matching case-insensitive
-            matches = filter_fn(str(value).lower(), searchterm.lower())
-
-            search_results[format_loc(key)] = {
-                "included": load_success,
-                "matches": matches,
-                "error": None if load_success else {
-                    "id": value or "artifact-handle-failed",
-                    "detail": detail or "Unknown error during artifact processing",
-                    "traceback": trace
-                }
-            }
+                # Artifact values are decoded and indexed once, later searches are answered from the index.
+                pathspecs_to_fetch = index.missing(pathspecs)
+
+            # Helper functions for streaming status updates.
+            def stream_progress(num):
+                return stream_output(progress_event_msg(num))
+
+            def fetch_artifact(pathspec):
+                pathspec_without_attempt, attempt_id = unpack_pathspec_with_attempt_id(pathspec)
+                artifact = DataArtifact(pathspec_without_attempt, attempt=attempt_id)
+                return cacheable_artifact_value(artifact)
+
+            fetched_values = {}
+            try:
+                with streamed_errors(stream_output, re_raise=False):
+                    # Fetch artifacts that are not indexed already. Artifacts are fetched
+                    # concurrently, but progress and errors are streamed in order.
+                    with closing(fetch_concurrently(fetch_artifact, pathspecs_to_fetch)) as fetched:
+                        for idx, (pathspec, future) in enumerate(fetched):
+                            stream_progress((idx + 1) / len(pathspecs_to_fetch))
+
+                            try:
+                                fetched_values[pathspec] = future.result()
+                            except Exception as ex:
+                                fetched_values[pathspec] = cacheable_exception_value(ex)
+                                raise ex from None  # re-raise errors in order to stream it in context
+            finally:
+                # Index what was fetched, also when fetching is interrupted.
+                index.add(fetched_values)
+
+            # Perform search on indexed artifacts.
+            searchterm = message['searchterm']
+            operator = message['operator']
+            if operator not in operators_to_filters:
+                operator = "eq"
+            search_results = index.search(pathspecs, searchterm, operators_to_filters[operator], operator)
 
-        results[result_key] = json.dumps(search_results)
+        for pathspec in pathspecs:
+            if pathspec not in search_results:
+                search_results[pathspec] = {
+                    "included": False,
+                    "matches": False,
+                    "error": {
+                        "id": "artifact-handle-failed",
+                        "detail": "Unknown error during artifact processing",
+                        "traceback": None
+                    }
+                }
 
-        return results
+        return {result_key: json.dumps(search_results)}
 
 
 def lookup_id(locations, searchterm, operator):
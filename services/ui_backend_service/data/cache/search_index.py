@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import sqlite3
+
+from services.ui_backend_service.data import unpack_processed_value
+
+# Location of the artifact search index, relative to the working directory of the cache server.
+SEARCH_INDEX_PATH = os.environ.get("CACHE_ARTIFACT_SEARCH_INDEX_PATH",
+                                   os.path.join("cache_data", "artifact_search_index.sqlite"))
+# Maximum number of (run, artifact name) partitions kept in the index, least recently searched ones are dropped first.
+SEARCH_INDEX_MAX_PARTITIONS = int(os.environ.get("CACHE_ARTIFACT_SEARCH_INDEX_MAX_PARTITIONS", 10000))
+
+# Operators whose matches contain every trigram of the search term.
+TRIGRAM_OPERATORS = frozenset(["eq", "co", "sw", "ew"])
+INDEX_QUERY_BATCH_SIZE = 500
+
+
+def normalize_value(cached_value):
+    """
+    Normalize a cached artifact value for searching.
+
+    Returns
+    -------
+    tuple : (bool, optional(str), optional(dict))
+        included, lowercased string of the value, error
+    """
+    success, value, detail, trace = unpack_processed_value(json.loads(cached_value))
+    if success:
+        # keep the matching case-insensitive
+        return True, str(value).lower(), None
+    return False, None, {
+        "id": value or "artifact-handle-failed",
+        "detail": detail or "Unknown error during artifact processing",
+        "traceback": trace
+    }
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def partition_of(pathspec):
+    "Returns the (run, artifact name) of an artifact pathspec with attempt id: FlowId/RunNumber/StepName/TaskId/ArtifactName/0"
+    flow_id, run_id, _, _, name, _ = pathspec.split("/")
+    return "%s/%s" % (flow_id, run_id), name
+
+
+class ArtifactSearchIndex(object):
+    """
+    Searchable index of artifact values, kept in an sqlite database shared by the cache worker processes.
+
+    Values are indexed by pathspec as normalized strings, and partitioned by
+    run and artifact name. Each partition has an inverted index from the
+    trigrams of the values to the artifacts, which narrows down the candidates
+    of a search before the operator is applied to the normalized strings.
+    """
+
+    def __init__(self, path=None, max_partitions=SEARCH_INDEX_MAX_PARTITIONS):
+        self.path = path = path or SEARCH_INDEX_PATH
+        self.max_partitions = max_partitions
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Worker processes write concurrently, so wait for the lock of the database.
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS partitions ("
+                "id INTEGER PRIMARY KEY, "
+                "run TEXT NOT NULL, "
+                "name TEXT NOT NULL, "
+                "last_access REAL NOT NULL, "
+                "UNIQUE (run, name))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS artifact_values ("
+                "id INTEGER PRIMARY KEY, "
+                "partition INTEGER NOT NULL, "
+                "pathspec TEXT NOT NULL UNIQUE, "
+                "included INTEGER NOT NULL, "
+                "value TEXT, "
+                "error TEXT)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS artifact_values_partition ON artifact_values (partition)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS trigrams ("
+                "partition INTEGER NOT NULL, "
+                "gram TEXT NOT NULL, "
+                "artifact INTEGER NOT NULL, "
+                "PRIMARY KEY (partition, gram, artifact)) WITHOUT ROWID"
+            )
+
+    def close(self):
+        self.db.close()
+
+    def missing(self, pathspecs):
+        "Returns the pathspecs that are not indexed yet"
+        indexed = set(self._lookup(pathspecs))
+        return [pathspec for pathspec in pathspecs if pathspec not in indexed]
+
+    def add(self, values):
+        """
+        Index artifacts by pathspec, replacing previously indexed values of the same pathspecs.
+
+        Parameters
+        ----------
+        values : Dict[str, str]
+            cached artifact values by pathspec, as produced by cacheable_artifact_value
+        """
+        if not values:
+            return
+        now = time.time()
+        with self.db:
+            # Take the write lock up front, the partitions are read and written in the same transaction.
+            self.db.execute("BEGIN IMMEDIATE")
+            partitions = {}
+            for pathspec, cached_value in values.items():
+                partition = partition_of(pathspec)
+                if partition not in partitions:
+                    partitions[partition] = self._partition_id(partition, now)
+                partition_id = partitions[partition]
+                included, value, error = normalize_value(cached_value)
+
+                row = self.db.execute("SELECT id, value FROM artifact_values WHERE pathspec = ?", (pathspec,)).fetchone()
+                if row:
+                    old_id, old_value = row
+                    self.db.executemany(
+                        "DELETE FROM trigrams WHERE partition = ? AND gram = ? AND artifact = ?",
+                        ((partition_id, gram, old_id) for gram in trigrams(old_value or "")))
+                    self.db.execute("DELETE FROM artifact_values WHERE id = ?", (old_id,))
+                artifact_id = self.db.execute(
+                    "INSERT INTO artifact_values (partition, pathspec, included, value, error) VALUES (?, ?, ?, ?, ?)",
+                    (partition_id, pathspec, int(included), value, json.dumps(error) if error else None)
+                ).lastrowid
+                if value is not None:
+                    self.db.executemany(
+                        "INSERT INTO trigrams (partition, gram, artifact) VALUES (?, ?, ?)",
+                        ((partition_id, gram, artifact_id) for gram in trigrams(value)))
+            self._prune()
+
+    def search(self, pathspecs, searchterm, filter_fn, operator="eq"):
+        """
+        Match the indexed values of `pathspecs` against a search term.
+
+        Returns
+        -------
+        Dict
+            {"pathspec": {"included": boolean, "matches": boolean, "error": dict or None}}
+            for the pathspecs that are indexed.
+        """
+        term = searchterm.lower()
+        rows = self._lookup(pathspecs)
+        candidates = None
+        grams = trigrams(term)
+        if operator in TRIGRAM_OPERATORS and grams:
+            candidates = set()
+            for partition_id in {partition_id for _, partition_id, _, _, _ in rows.values()}:
+                candidates.update(self._candidates(partition_id, grams))
+
+        results = {}
+        now = time.time()
+        for pathspec, (artifact_id, partition_id, included, value, error) in rows.items():
+            if not included:
+                matches = False
+            elif candidates is not None and artifact_id not in candidates:
+                matches = False
+            else:
+                matches = bool(filter_fn(value, term))
+            results[pathspec] = {
+                "included": bool(included),
+                "matches": matches,
+                "error": json.loads(error) if error else None
+            }
+        with self.db:
+            self.db.executemany("UPDATE partitions SET last_access = ? WHERE id = ?",
+                                ((now, partition_id) for partition_id in {row[1] for row in rows.values()}))
+        return results
+
+    def _lookup(self, pathspecs):
+        "Returns (id, partition, included, value, error) rows by pathspec"
+        pathspecs = list(pathspecs)
+        rows = {}
+        for i in range(0, len(pathspecs), INDEX_QUERY_BATCH_SIZE):
+            batch = pathspecs[i:i + INDEX_QUERY_BATCH_SIZE]
+            for row in self.db.execute(
+                    "SELECT pathspec, id, partition, included, value, error FROM artifact_values "
+                    "WHERE pathspec IN (%s)" % ",".join("?" * len(batch)), batch):
+                rows[row[0]] = row[1:]
+        return rows
+
+    def _candidates(self, partition_id, grams):
+        "Artifacts of a partition whose values contain all of the trigrams"
+        grams = list(grams)
+        return {artifact for artifact, in self.db.execute(
+            "SELECT artifact FROM trigrams WHERE partition = ? AND gram IN (%s) "
+            "GROUP BY artifact HAVING COUNT(*) = ?" % ",".join("?" * len(grams)),
+            [partition_id, *grams, len(grams)])}
+
+    def _partition_id(self, partition, now):
+        run, name = partition
+        self.db.execute(
+            "INSERT INTO partitions (run, name, last_access) VALUES (?, ?, ?) "
+            "ON CONFLICT (run, name) DO UPDATE SET last_access = excluded.last_access",
+            (run, name, now))
+        return self.db.execute("SELECT id FROM partitions WHERE run = ? AND name = ?", (run, name)).fetchone()[0]
+
+    def _prune(self):
+        "Drop the least recently searched partitions beyond the maximum number of partitions"
+        stale = [partition_id for partition_id, in self.db.execute(
+            "SELECT id FROM partitions ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_partitions,))]
+        for partition_id in stale:
+            self.db.execute("DELETE FROM trigrams WHERE partition = ?", (partition_id,))
+            self.db.execute("DELETE FROM artifact_values WHERE partition = ?", (partition_id,))
+            self.db.execute("DELETE FROM partitions WHERE id = ?", (partition_id,))
@@ -33,6 +33,10 @@ CACHE_ARTIFACT_MAX_ACTIONS = int(os.environ.get("CACHE_ARTIFACT_MAX_ACTIONS", 16
 CACHE_ARTIFACT_STORAGE_LIMIT = int(
     os.environ.get("CACHE_ARTIFACT_STORAGE_LIMIT", DISK_SIZE // 2)
 )
+# Size in bytes of the in-memory hot tier for decoded artifact data, 0 disables it
+CACHE_ARTIFACT_HOT_TIER_SIZE = int(os.environ.get("CACHE_ARTIFACT_HOT_TIER_SIZE", 64 * 1024 * 1024))
+# Maximum size in bytes of artifact cache objects packed into segment files, 0 disables packing
+CACHE_ARTIFACT_PACK_THRESHOLD = int(os.environ.get("CACHE_ARTIFACT_PACK_THRESHOLD", 0))
 CACHE_DAG_MAX_ACTIONS = int(os.environ.get("CACHE_DAG_MAX_ACTIONS", 16))
 CACHE_DAG_STORAGE_LIMIT = int(os.environ.get("CACHE_DAG_STORAGE_LIMIT", DISK_SIZE // 4))
 CACHE_LOG_MAX_ACTIONS = int(os.environ.get("CACHE_LOG_MAX_ACTIONS", 8))
@@ -194,6 +198,8 @@ class ArtifactCacheStore(object):
             actions,
             max_size=CACHE_ARTIFACT_STORAGE_LIMIT,
             max_actions=CACHE_ARTIFACT_MAX_ACTIONS,
+            hot_tier_size=CACHE_ARTIFACT_HOT_TIER_SIZE,
+            pack_threshold=CACHE_ARTIFACT_PACK_THRESHOLD,
         )
         if FEATURE_CACHE_ENABLE:
             await self.cache.start()
@@ -1,6 +1,8 @@
 import os
 import pickle
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from gzip import GzipFile
 from itertools import islice
 from contextlib import contextmanager
@@ -44,6 +46,41 @@ def decode(path):
 
 MAX_S3_SIZE = int(os.environ.get("MAX_PROCESSABLE_S3_ARTIFACT_SIZE_KB", 4)) * 1024
 
+# Maximum number of targets that a cache action fetches concurrently
+CACHE_ACTION_FETCH_CONCURRENCY = int(os.environ.get("CACHE_ACTION_FETCH_CONCURRENCY", 8))
+
+
+def fetch_concurrently(fetch, targets, max_workers=CACHE_ACTION_FETCH_CONCURRENCY):
+    """
+    Call `fetch` for each of the targets in a bounded thread pool.
+
+    Yields (target, future) tuples in the order of targets, as soon as the
+    future of the target is done. Calling future.result() returns the result
+    of fetch, or re-raises its exception. Targets that have not started yet
+    are cancelled if the caller stops iterating.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+    try:
+        futures = [executor.submit(fetch, target) for target in targets]
+        for target, future in zip(targets, futures):
+            # wait for the result without raising, the caller handles the exception
+            future.exception()
+            yield target, future
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def synchronized(func):
+    "Wrap a callable so that concurrent calls are serialized, e.g. a stream_output shared by fetch threads."
+    if func is None:
+        return None
+    lock = threading.Lock()
+
+    def _synchronized(*args, **kwargs):
+        with lock:
+            return func(*args, **kwargs)
+    return _synchronized
+
 # Cache Key helpers
 
 
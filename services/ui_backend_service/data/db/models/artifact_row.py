@@ -1,4 +1,5 @@
-from services.data.db_utils import get_exposed_run_id, get_exposed_task_id
+from services.data.db_utils import get_exposed_run_id, get_exposed_task_id, exposed_run_id_str, \
+    exposed_task_id_str
 from .base_row import BaseRow
 import time
 
@@ -61,6 +62,17 @@ class ArtifactRow(BaseRow):
         self.tags = tags
         self.system_tags = system_tags
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        if expanded:
+            return ["flow_id", "run_number", "run_id", "step_name", "task_id", "task_name", "name", "location",
+                    "ds_type", "sha", "type", "content_type", "user_name", "attempt_id", "ts_epoch", "tags",
+                    "system_tags"]
+        return ["flow_id", ("run_number", exposed_run_id_str, "run_number", "run_id"), "step_name",
+                ("task_id", exposed_task_id_str, "task_id", "task_name"), "name", "location", "ds_type", "sha",
+                "type", "content_type", "user_name", "attempt_id", "ts_epoch", "tags", "system_tags"]
+
     def serialize(self, expanded: bool = False):
         if expanded:
             return {
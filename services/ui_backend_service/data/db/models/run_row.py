@@ -1,6 +1,6 @@
 from .base_row import BaseRow
 import time
-from services.data.db_utils import get_exposed_run_id
+from services.data.db_utils import get_exposed_run_id, exposed_run_id_str
 
 
 class RunRow(BaseRow):
@@ -50,6 +50,15 @@ class RunRow(BaseRow):
         self.duration = duration
         self.last_heartbeat_ts = last_heartbeat_ts
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        if expanded:
+            return ["flow_id", "run_number", "run_id", "user_name", "user", "run", "status", "ts_epoch",
+                    "finished_at", "duration", "last_heartbeat_ts", "tags", "system_tags"]
+        return ["flow_id", ("run_number", exposed_run_id_str, "run_number", "run_id"), "user_name", "status",
+                "ts_epoch", "finished_at", "duration", "last_heartbeat_ts", "tags", "system_tags"]
+
     def serialize(self, expanded: bool = False):
         if expanded:
             return {
@@ -1,6 +1,7 @@
 from .base_row import BaseRow
 import time
-from services.data.db_utils import get_exposed_task_id, get_exposed_run_id
+from services.data.db_utils import get_exposed_task_id, get_exposed_run_id, exposed_run_id_str, \
+    exposed_task_id_str
 
 
 class TaskRow(BaseRow):
@@ -64,6 +65,18 @@ class TaskRow(BaseRow):
         self.system_tags = system_tags
         self.last_heartbeat_ts = last_heartbeat_ts
 
+    @classmethod
+    def serialized_fields(cls, expanded: bool = False):
+        "Fields of serialize(), for serializing result rows without row objects. See row_serializer"
+        if expanded:
+            return ["flow_id", "run_number", "run_id", "step_name", "task_id", "task_name", "user_name", "status",
+                    "task_ok", "ts_epoch", "started_at", "finished_at", "duration", "attempt_id", "tags",
+                    "system_tags", "last_heartbeat_ts"]
+        return ["flow_id", ("run_number", exposed_run_id_str, "run_number", "run_id"), "step_name",
+                ("task_id", exposed_task_id_str, "task_id", "task_name"), "user_name", "status", "task_ok",
+                "ts_epoch", "started_at", "finished_at", "duration", "attempt_id", "tags", "system_tags",
+                "last_heartbeat_ts"]
+
     def serialize(self, expanded: bool = False):
         if expanded:
             return {
@@ -9,11 +9,13 @@ import psycopg2.extras
 # baselevel classes from shared data adapter to inherit from.
 from services.data.postgres_async_db import \
     _AsyncPostgresDB as BaseAsyncPostgresDB
+from services.data.postgres_async_db import IdCache, RUN_TAGS_CACHE_TTL_SECONDS
 from services.utils import DBConfiguration, logging
 
 from .tables import (AsyncArtifactTablePostgres, AsyncFlowTablePostgres,
                      AsyncMetadataTablePostgres, AsyncRunTablePostgres,
-                     AsyncStepTablePostgres, AsyncTaskTablePostgres)
+                     AsyncRunStatusTablePostgres, AsyncStepTablePostgres,
+                     AsyncTaskAttemptTablePostgres, AsyncTaskTablePostgres)
 
 
 class AsyncPostgresDB(BaseAsyncPostgresDB):
@@ -33,6 +35,8 @@ class AsyncPostgresDB(BaseAsyncPostgresDB):
     task_table_postgres = None
     artifact_table_postgres = None
     metadata_table_postgres = None
+    run_status_table_postgres = None
+    task_attempt_table_postgres = None
 
     pool = None
     reader_pool = None
@@ -49,10 +53,16 @@ class AsyncPostgresDB(BaseAsyncPostgresDB):
         self.task_table_postgres = AsyncTaskTablePostgres(self)
         self.artifact_table_postgres = AsyncArtifactTablePostgres(self)
         self.metadata_table_postgres = AsyncMetadataTablePostgres(self)
+        self.run_status_table_postgres = AsyncRunStatusTablePostgres(self)
+        self.task_attempt_table_postgres = AsyncTaskAttemptTablePostgres(self)
         tables.append(self.flow_table_postgres)
         tables.append(self.run_table_postgres)
         tables.append(self.step_table_postgres)
         tables.append(self.task_table_postgres)
         tables.append(self.artifact_table_postgres)
         tables.append(self.metadata_table_postgres)
+        tables.append(self.run_status_table_postgres)
+        tables.append(self.task_attempt_table_postgres)
         self.tables = tables
+
+        self.run_tags_cache = IdCache(ttl_seconds=RUN_TAGS_CACHE_TTL_SECONDS)
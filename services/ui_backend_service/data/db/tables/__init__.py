@@ -4,3 +4,6 @@ from .step import AsyncStepTablePostgres
 from .task import AsyncTaskTablePostgres
 from .metadata import AsyncMetadataTablePostgres
 from .artifact import AsyncArtifactTablePostgres
+from .websocket_event import AsyncWebsocketEventTablePostgres
+from .run_status import AsyncRunStatusTablePostgres
+from .task_attempt import AsyncTaskAttemptTablePostgres
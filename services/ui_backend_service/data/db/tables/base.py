@@ -6,7 +6,7 @@ from typing import Callable, List, Tuple
 import psycopg2
 import psycopg2.extras
 from services.data.db_utils import DBPagination, DBResponse, aiopg_exception_handling
-from services.data.postgres_async_db import WAIT_TIME
+from services.data.postgres_async_db import WAIT_TIME, limit_offset_sql
 from services.data.postgres_async_db import (
     AsyncPostgresTable as MetadataAsyncPostgresTable,
 )
@@ -46,6 +46,9 @@ class AsyncPostgresTable(MetadataAsyncPostgresTable):
     primary_keys: List[str] = None
     trigger_keys: List[str] = None
     ordering: List[str] = None
+    # Columns that uniquely identify a result row, used as tie-breakers for keyset pagination.
+    # Defaults to the primary keys.
+    cursor_keys: List[str] = None
     joins: List[str] = None
     select_columns: List[str] = keys
     join_columns: List[str] = None
@@ -93,65 +96,66 @@ class AsyncPostgresTable(MetadataAsyncPostgresTable):
         benchmark: bool = False,
         overwrite_select_from: str = None,
     ) -> Tuple[DBResponse, DBPagination]:
+        conditions = tuple(conditions or ())
+        order = tuple(order or ())
         # Grouping not enabled
         if groups is None or len(groups) == 0:
-            sql_template = """
-            SELECT * FROM (
-                SELECT
-                    {keys}
-                FROM {table_name}
-                {joins}
-            ) T
-            {where}
-            {order_by}
-            {limit}
-            {offset}
-            """
+            def _render_select():
+                keys, joins = self._select_fragments(enable_joins)
+                sql_template = """
+                SELECT * FROM (
+                    SELECT
+                        {keys}
+                    FROM {table_name}
+                    {joins}
+                ) T
+                {where}
+                {order_by}
+                """
+                return sql_template.format(
+                    keys=keys,
+                    table_name=overwrite_select_from
+                    if overwrite_select_from
+                    else self.table_name,
+                    joins=joins,
+                    where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
+                    order_by="ORDER BY {}".format(", ".join(order)) if order else "",
+                ).strip()
 
-            select_sql = sql_template.format(
-                keys=",".join(
-                    self.select_columns + (self.join_columns if enable_joins and self.join_columns else [])
-                ),
-                table_name=overwrite_select_from
-                if overwrite_select_from
-                else self.table_name,
-                joins=" ".join(self.joins) if enable_joins and self.joins else "",
-                where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
-                order_by="ORDER BY {}".format(", ".join(order)) if order else "",
-                limit="LIMIT {}".format(limit) if limit else "",
-                offset="OFFSET {}".format(offset) if offset else "",
-            ).strip()
+            select_sql = self._select_statement(
+                ("find_records", conditions, order, enable_joins, overwrite_select_from), _render_select
+            )
+            select_sql += limit_offset_sql(limit, offset)
         else:  # Grouping enabled
             # NOTE: we are performing a DISTINCT select on the group labels before the actual window function, to limit the set
             # being queried. Without this restriction the query planner kept hitting the whole table contents, resulting in very slow queries.
+            groups = tuple(groups)
 
             # Query for groups matching filters.
-            groups_sql_template = """
-            SELECT DISTINCT ON({group_by}) * FROM (
-                SELECT
-                    {keys}
-                FROM {table_name}
-                {joins}
-            ) T
-            {where}
-            ORDER BY {group_by} ASC NULLS LAST
-            {limit}
-            {offset}
-            """
+            def _render_groups():
+                keys, joins = self._select_fragments(enable_joins)
+                groups_sql_template = """
+                SELECT DISTINCT ON({group_by}) * FROM (
+                    SELECT
+                        {keys}
+                    FROM {table_name}
+                    {joins}
+                ) T
+                {where}
+                ORDER BY {group_by} ASC NULLS LAST
+                """
+                return groups_sql_template.format(
+                    keys=keys,
+                    table_name=self.table_name,
+                    joins=joins,
+                    where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
+                    group_by=", ".join(groups),
+                ).strip()
 
-            groups_sql = groups_sql_template.format(
-                keys=",".join(
-                    self.select_columns + (self.join_columns if enable_joins and self.join_columns else [])
-                ),
-                table_name=self.table_name,
-                joins=" ".join(self.joins)
-                if enable_joins and self.joins is not None
-                else "",
-                where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
-                group_by=", ".join(groups),
-                limit="LIMIT {}".format(limit) if limit else "",
-                offset="OFFSET {}".format(offset) if offset else "",
-            ).strip()
+            groups_sql = self._select_statement(
+                ("find_groups", conditions, groups, enable_joins), _render_groups
+            )
+            groups_sql += limit_offset_sql(limit, offset)
 
             group_results, _ = await self.execute_sql(
                 select_sql=groups_sql,
@@ -175,43 +179,46 @@ class AsyncPostgresTable(MetadataAsyncPostgresTable):
                     values.append(_group_values)
 
             # Query for group content. Restricted by groups received from previous query.
-            sql_template = """
-            SELECT * FROM (
-                SELECT
-                    *, ROW_NUMBER() OVER(PARTITION BY {group_by} {order_by})
-                FROM (
+            def _render_group_content():
+                keys, joins = self._select_fragments(enable_joins)
+                sql_template = """
+                SELECT * FROM (
                     SELECT
-                        {keys}
-                    FROM {table_name}
-                    {joins}
-                ) T
-                {where}
-            ) G
-            {group_where}
-            """
+                        *, ROW_NUMBER() OVER(PARTITION BY {group_by} {order_by})
+                    FROM (
+                        SELECT
+                            {keys}
+                        FROM {table_name}
+                        {joins}
+                    ) T
+                    {where}
+                ) G
+                {group_where}
+                """
+                return sql_template.format(
+                    keys=keys,
+                    table_name=overwrite_select_from
+                    if overwrite_select_from
+                    else self.table_name,
+                    joins=joins,
+                    where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
+                    group_by=", ".join(groups),
+                    order_by="ORDER BY {}".format(", ".join(order)) if order else "",
+                    group_where="""
+                        WHERE {group_limit} {group_selects}
+                    """.format(
+                        group_limit="row_number <= {} AND ".format(group_limit)
+                        if group_limit
+                        else "",
+                        group_selects=" AND ".join(group_label_selects),
+                    ),
+                ).strip()
 
-            select_sql = sql_template.format(
-                keys=",".join(
-                    self.select_columns + (self.join_columns if enable_joins and self.join_columns else [])
-                ),
-                table_name=overwrite_select_from
-                if overwrite_select_from
-                else self.table_name,
-                joins=" ".join(self.joins)
-                if enable_joins and self.joins is not None
-                else "",
-                where="WHERE {}".format(" AND ".join(conditions)) if conditions else "",
-                group_by=", ".join(groups),
-                order_by="ORDER BY {}".format(", ".join(order)) if order else "",
-                group_where="""
-                    WHERE {group_limit} {group_selects}
-                """.format(
-                    group_limit="row_number <= {} AND ".format(group_limit)
-                    if group_limit
-                    else "",
-                    group_selects=" AND ".join(group_label_selects),
-                ),
-            ).strip()
+            select_sql = self._select_statement(
+                ("find_group_content", conditions, order, groups, tuple(group_label_selects), group_limit,
+                 enable_joins, overwrite_select_from),
+                _render_group_content
+            )
 
         # Run benchmarking on query if requested
         benchmark_results = None
@@ -1,3 +1,4 @@
+from functools import cached_property
 from services.data.db_utils import DBResponse, translate_run_key
 from .base import AsyncPostgresTable
 from .task import AsyncTaskTablePostgres
@@ -12,6 +13,8 @@ class AsyncMetadataTablePostgres(AsyncPostgresTable):
     task_table_name = AsyncTaskTablePostgres.table_name
     keys = MetaserviceMetadataTable.keys
     primary_keys = MetaserviceMetadataTable.primary_keys
+    # The primary keys do not identify a metadata row, as a field can be recorded multiple times.
+    cursor_keys = ["id"]
     trigger_keys = MetaserviceMetadataTable.trigger_keys
     trigger_operations = ["INSERT"]
     trigger_conditions = [
@@ -21,7 +24,7 @@ class AsyncMetadataTablePostgres(AsyncPostgresTable):
         "NEW.field_name = 'code-package-url'",
     ]
 
-    @property
+    @cached_property
     def select_columns(self):
         keys = ["{table_name}.{col} AS {col}".format(table_name=self.table_name, col=k) for k in self.keys]
 
@@ -1,11 +1,13 @@
 import os
 import time
+from functools import cached_property
 from typing import List, Tuple
 from .base import (
     AsyncPostgresTable,
     OLD_RUN_FAILURE_CUTOFF_TIME,
     RUN_INACTIVE_CUTOFF_TIME,
 )
+from .run_status import AsyncRunStatusTablePostgres
 from ..models import RunRow
 from services.data.db_utils import DBResponse, DBPagination, translate_run_key
 
@@ -33,49 +35,21 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
     trigger_keys = MetadataRunTable.trigger_keys
     trigger_operations = ["INSERT"]
 
-    # NOTE: OSS Schema has metadata value column as TEXT, but for the time being we also need to support
-    # value columns of type jsonb, which is why there is additional logic when dealing with 'value'
+    run_status_table = AsyncRunStatusTablePostgres.table_name
+
+    # Summary of end step attempts, maintained by a trigger on the metadata table.
     joins = [
         """
-        LEFT JOIN LATERAL (
-            SELECT
-                ts_epoch,
-                (CASE
-                    WHEN pg_typeof(value)='jsonb'::regtype
-                    THEN value::jsonb->>0
-                    ELSE value::text
-                END)::boolean as value
-            FROM {metadata_table} as attempt_ok
-            WHERE
-                {table_name}.flow_id = attempt_ok.flow_id AND
-                {table_name}.run_number = attempt_ok.run_number AND
-                attempt_ok.step_name = 'end' AND
-                attempt_ok.field_name = 'attempt_ok'
-            ORDER BY ts_epoch DESC
-            LIMIT 1
-        ) as end_attempt_ok ON true
-        """.format(
-            table_name=table_name, metadata_table=metadata_table
-        ),
-        """
-        LEFT JOIN LATERAL (
-            SELECT ts_epoch
-            FROM {metadata_table} as attempt
-            WHERE
-                {table_name}.flow_id = attempt.flow_id AND
-                {table_name}.run_number = attempt.run_number AND
-                attempt.step_name = 'end' AND
-                attempt.field_name = 'attempt' AND
-                end_attempt_ok.value IS FALSE
-            ORDER BY ts_epoch DESC
-            LIMIT 1
-        ) as end_attempt ON true
+        LEFT JOIN {run_status_table} as run_status
+        ON
+            {table_name}.flow_id = run_status.flow_id AND
+            {table_name}.run_number = run_status.run_number
         """.format(
-            table_name=table_name, metadata_table=metadata_table
+            table_name=table_name, run_status_table=run_status_table
         ),
     ]
 
-    @property
+    @cached_property
     def select_columns(self):
         # NOTE: We must use a function scope in order to be able to access the table_name variable for list comprehension.
         # User should be considered NULL when 'user:*' tag is missing
@@ -102,14 +76,15 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
             ]
         )
 
+    # A failed end step that has been retried afterwards is considered to be running.
     join_columns = [
         """
         (CASE
-            WHEN end_attempt IS NOT NULL
-                AND end_attempt_ok.ts_epoch < end_attempt.ts_epoch
+            WHEN run_status.end_attempt_ok IS FALSE
+                AND run_status.end_attempt_ok_ts < run_status.end_attempt_ts
             THEN NULL
-            WHEN end_attempt_ok IS NOT NULL
-            THEN end_attempt_ok.ts_epoch
+            WHEN run_status.end_attempt_ok_ts IS NOT NULL
+            THEN run_status.end_attempt_ok_ts
             WHEN {table_name}.last_heartbeat_ts IS NOT NULL
                 AND @(extract(epoch from now())-{table_name}.last_heartbeat_ts)<={heartbeat_cutoff}
             THEN NULL
@@ -121,12 +96,12 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
         ),
         """
         (CASE
-            WHEN end_attempt IS NOT NULL
-                AND end_attempt_ok.ts_epoch < end_attempt.ts_epoch
+            WHEN run_status.end_attempt_ok IS FALSE
+                AND run_status.end_attempt_ok_ts < run_status.end_attempt_ts
             THEN 'running'
-            WHEN end_attempt_ok IS NOT NULL AND end_attempt_ok.value IS TRUE
+            WHEN run_status.end_attempt_ok IS TRUE
             THEN 'completed'
-            WHEN end_attempt_ok IS NOT NULL AND end_attempt_ok.value IS FALSE
+            WHEN run_status.end_attempt_ok IS FALSE
             THEN 'failed'
             WHEN {table_name}.last_heartbeat_ts IS NOT NULL
                 AND @(extract(epoch from now())-{table_name}.last_heartbeat_ts)<={heartbeat_cutoff}
@@ -139,12 +114,12 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
         ),
         """
         (CASE
-            WHEN end_attempt IS NOT NULL
-                AND end_attempt_ok.ts_epoch < end_attempt.ts_epoch
+            WHEN run_status.end_attempt_ok IS FALSE
+                AND run_status.end_attempt_ok_ts < run_status.end_attempt_ts
                 AND {table_name}.last_heartbeat_ts IS NOT NULL
             THEN {table_name}.last_heartbeat_ts*1000-{table_name}.ts_epoch
-            WHEN end_attempt_ok IS NOT NULL
-            THEN end_attempt_ok.ts_epoch - {table_name}.ts_epoch
+            WHEN run_status.end_attempt_ok_ts IS NOT NULL
+            THEN run_status.end_attempt_ok_ts - {table_name}.ts_epoch
             WHEN {table_name}.last_heartbeat_ts IS NOT NULL
             THEN {table_name}.last_heartbeat_ts*1000-{table_name}.ts_epoch
             WHEN {table_name}.last_heartbeat_ts IS NULL
@@ -224,6 +199,30 @@ class AsyncRunTablePostgres(AsyncPostgresTable):
         )
         return result
 
+    async def get_expanded_runs(self, run_numbers: List[int]) -> DBResponse:
+        """
+        Fetch multiple runs with the given run numbers from the DB with a single query.
+
+        Parameters
+        ----------
+        run_numbers : List[int]
+            run numbers of the runs
+
+        Returns
+        -------
+        DBResponse
+            Containing a list of the runs that were found.
+        """
+        if not run_numbers:
+            return DBResponse(response_code=200, body=[])
+        result, *_ = await self.find_records(
+            conditions=["run_number = ANY(%s)"],
+            values=[list(run_numbers)],
+            enable_joins=True,
+            expanded=True,
+        )
+        return result
+
     async def get_run_keys(
         self,
         conditions: List[str] = [],
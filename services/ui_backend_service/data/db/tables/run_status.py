@@ -0,0 +1,81 @@
+import os
+from .base import AsyncPostgresTable
+from services.data.db_utils import DBResponse
+# use schema constants from the .data module to keep things consistent
+from services.data.postgres_async_db import AsyncMetadataTablePostgres as MetaMetadataTable
+
+RUN_STATUS_TABLE_NAME = os.environ.get("DB_TABLE_NAME_RUN_STATUS", "run_status_v3")
+
+
+class AsyncRunStatusTablePostgres(AsyncPostgresTable):
+    """
+    Summary of the end step attempts for each run, used for deriving run status, finished_at and duration.
+
+    The table is maintained by a database trigger on inserts of 'attempt' and 'attempt_ok' metadata
+    for the end step, which is set up by the migration service.
+    """
+    table_name = RUN_STATUS_TABLE_NAME
+    metadata_table = MetaMetadataTable.table_name
+    keys = ["flow_id", "run_number", "end_attempt_ok_ts", "end_attempt_ok", "end_attempt_ts"]
+    primary_keys = ["flow_id", "run_number"]
+    trigger_keys = None
+    select_columns = keys
+
+    async def backfill(self, flow_id: str = None) -> DBResponse:
+        """
+        Recompute the run status summary from the metadata table.
+
+        Parameters
+        ----------
+        flow_id : str (optional)
+            only recompute the runs of a single flow.
+
+        Returns
+        -------
+        DBResponse
+            body contains the number of runs that were updated.
+        """
+        sql_template = """
+            WITH updated AS (
+                INSERT INTO {table_name} (flow_id, run_number, end_attempt_ok_ts, end_attempt_ok, end_attempt_ts)
+                SELECT
+                    flow_id,
+                    run_number,
+                    (array_agg(ts_epoch ORDER BY ts_epoch DESC) FILTER (WHERE field_name = 'attempt_ok'))[1],
+                    (array_agg(
+                        (CASE lower(btrim(value::text, '"'))
+                            WHEN 'true' THEN true
+                            WHEN 'false' THEN false
+                            ELSE NULL
+                        END) ORDER BY ts_epoch DESC
+                    ) FILTER (WHERE field_name = 'attempt_ok'))[1],
+                    max(ts_epoch) FILTER (WHERE field_name = 'attempt')
+                FROM {metadata_table}
+                WHERE
+                    step_name = 'end' AND
+                    field_name IN ('attempt', 'attempt_ok')
+                    {flow_condition}
+                GROUP BY flow_id, run_number
+                ON CONFLICT (flow_id, run_number) DO UPDATE
+                SET
+                    end_attempt_ok_ts = EXCLUDED.end_attempt_ok_ts,
+                    end_attempt_ok = EXCLUDED.end_attempt_ok,
+                    end_attempt_ts = EXCLUDED.end_attempt_ts
+                RETURNING 1
+            )
+            SELECT count(*) FROM updated
+            """
+        select_sql = sql_template.format(
+            table_name=self.table_name,
+            metadata_table=self.metadata_table,
+            flow_condition="AND flow_id = %s" if flow_id else ""
+        )
+        # The backfill writes, so it can not be executed on a reader pool.
+        with (await self.db.pool.cursor()) as cur:
+            res, _ = await self.execute_sql(
+                select_sql=select_sql, values=[flow_id] if flow_id else [],
+                fetch_single=True, serialize=False, cur=cur)
+            cur.close()
+        if res.response_code != 200:
+            return res
+        return DBResponse(response_code=200, body={"updated": res.body[0]})
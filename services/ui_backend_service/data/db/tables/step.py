@@ -1,3 +1,4 @@
+from functools import cached_property
 from typing import List, Tuple
 from .base import AsyncPostgresTable, OLD_RUN_FAILURE_CUTOFF_TIME
 from ..models import StepRow
@@ -76,7 +77,7 @@ class AsyncStepTablePostgres(AsyncPostgresTable):
         )
     ]
 
-    @property
+    @cached_property
     def select_columns(self):
         # NOTE: We must use a function scope in order to be able to access the table_name variable for list comprehension.
         return ["{table_name}.{col} AS {col}".format(table_name=self.table_name, col=k) for k in self.keys]
@@ -0,0 +1,125 @@
+import os
+from .base import AsyncPostgresTable
+from services.data.db_utils import DBResponse
+# use schema constants from the .data module to keep things consistent
+from services.data.postgres_async_db import (
+    AsyncMetadataTablePostgres as MetaMetadataTable,
+    AsyncArtifactTablePostgres as MetadataArtifactTable
+)
+
+TASK_ATTEMPTS_TABLE_NAME = os.environ.get("DB_TABLE_NAME_TASK_ATTEMPTS", "task_attempts_v3")
+
+
+class AsyncTaskAttemptTablePostgres(AsyncPostgresTable):
+    """
+    Summary of task attempts, used for deriving the timing and status of task attempts.
+
+    The table is maintained by database triggers on inserts of 'attempt', 'attempt-done' and 'attempt_ok'
+    metadata and '_task_ok' artifacts, which are set up by the migration service.
+    """
+    table_name = TASK_ATTEMPTS_TABLE_NAME
+    metadata_table = MetaMetadataTable.table_name
+    artifact_table = MetadataArtifactTable.table_name
+    keys = ["flow_id", "run_number", "step_name", "task_id", "attempt_id",
+            "started_at", "attempt_finished_at", "attempt_ok",
+            "task_ok_finished_at", "task_ok_location"]
+    primary_keys = ["flow_id", "run_number", "step_name", "task_id", "attempt_id"]
+    trigger_keys = None
+    select_columns = keys
+
+    async def backfill(self, flow_id: str = None) -> DBResponse:
+        """
+        Recompute the task attempt summary from the metadata and artifact tables.
+
+        Parameters
+        ----------
+        flow_id : str (optional)
+            only recompute the task attempts of a single flow.
+
+        Returns
+        -------
+        DBResponse
+            body contains the number of task attempts that were updated.
+        """
+        sql_template = """
+            WITH updated AS (
+                INSERT INTO {table_name} (
+                    flow_id, run_number, step_name, task_id, attempt_id,
+                    started_at, attempt_finished_at, attempt_ok, task_ok_finished_at, task_ok_location
+                )
+                SELECT
+                    flow_id, run_number, step_name, task_id, attempt_id,
+                    max(started_at), max(attempt_finished_at), bool_or(attempt_ok),
+                    max(task_ok_finished_at), max(task_ok_location)
+                FROM (
+                    SELECT
+                        flow_id, run_number, step_name, task_id,
+                        btrim(value::text, '"')::int as attempt_id,
+                        (CASE WHEN field_name = 'attempt' THEN ts_epoch END) as started_at,
+                        (CASE WHEN field_name = 'attempt-done' THEN ts_epoch END) as attempt_finished_at,
+                        NULL::boolean as attempt_ok,
+                        NULL::bigint as task_ok_finished_at,
+                        NULL::text as task_ok_location
+                    FROM {metadata_table}
+                    WHERE
+                        field_name IN ('attempt', 'attempt-done') AND
+                        btrim(value::text, '"') ~ '^\\d{{1,9}}$'
+                        {flow_condition}
+                    UNION ALL
+                    SELECT
+                        flow_id, run_number, step_name, task_id,
+                        substring(tags::text from 'attempt_id:(\\d{{1,9}})')::int as attempt_id,
+                        NULL as started_at,
+                        ts_epoch as attempt_finished_at,
+                        (CASE lower(btrim(value::text, '"'))
+                            WHEN 'true' THEN true
+                            WHEN 'false' THEN false
+                            ELSE NULL
+                        END) as attempt_ok,
+                        NULL as task_ok_finished_at,
+                        NULL as task_ok_location
+                    FROM {metadata_table}
+                    WHERE
+                        field_name = 'attempt_ok' AND
+                        substring(tags::text from 'attempt_id:(\\d{{1,9}})') IS NOT NULL
+                        {flow_condition}
+                    UNION ALL
+                    SELECT
+                        flow_id, run_number, step_name, task_id, attempt_id,
+                        NULL as started_at,
+                        NULL as attempt_finished_at,
+                        NULL as attempt_ok,
+                        ts_epoch as task_ok_finished_at,
+                        location as task_ok_location
+                    FROM {artifact_table}
+                    WHERE
+                        name = '_task_ok'
+                        {flow_condition}
+                ) a
+                GROUP BY flow_id, run_number, step_name, task_id, attempt_id
+                ON CONFLICT (flow_id, run_number, step_name, task_id, attempt_id) DO UPDATE
+                SET
+                    started_at = EXCLUDED.started_at,
+                    attempt_finished_at = EXCLUDED.attempt_finished_at,
+                    attempt_ok = EXCLUDED.attempt_ok,
+                    task_ok_finished_at = EXCLUDED.task_ok_finished_at,
+                    task_ok_location = EXCLUDED.task_ok_location
+                RETURNING 1
+            )
+            SELECT count(*) FROM updated
+            """
+        select_sql = sql_template.format(
+            table_name=self.table_name,
+            metadata_table=self.metadata_table,
+            artifact_table=self.artifact_table,
+            flow_condition="AND flow_id = %(flow_id)s" if flow_id else ""
+        )
+        # The backfill writes, so it can not be executed on a reader pool.
+        with (await self.db.pool.cursor()) as cur:
+            res, _ = await self.execute_sql(
+                select_sql=select_sql, values={"flow_id": flow_id},
+                fetch_single=True, serialize=False, cur=cur)
+            cur.close()
+        if res.response_code != 200:
+            return res
+        return DBResponse(response_code=200, body={"updated": res.body[0]})
@@ -0,0 +1,113 @@
+import os
+import json
+from typing import Dict, List, Tuple
+
+import psycopg2
+import psycopg2.extras
+from .base import AsyncPostgresTable
+from services.data.db_utils import DBResponse, aiopg_exception_handling
+
+WEBSOCKET_EVENT_TABLE_NAME = os.environ.get("DB_TABLE_NAME_WEBSOCKET_EVENTS", "websocket_events_v3")
+
+
+class AsyncWebsocketEventTablePostgres(AsyncPostgresTable):
+    """
+    Append-only log of realtime events that have been broadcast to websocket subscribers.
+
+    Timestamps are assigned by the database so that events from every UI service instance
+    share the same clock.
+    """
+    table_name = WEBSOCKET_EVENT_TABLE_NAME
+    keys = ["id", "ts_epoch", "operation", "resources", "data"]
+    primary_keys = ["id"]
+    trigger_keys = None
+    select_columns = keys
+
+    async def add_event(self, event: Dict) -> DBResponse:
+        """
+        Append an event to the log.
+
+        Parameters
+        ----------
+        event : Dict
+            Event with 'operation', 'resources' and 'data' keys.
+
+        Returns
+        -------
+        DBResponse
+            body contains the 'id' and 'ts_epoch' of the stored event.
+        """
+        insert_sql = """
+            INSERT INTO {table_name} (operation, resources, data)
+            VALUES (%s, %s, %s)
+            RETURNING id, ts_epoch
+            """.format(table_name=self.table_name)
+        values = [event.get("operation"), json.dumps(event.get("resources", [])), json.dumps(event.get("data"))]
+        try:
+            with (await self.db.pool.cursor(
+                    cursor_factory=psycopg2.extras.DictCursor
+            )) as cur:
+                await cur.execute(insert_sql, values)
+                row = await cur.fetchone()
+                cur.close()
+                return DBResponse(response_code=200, body=dict(row))
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.db.logger.exception("Exception occurred")
+            return aiopg_exception_handling(error)
+
+    async def get_events_since(self, since_epoch: float) -> List[Tuple[float, Dict]]:
+        """
+        Events stored at or after the given unix time (seconds), in the order they were stored.
+
+        Returns
+        -------
+        List
+            (timestamp in seconds, event) tuples
+        """
+        # Every UI service instance appends the events it broadcasts, so identical events are
+        # deduplicated by keeping only their latest occurrence, which preserves the final state.
+        select_sql = """
+            SELECT ts_epoch, operation, resources, data FROM (
+                SELECT DISTINCT ON (operation, resources, data)
+                    id, ts_epoch, operation, resources, data
+                FROM {table_name}
+                WHERE ts_epoch >= %s
+                ORDER BY operation, resources, data, id DESC
+            ) T
+            ORDER BY id ASC
+            """.format(table_name=self.table_name)
+        res, _ = await self.execute_sql(
+            select_sql=select_sql, values=[int(since_epoch * 1000)], serialize=False)
+        if res.response_code != 200:
+            return []
+        return [
+            (row["ts_epoch"] / 1000, {
+                "operation": row["operation"],
+                "resources": row["resources"],
+                "data": row["data"]
+            })
+            for row in res.body
+        ]
+
+    async def delete_events_before(self, cutoff_epoch: float) -> int:
+        """
+        Delete events stored before the given unix time (seconds).
+
+        Returns
+        -------
+        int
+            number of deleted events
+        """
+        delete_sql = """
+            DELETE FROM {table_name}
+            WHERE ts_epoch < %s
+            """.format(table_name=self.table_name)
+        try:
+            with (await self.db.pool.cursor()) as cur:
+                await cur.execute(delete_sql, [int(cutoff_epoch * 1000)])
+                deleted = cur.rowcount
+                cur.close()
+                return deleted
+        except (Exception, psycopg2.DatabaseError):
+            self.db.logger.exception("Exception occurred")
+            return 0
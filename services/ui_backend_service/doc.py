@@ -241,6 +241,14 @@ swagger_definitions = {
                 "type": "integer",
                 "default": 1,
             },
+            "_cursor": {
+                "name": "_cursor",
+                "in": "query",
+                "description": "Keyset pagination cursor. Pass an empty value for the first page, "
+                               "and follow the 'next' link for subsequent pages. Takes precedence over _page.",
+                "required": False,
+                "type": "string",
+            },
             "_limit": {
                 "name": "_limit",
                 "in": "query",
@@ -241,7 +241,8 @@ def assertable_task(task):
         "flow_id": task.get("flow_id"),
         "run_number": int(task.get("run_number")),
         "step_name": task.get("step_name"),
-        "task_id": int(task.get("task_id"))
+        "task_id": int(task.get("task_id")),
+        "last_heartbeat_ts": task.get("last_heartbeat_ts")
     }
 
 
@@ -385,3 +385,47 @@ async def test_single_run_attempt_ok_failed(cli, db):
     _run["duration"] = _run["finished_at"] - _run["ts_epoch"]
 
     await _test_single_resource(cli, db, "/flows/{flow_id}/runs/{run_number}".format(**_run), 200, _run)
+
+
+async def test_list_runs_keyset_pagination(cli, db):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _runs = [(await add_run(db, flow_id=_flow.get("flow_id"))).body for _ in range(5)]
+    _other_run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+
+    async def _pages(path):
+        run_numbers = []
+        while path:
+            resp = await cli.get(path)
+            assert resp.status == 200
+            body = await resp.json()
+            run_numbers.append([run["run_number"] for run in body["data"]])
+            path = body["links"]["next"]
+            if path:
+                path = path[path.index("/runs"):]
+        return run_numbers
+
+    expected = sorted([int(_run["run_number"]) for _run in _runs + [_other_run]], reverse=True)
+    assert await _pages("/runs?_limit=2&_cursor=") == [expected[0:2], expected[2:4], expected[4:6], []]
+
+    # Runs with equal sort keys are paginated by their primary keys, in the direction of the last sort column.
+    await db.run_table_postgres.execute_sql(
+        select_sql="UPDATE {} SET ts_epoch = 1 WHERE run_number != %s RETURNING *".format(db.run_table_postgres.table_name),
+        values=[_other_run["run_number"]])
+    expected = sorted([int(_run["run_number"]) for _run in _runs])
+    assert await _pages("/runs?_limit=4&_order=%2Bts_epoch&_cursor=") == [
+        expected[0:4],
+        expected[4:5] + [int(_other_run["run_number"])]
+    ]
+
+
+async def test_get_expanded_runs(cli, db):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _first_run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+    _second_run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+    await add_run(db, flow_id=_flow.get("flow_id"))
+
+    run_numbers = [int(_first_run["run_number"]), int(_second_run["run_number"])]
+    result = await db.run_table_postgres.get_expanded_runs(run_numbers)
+    assert result.response_code == 200
+    assert sorted(run["run_number"] for run in result.body) == run_numbers
+    assert all("status" in run for run in result.body)
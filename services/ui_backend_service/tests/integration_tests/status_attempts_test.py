@@ -308,3 +308,57 @@ async def test_attempt_status_failed_heartbeat(cli, db):
     assert data["ts_epoch"] == _task["ts_epoch"]
     assert data["started_at"] == None
     assert data["finished_at"] == 1000  # last heartbeat in this case
+
+
+async def test_attempt_status_from_task_attempts_summary(cli, db):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+    _step = (await add_step(db, flow_id=_run.get("flow_id"), step_name="end", run_number=_run.get("run_number"), run_id=_run.get("run_id"))).body
+    _task = (await add_task(db,
+                            flow_id=_step.get("flow_id"),
+                            step_name=_step.get("step_name"),
+                            run_number=_step.get("run_number"),
+                            run_id=_step.get("run_id"))).body
+
+    async def _add_task_metadata(field_name, value, tags=["metadata_tag"]):
+        return (await add_metadata(db,
+                                   flow_id=_task.get("flow_id"),
+                                   run_number=_task.get("run_number"),
+                                   run_id=_task.get("run_id"),
+                                   step_name=_task.get("step_name"),
+                                   task_id=_task.get("task_id"),
+                                   task_name=_task.get("task_name"),
+                                   tags=tags,
+                                   metadata={
+                                       "field_name": field_name,
+                                       "value": value,
+                                       "type": field_name})).body
+
+    _first_attempt = await _add_task_metadata("attempt", "0")
+    # Unparseable values are skipped by the summary instead of failing the insert
+    await _add_task_metadata("attempt", "not-a-number")
+    _second_attempt = await _add_task_metadata("attempt", "1")
+    _second_attempt_ok = await _add_task_metadata("attempt_ok", "True", tags=["attempt_id:1"])
+
+    _path = "/flows/{flow_id}/runs/{run_number}/steps/{step_name}/tasks/{task_id}".format(**_task)
+
+    async def _assert_attempts():
+        _, data = await _test_single_resource(cli, db, _path + "/attempts", 200, None)
+        data = sorted(data, key=lambda attempt: attempt["attempt_id"])
+        assert [(attempt["attempt_id"], attempt["status"]) for attempt in data] == [(0, "failed"), (1, "completed")]
+        assert data[0]["started_at"] == _first_attempt["ts_epoch"]
+        assert data[0]["finished_at"] == _second_attempt["ts_epoch"]
+        assert data[1]["started_at"] == _second_attempt["ts_epoch"]
+        assert data[1]["finished_at"] == _second_attempt_ok["ts_epoch"]
+
+    await _assert_attempts()
+
+    # Backfill recomputes the same summary from metadata
+    await db.task_attempt_table_postgres.execute_sql(
+        select_sql="DELETE FROM {} RETURNING *".format(db.task_attempt_table_postgres.table_name))
+
+    backfill = await db.task_attempt_table_postgres.backfill(flow_id=_flow["flow_id"])
+    assert backfill.response_code == 200
+    assert backfill.body == {"updated": 2}
+
+    await _assert_attempts()
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from .utils import (
     cli, db,
@@ -343,3 +344,68 @@ async def test_run_status_failed_with_retrying_task(cli, db):
     _, data = await _test_single_resource(cli, db, "/flows/{flow_id}/runs/{run_number}".format(**_run), 200)
 
     assert data["status"] == "failed"
+
+
+async def _add_end_metadata(db, task, field_name, value, attempt_id=0):
+    return (await add_metadata(db,
+                               flow_id=task.get("flow_id"),
+                               run_number=task.get("run_number"),
+                               run_id=task.get("run_id"),
+                               step_name=task.get("step_name"),
+                               task_id=task.get("task_id"),
+                               task_name=task.get("task_name"),
+                               tags=["attempt_id:{}".format(attempt_id)],
+                               metadata={
+                                   "field_name": field_name,
+                                   "value": value,
+                                   "type": "internal_attempt_status"})).body
+
+
+# Run status is derived from the run_status summary, which is maintained from end step metadata
+# and can be recomputed with a backfill.
+async def test_run_status_from_run_status_summary(cli, db):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+    _step = (await add_step(db, flow_id=_run.get("flow_id"), step_name="end", run_number=_run.get("run_number"), run_id=_run.get("run_id"))).body
+    _task = (await add_task(db,
+                            flow_id=_step.get("flow_id"),
+                            step_name=_step.get("step_name"),
+                            run_number=_step.get("run_number"),
+                            run_id=_step.get("run_id"))).body
+    _path = "/flows/{flow_id}/runs/{run_number}".format(**_run)
+
+    await _add_end_metadata(db, _task, "attempt", "0", attempt_id=0)
+    _failed = await _add_end_metadata(db, _task, "attempt_ok", "False", attempt_id=0)
+
+    _, data = await _test_single_resource(cli, db, _path, 200, None)
+    assert data["status"] == "failed"
+    assert data["finished_at"] == _failed["ts_epoch"]
+    assert data["duration"] == _failed["ts_epoch"] - _run["ts_epoch"]
+
+    # Retrying a failed end step marks the run as running again
+    await asyncio.sleep(0.01)
+    await _add_end_metadata(db, _task, "attempt", "1", attempt_id=1)
+
+    _, data = await _test_single_resource(cli, db, _path, 200, None)
+    assert data["status"] == "running"
+    assert data["finished_at"] is None
+
+    _completed = await _add_end_metadata(db, _task, "attempt_ok", "True", attempt_id=1)
+
+    _, data = await _test_single_resource(cli, db, _path, 200, None)
+    assert data["status"] == "completed"
+    assert data["finished_at"] == _completed["ts_epoch"]
+
+    # Backfill recomputes the same summary from metadata
+    await db.run_status_table_postgres.execute_sql(
+        select_sql="DELETE FROM {} RETURNING *".format(db.run_status_table_postgres.table_name))
+    _, data = await _test_single_resource(cli, db, _path, 200, None)
+    assert data["status"] == "failed"
+
+    backfill = await db.run_status_table_postgres.backfill(flow_id=_flow["flow_id"])
+    assert backfill.response_code == 200
+    assert backfill.body == {"updated": 1}
+
+    _, data = await _test_single_resource(cli, db, _path, 200, None)
+    assert data["status"] == "completed"
+    assert data["finished_at"] == _completed["ts_epoch"]
@@ -591,3 +591,30 @@ async def create_task_attempt_ok_metadata(db, task, attempt_id: int, attempt_ok:
             "value": str(attempt_ok)
         }
     )
+
+
+async def test_get_task_attempts(cli, db):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _run = (await add_run(db, flow_id=_flow.get("flow_id"))).body
+    _step = (await add_step(db, flow_id=_run.get("flow_id"), step_name="step", run_number=_run.get("run_number"), run_id=_run.get("run_id"))).body
+    _first_task = (await add_task(db, flow_id=_step.get("flow_id"), step_name=_step.get("step_name"),
+                                  run_number=_step.get("run_number"), run_id=_step.get("run_id"))).body
+    _second_task = (await add_task(db, flow_id=_step.get("flow_id"), step_name=_step.get("step_name"),
+                                   run_number=_step.get("run_number"), run_id=_step.get("run_id"))).body
+    await create_task_attempt_metadata(db, _second_task)
+    await create_task_attempt_metadata(db, _second_task, attempt=1)
+
+    def _key(task, attempt_id):
+        return (task["flow_id"], int(task["run_number"]), task["step_name"], int(task["task_id"]), attempt_id)
+
+    result = await db.task_table_postgres.get_task_attempts(
+        [_key(_first_task, 0), _key(_second_task, 1), _key(_second_task, 2)]
+    )
+    assert result.response_code == 200
+    assert sorted((task["task_id"], task["attempt_id"]) for task in result.body) == [
+        (int(_first_task["task_id"]), 0), (int(_second_task["task_id"]), 1)
+    ]
+
+    result = await db.task_table_postgres.get_task_attempts([])
+    assert result.response_code == 200
+    assert result.body == []
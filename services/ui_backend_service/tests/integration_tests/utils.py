@@ -90,6 +90,8 @@ async def init_db(cli):
 async def clean_db(db: AsyncPostgresDB):
     # Tables to clean (order is important due to foreign keys)
     tables = [
+        db.run_status_table_postgres,
+        db.task_attempt_table_postgres,
         db.metadata_table_postgres,
         db.artifact_table_postgres,
         db.task_table_postgres,
@@ -102,6 +104,7 @@ async def clean_db(db: AsyncPostgresDB):
     )) as cur:
         for table in tables:
             await table.execute_sql(select_sql="DELETE FROM {}".format(table.table_name), cur=cur)
+    db.run_tags_cache.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,118 @@
+import pytest
+import time
+import asyncio
+import math
+from aiohttp import web
+from .utils import (
+    cli, init_db, clean_db,
+    add_flow
+)
+from services.ui_backend_service.api import Websocket
+from services.ui_backend_service.api.notify import ListenNotify
+from services.ui_backend_service.api.utils import DBTTLQueue
+from services.ui_backend_service.data.db.tables import AsyncWebsocketEventTablePostgres
+
+pytestmark = [pytest.mark.integration_tests]
+
+# Fixtures begin
+
+
+@pytest.fixture
+async def db(cli):
+    async_db = await init_db(cli)
+    table = AsyncWebsocketEventTablePostgres(async_db)
+    await table.delete_events_before(time.time() + 60)
+
+    yield async_db
+
+    await table.delete_events_before(time.time() + 60)
+    await clean_db(async_db)
+
+
+@pytest.fixture
+async def event_table(db):
+    return AsyncWebsocketEventTablePostgres(db)
+
+# Fixtures end
+
+
+def _event(operation="INSERT", resource="/flows", data={"flow_id": "HelloFlow"}):
+    return {"operation": operation, "resources": [resource], "data": data}
+
+
+async def test_db_queue_values_since(event_table):
+    queue = DBTTLQueue(event_table, ttl_in_seconds=60)
+    before = time.time() - 1
+
+    await queue.append(_event(data={"flow_id": "A"}))
+    await queue.append(_event(data={"flow_id": "B"}))
+
+    values = await queue.values_since(before)
+    assert [event["data"]["flow_id"] for _, event in values] == ["A", "B"]
+    assert values[0][1] == _event(data={"flow_id": "A"})
+    assert all(ts >= before for ts, _ in values)
+
+    assert await queue.values_since(time.time() + 60) == []
+
+
+async def test_db_queue_shared_between_instances(event_table):
+    # Two UI service instances broadcasting the same events
+    queue_a = DBTTLQueue(event_table, ttl_in_seconds=60)
+    queue_b = DBTTLQueue(AsyncWebsocketEventTablePostgres(event_table.db), ttl_in_seconds=60)
+
+    for data in [{"flow_id": "A", "v": 1}, {"flow_id": "A", "v": 2}, {"flow_id": "A", "v": 1}]:
+        await queue_a.append(_event(operation="UPDATE", data=data))
+        await queue_b.append(_event(operation="UPDATE", data=data))
+
+    values_a = await queue_a.values()
+    values_b = await queue_b.values()
+    assert values_a == values_b
+    # Duplicates are collapsed while the final state stays last
+    assert [event["data"]["v"] for _, event in values_a] == [2, 1]
+
+
+async def test_db_queue_retention(event_table):
+    queue = DBTTLQueue(event_table, ttl_in_seconds=0.5, retention_interval=0)
+    await queue.append(_event(data={"flow_id": "expired"}))
+    await asyncio.sleep(1)
+
+    # Expired values are not returned even before they have been deleted
+    assert await queue.values() == []
+
+    await queue.append(_event(data={"flow_id": "fresh"}))
+    rows = await event_table.get_events_since(0)
+    assert [event["data"]["flow_id"] for _, event in rows] == ["fresh"]
+
+
+async def test_subscription_replay_from_postgres(aiohttp_client, cli, db):
+    # UI service instance that uses the shared replay store
+    event_emitter = cli.server.app.event_emitter
+    other_app = web.Application()
+    Websocket(other_app, db, event_emitter, replay_store="postgres")
+    ListenNotify(cli.server.app, db, event_emitter)
+    other_cli = await aiohttp_client(other_app)
+
+    now = int(math.floor(time.time()))
+
+    # Subscribe on the other instance so that it broadcasts (and stores) the event.
+    other_ws = await other_cli.ws_connect("/ws")
+    await other_ws.send_json({"type": "SUBSCRIBE", "uuid": "123", "resource": "/flows"})
+    await asyncio.sleep(0.1)
+
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    msg = await other_ws.receive_json(timeout=1)
+    assert msg["data"] == _flow
+    await other_ws.close()
+
+    # Reconnect to a fresh instance, which has not seen the event itself.
+    fresh_app = web.Application()
+    Websocket(fresh_app, db, replay_store="postgres")
+    fresh_cli = await aiohttp_client(fresh_app)
+    ws = await fresh_cli.ws_connect("/ws")
+    await ws.send_json({"type": "SUBSCRIBE", "uuid": "123", "resource": "/flows", "since": now - 10})
+
+    msg = await ws.receive_json(timeout=1)
+    assert msg["type"] == "INSERT"
+    assert msg["data"] == _flow
+
+    await ws.close()
@@ -4,10 +4,11 @@ import asyncio
 import math
 from .utils import (
     cli, init_app, init_db, clean_db,
-    add_flow,
+    add_flow, add_run, add_step, add_task,
     TIMEOUT_FUTURE
 )
 from services.ui_backend_service.api.notify import ListenNotify
+from services.ui_backend_service.data.db.tables import AsyncTaskTablePostgres
 
 pytestmark = [pytest.mark.integration_tests]
 
@@ -225,3 +226,39 @@ async def test_subscription_filters(cli, db):
         pass
 
     await ws.close()
+
+
+async def test_subscription_batches_table_events(cli, db, monkeypatch):
+    _flow = (await add_flow(db, flow_id="HelloFlow")).body
+    _run = (await add_run(db, flow_id=_flow["flow_id"])).body
+    _step = (await add_step(db, flow_id=_run["flow_id"], run_number=_run["run_number"], step_name="step")).body
+
+    # Count the task loads performed for broadcasting
+    find_records = AsyncTaskTablePostgres.find_records
+    calls = []
+
+    async def _find_records(self, *args, **kwargs):
+        calls.append(kwargs)
+        return await find_records(self, *args, **kwargs)
+    monkeypatch.setattr(AsyncTaskTablePostgres, "find_records", _find_records)
+
+    ws = await cli.ws_connect("/ws")
+    await _subscribe(ws, "/flows/HelloFlow/runs/{run_number}/steps/step/tasks".format(**_run))
+    await asyncio.sleep(0.1)
+
+    task_ids = []
+    for _ in range(10):
+        _task = (await add_task(db, flow_id=_step["flow_id"], run_number=_step["run_number"], step_name="step")).body
+        task_ids.append(str(_task["task_id"]))
+
+    received = []
+    for _ in task_ids:
+        msg = await ws.receive_json(timeout=1)
+        assert msg["type"] == "INSERT"
+        received.append(str(msg["data"]["task_id"]))
+
+    assert sorted(received) == sorted(task_ids)
+    # Burst of inserts should be loaded with fewer queries than there were events
+    assert 0 < len(calls) < len(task_ids)
+
+    await ws.close()
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import time
+import pytest
+
+from services.utils import logging
+from services.ui_backend_service.data.cache.client.cache_action import CacheAction
+from services.ui_backend_service.data.cache.client.cache_async_client import CacheAsyncClient, SharedCacheFuture, \
+    OP_KEYS_READY, OP_OBJECTS_DELETED, OP_STREAM_CHUNK, OP_WORKER_CREATE, OP_WORKER_TERMINATE, WAIT_FREQUENCY
+from services.ui_backend_service.data.cache.client.cache_client import CacheClientTimeout, CacheFuture
+from services.ui_backend_service.data.cache.client.cache_store import CacheStore, key_filename, object_path
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class StreamingAction(CacheAction):
+    @classmethod
+    def format_request(cls, name, invalidate_cache=False):
+        return None, ["result:%s" % name], "stream:%s" % name, [], invalidate_cache, None
+
+
+class HotTierAction(CacheAction):
+    HOT_TIER = True
+
+    @classmethod
+    def format_request(cls, name):
+        return None, ["hot:%s" % name], None, [], False, None
+
+    @classmethod
+    def decode(cls, key, blob):
+        return json.loads(blob)
+
+    @classmethod
+    def response(cls, keys_objs):
+        return keys_objs
+
+
+@pytest.fixture
+def client(tmp_path):
+    # The cache server is not started, messages are fed to read_message directly.
+    client = CacheAsyncClient(str(tmp_path), [StreamingAction, HotTierAction], hot_tier_size=1024)
+    client.logger = logging.getLogger("CacheAsyncClientTest")
+
+    client.sent_requests = []
+
+    async def _send_request(blob):
+        client.sent_requests.append(json.loads(blob))
+    client.send_request = _send_request
+    return client
+
+
+def _message(op, **data):
+    return json.dumps({"op": op, **data})
+
+
+async def test_wait_wakes_up_on_worker_terminate(client):
+    await client.read_message(_message(OP_WORKER_CREATE, stream_key="stream"))
+    assert client.has_pending_request("stream")
+
+    waiting = asyncio.ensure_future(
+        client.wait(lambda: None if client.has_pending_request("stream") else True, 5, notify_key="stream"))
+    await asyncio.sleep(0.01)
+
+    start = time.time()
+    await client.read_message(_message(OP_WORKER_TERMINATE, stream_key="stream"))
+    assert await asyncio.wait_for(waiting, 1) is True
+    assert time.time() - start < WAIT_FREQUENCY / 2
+    assert client._waiters == {}
+
+
+async def test_wait_iter_wakes_up_on_stream_chunk(client):
+    events = []
+
+    def _events():
+        while True:
+            yield events.pop(0) if events else None
+
+    async def _consume():
+        async for event in client.wait_iter(_events(), 5, notify_key="stream"):
+            return event
+
+    consumer = asyncio.ensure_future(_consume())
+    await asyncio.sleep(0.01)
+
+    start = time.time()
+    events.append("event")
+    await client.read_message(_message(OP_STREAM_CHUNK, stream_key="stream"))
+    assert await asyncio.wait_for(consumer, 1) == "event"
+    assert time.time() - start < WAIT_FREQUENCY / 2
+
+
+async def test_keys_ready_only_wakes_up_matching_waiters(client):
+    waiter = client._add_waiter("key_a")
+    other = client._add_waiter("key_b")
+
+    await client.read_message(_message(OP_KEYS_READY, stream_key=None, keys=["key_a"]))
+
+    assert waiter.done()
+    assert not other.done()
+    assert list(client._waiters) == ["key_b"]
+
+
+async def test_wait_falls_back_to_polling(client):
+    results = [None, None, True]
+
+    assert await client.wait(lambda: results.pop(0), 5, notify_key="stream") is True
+
+    with pytest.raises(CacheClientTimeout):
+        await client.wait(lambda: None, 0, notify_key="stream")
+    assert client._waiters == {}
+
+
+async def test_concurrent_identical_actions_share_a_future(client):
+    futures = await asyncio.gather(*[client.StreamingAction("a", invalidate_cache=True) for _ in range(5)])
+    other = await client.StreamingAction("b")
+
+    assert isinstance(futures[0], SharedCacheFuture)
+    assert all(future is futures[0] for future in futures)
+    assert other is not futures[0]
+    assert [req["stream_key"] for req in client.sent_requests] == ["stream:a", "stream:b"]
+
+    # Once the worker has terminated, a new request is sent
+    await client.read_message(_message(OP_WORKER_TERMINATE, stream_key="stream:a"))
+    assert await client.StreamingAction("a", invalidate_cache=True) is not futures[0]
+    assert len(client.sent_requests) == 3
+
+
+async def test_shared_future_broadcasts_stream_to_all_subscribers(client, monkeypatch):
+    reads = []
+    release = asyncio.Event()
+
+    async def _stream(self, timeout=None):
+        reads.append(self.stream_key)
+        yield {"type": "event", "id": 1}
+        await release.wait()
+        yield {"type": "event", "id": 2}
+    monkeypatch.setattr(CacheFuture, "stream", _stream)
+
+    future = await client.StreamingAction("a")
+
+    async def _consume():
+        return [event["id"] async for event in future.stream()]
+
+    first = asyncio.ensure_future(_consume())
+    await asyncio.sleep(0.01)
+    # A late subscriber receives the events from the beginning of the stream
+    second = asyncio.ensure_future(_consume())
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.wait_for(first, 1) == [1, 2]
+    assert await asyncio.wait_for(second, 1) == [1, 2]
+    assert reads == ["stream:a"]
+
+
+async def test_shared_future_stream_times_out(client, monkeypatch):
+    async def _stream(self, timeout=None):
+        await asyncio.Event().wait()
+        yield
+    monkeypatch.setattr(CacheFuture, "stream", _stream)
+
+    future = await client.StreamingAction("a")
+    with pytest.raises(CacheClientTimeout):
+        async for _ in future.stream(timeout=0.01):
+            pass
+    future._reader.cancel()
+
+
+def _write_object(root, key, value):
+    path = object_path(str(root), key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(value, f)
+    return path
+
+
+async def test_get_reads_decoded_values_from_hot_tier(client, tmp_path):
+    path = _write_object(tmp_path, "hot:a", {"value": 1})
+
+    future = await client.HotTierAction("a")
+    assert future.get() == {"hot:a": {"value": 1}}
+    assert client.hot_tier.stats()["misses"] == 1
+
+    # The object is not read again, even if it has changed on disk
+    _write_object(tmp_path, "hot:a", {"value": 2})
+    future = await client.HotTierAction("a")
+    assert future.get() == {"hot:a": {"value": 1}}
+    assert client.hot_tier.stats()["hits"] == 1
+    assert client.sent_requests == []
+
+    # Keys are invalidated when they are committed again by a worker
+    await client.read_message(_message(OP_KEYS_READY, stream_key=None, keys=["hot:a"]))
+    assert (await client.HotTierAction("a")).get() == {"hot:a": {"value": 2}}
+
+    # and when the garbage collector marks their objects for deletion
+    await client.read_message(_message(OP_OBJECTS_DELETED, paths=[path]))
+    assert "hot:a" not in client.hot_tier
+    os.remove(path)
+    await client.HotTierAction("a")
+    assert [req["keys"] for req in client.sent_requests] == [["hot:a"]]
+
+
+async def test_get_reads_packed_objects(tmp_path):
+    store = CacheStore(str(tmp_path), 10 ** 9, lambda msg: None, sweep_interval=3600, pack_threshold=100)
+    tempdir = store.open_tempdir("token", "action", None)
+    with open(os.path.join(tempdir, key_filename("hot:a")), "w") as f:
+        json.dump({"value": 1}, f)
+    store.commit(tempdir, ["hot:a"], None, [])
+    store.close_tempdir(tempdir)
+    assert not os.path.exists(object_path(str(tmp_path), "hot:a"))
+
+    client = CacheAsyncClient(str(tmp_path), [HotTierAction], pack_threshold=100)
+
+    future = await client.HotTierAction("a")
+    assert future.key_paths_ready()
+    assert future.get() == {"hot:a": {"value": 1}}
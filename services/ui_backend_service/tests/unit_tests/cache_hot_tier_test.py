@@ -0,0 +1,51 @@
+import pytest
+
+from services.ui_backend_service.data.cache.client.cache_hot_tier import HotTier, MISSING
+from services.ui_backend_service.data.cache.client.cache_store import object_path
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def test_hot_tier_evicts_least_recently_used_by_size():
+    hot_tier = HotTier(max_size=30, max_entry_size=20)
+    hot_tier.put("a", "value_a", 10)
+    hot_tier.put("b", "value_b", 10)
+    hot_tier.put("c", "value_c", 10)
+
+    # Reading "a" makes "b" the least recently used entry
+    assert hot_tier.get("a") == "value_a"
+    hot_tier.put("d", "value_d", 10)
+
+    assert hot_tier.get("b") is MISSING
+    assert [key for key in ["a", "c", "d"] if key in hot_tier] == ["a", "c", "d"]
+    assert hot_tier.size == 30
+
+    # Entries over the size limit are not kept
+    hot_tier.put("e", "value_e", 21)
+    assert "e" not in hot_tier
+
+    stats = hot_tier.stats()
+    assert stats["entries"] == 3
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["evictions"] == 1
+
+
+def test_hot_tier_invalidation():
+    hot_tier = HotTier(max_size=100)
+    hot_tier.put("a", "value_a", 10)
+    hot_tier.put("b", "value_b", 10)
+    hot_tier.put("c", "value_c", 10)
+
+    hot_tier.invalidate(["a", "unknown"])
+    hot_tier.invalidate_paths([object_path("/cache_root", "b"), object_path("/cache_root", "unknown")])
+
+    assert list(hot_tier.entries) == ["c"]
+    assert hot_tier.size == 10
+    assert hot_tier.stats()["invalidations"] == 2
+
+    # Replacing a value does not count twice towards the size
+    hot_tier.put("c", "new_value_c", 12)
+    assert hot_tier.get("c") == "new_value_c"
+    assert hot_tier.size == 12
@@ -0,0 +1,114 @@
+import os
+import pytest
+import selectors
+from collections import deque
+
+from services.ui_backend_service.data.cache.client.cache_action import HI_PRIO, LO_PRIO
+from services.ui_backend_service.data.cache.client import cache_server
+from services.ui_backend_service.data.cache.client.cache_server import Scheduler
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class MockStore(object):
+    def __init__(self, root):
+        self.root = root
+
+    def open_tempdir(self, token, action, stream_key):
+        path = os.path.join(self.root, token)
+        os.makedirs(path)
+        return path
+
+    def object_path(self, key):
+        return os.path.join(self.root, key)
+
+    def locate(self, paths):
+        return {}
+
+    def touch(self, paths):
+        pass
+
+
+class MockPool(object):
+    def __init__(self):
+        self.tasks = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.tasks.append((callback, error_callback))
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    # Avoid the process pool and stdin of a real Scheduler
+    scheduler = Scheduler.__new__(Scheduler)
+    scheduler.filestore = MockStore(str(tmp_path))
+    scheduler.pool = MockPool()
+    scheduler.max_workers = 2
+    scheduler.pending_requests = set()
+    scheduler.hi_prio_requests = deque()
+    scheduler.lo_prio_requests = deque()
+    scheduler.workers = []
+    scheduler.wakeup_r, scheduler.wakeup_w = os.pipe()
+    os.set_blocking(scheduler.wakeup_r, False)
+    os.set_blocking(scheduler.wakeup_w, False)
+    yield scheduler
+    os.close(scheduler.wakeup_r)
+    os.close(scheduler.wakeup_w)
+
+
+def _queue(scheduler, token, prio=LO_PRIO):
+    request = {
+        'op': 'action', 'action': 'test.Action', 'priority': prio, 'keys': [], 'stream_key': None,
+        'message': None, 'idempotency_token': token, 'disposable_keys': [], 'invalidate_cache': False,
+        'ephemeral_path': None
+    }
+    scheduler.pending_requests.add(token)
+    if prio == HI_PRIO:
+        scheduler.hi_prio_requests.append(request)
+    else:
+        scheduler.lo_prio_requests.append(request)
+
+
+def test_schedule_fills_free_slots(scheduler, capsys):
+    _queue(scheduler, "lo_1")
+    _queue(scheduler, "lo_2")
+    _queue(scheduler, "hi_1", prio=HI_PRIO)
+
+    scheduler.schedule()
+
+    # All free slots are filled at once, high priority requests first
+    assert [worker.request['idempotency_token'] for worker in scheduler.workers] == ["hi_1", "lo_1"]
+    assert len(scheduler.pool.tasks) == 2
+    assert [request['idempotency_token'] for request in scheduler.lo_prio_requests] == ["lo_2"]
+
+    # Nothing is started while the pool is busy
+    scheduler.schedule()
+    assert len(scheduler.pool.tasks) == 2
+
+
+def test_worker_callback_wakes_up_loop(scheduler, capsys):
+    selector = selectors.DefaultSelector()
+    selector.register(scheduler.wakeup_r, selectors.EVENT_READ)
+    _queue(scheduler, "lo_1")
+    scheduler.schedule()
+    assert selector.select(timeout=0) == []
+
+    worker = scheduler.workers[0]
+    scheduler._callback(worker, None)
+
+    assert len(selector.select(timeout=0)) == 1
+    assert scheduler.workers == []
+    assert scheduler.pending_requests == set()
+
+    scheduler.drain_wakeups()
+    assert selector.select(timeout=0) == []
+    selector.close()
+
+
+def test_forked_children_get_a_free_stdout_lock():
+    with cache_server.stdout_lock:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if cache_server.stdout_lock.acquire(timeout=5) else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
@@ -0,0 +1,157 @@
+import os
+import time
+import pytest
+
+from services.ui_backend_service.data.cache.client.cache_segments import read_record, record_size
+from services.ui_backend_service.data.cache.client.cache_store import CacheStore, CacheIndex, INDEX_FILENAME, \
+    PackedObjects, TIMESTAMP_FOR_DELETABLE, TIMESTAMP_FOR_DISPOSABLE, filesize, is_safely_readable, key_filename, \
+    object_path
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def _store(root, max_size=10 ** 9, **kwargs):
+    # A long sweep interval, so that tests run the GC themselves
+    return CacheStore(str(root), max_size, lambda msg: None, sweep_interval=3600, **kwargs)
+
+
+def _commit(store, keys, disposable_keys=[], values={}):
+    tempdir = store.open_tempdir("token", "action", None)
+    for key in keys:
+        with open(os.path.join(tempdir, key_filename(key)), "w") as f:
+            f.write(values.get(key, key))
+    missing = store.commit(tempdir, keys, None, disposable_keys)
+    store.close_tempdir(tempdir)
+    return missing
+
+
+def test_commit_is_persisted_in_index(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    assert _commit(store, ["a", "b"], disposable_keys=["b"]) == []
+    block = filesize(object_path(str(tmp_path), "a"))
+    assert store.total_size == 2 * block
+    # Disposable objects are not marked through their mtime anymore
+    assert os.stat(object_path(str(tmp_path), "b")).st_mtime != TIMESTAMP_FOR_DISPOSABLE
+    store.index.close()
+
+    # A restart loads the state from the index instead of scanning the files
+    def _no_walk(*args, **kwargs):
+        raise AssertionError("cache root should not be scanned")
+    monkeypatch.setattr(os, "walk", _no_walk)
+    store = _store(tmp_path)
+
+    assert list(store.objects_queue) == [object_path(str(tmp_path), "a")]
+    assert list(store.disposables_queue) == [object_path(str(tmp_path), "b")]
+    assert store.total_size == 2 * block
+
+
+def test_index_is_built_from_existing_files(tmp_path):
+    for key, mtime in [("object", time.time()), ("disposable", TIMESTAMP_FOR_DISPOSABLE), ("deletable", TIMESTAMP_FOR_DELETABLE)]:
+        path = object_path(str(tmp_path), key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(key)
+        os.utime(path, (mtime, mtime))
+
+    store = _store(tmp_path)
+
+    assert list(store.objects_queue) == [object_path(str(tmp_path), "object")]
+    assert list(store.disposables_queue) == [object_path(str(tmp_path), "disposable")]
+    assert not os.path.exists(object_path(str(tmp_path), "deletable"))
+    rows = list(CacheIndex(os.path.join(str(tmp_path), INDEX_FILENAME)).load())
+    assert sorted((path, disposable) for path, _, disposable, _, _, _ in rows) == [
+        (object_path(str(tmp_path), "disposable"), 1),
+        (object_path(str(tmp_path), "object"), 0),
+    ]
+
+
+def test_gc_evicts_least_recently_accessed_objects(tmp_path):
+    marked = []
+    store = _store(tmp_path, on_mark_deleted=marked.extend)
+    _commit(store, ["a", "b", "c"])
+    block = filesize(object_path(str(tmp_path), "a"))
+
+    # "a" was committed first, but accessed last
+    store.touch([object_path(str(tmp_path), "a")])
+    store.gc_watermark = 2 * block
+    store._gc_objects()
+
+    assert marked == [object_path(str(tmp_path), "b")]
+    assert not is_safely_readable(object_path(str(tmp_path), "b"))
+    assert is_safely_readable(object_path(str(tmp_path), "a"))
+
+    # Marked objects are deleted after the quarantine
+    store._gc_objects(quarantine=-1)
+    assert not os.path.exists(object_path(str(tmp_path), "b"))
+    assert store.total_size == 2 * block
+    store._flush_accessed()
+    rows = list(store.index.load())
+    assert [path for path, _, _, _, _, _ in rows] == [object_path(str(tmp_path), "c"), object_path(str(tmp_path), "a")]
+
+
+def test_sweeper_runs_when_watermark_is_exceeded(tmp_path):
+    marked = []
+    store = CacheStore(str(tmp_path), 0, lambda msg: None, on_mark_deleted=marked.extend, sweep_interval=3600)
+    _commit(store, ["a"])
+
+    for _ in range(100):
+        if marked:
+            break
+        time.sleep(0.01)
+    assert marked == [object_path(str(tmp_path), "a")]
+
+
+def _read_packed(store, key):
+    return read_record(*store.locate([store.object_path(key)])[store.object_path(key)])
+
+
+def test_small_objects_are_packed(tmp_path):
+    store = _store(tmp_path, pack_threshold=10)
+    _commit(store, ["a", "b"], values={"b": "b" * 11})
+
+    # Only objects above the threshold are stored as files
+    assert not os.path.exists(store.object_path("a"))
+    assert is_safely_readable(store.object_path("b"))
+    assert _read_packed(store, "a") == b"a"
+    assert PackedObjects(str(tmp_path)).locate([store.object_path("a"), store.object_path("b")]) == \
+        store.locate([store.object_path("a")])
+    assert store.total_size == record_size(b"a") + filesize(store.object_path("b"))
+
+    # A packed object replaces the file of its key
+    _commit(store, ["b"], values={"b": "small"})
+    assert not os.path.exists(store.object_path("b"))
+    assert _read_packed(store, "b") == b"small"
+    assert store.total_size == record_size(b"a") + record_size(b"small")
+    assert store.segments.garbage == {0: 0}
+
+    # and a file replaces a packed object
+    _commit(store, ["b"], values={"b": "b" * 11})
+    assert is_safely_readable(store.object_path("b"))
+    assert store.locate([store.object_path("b")]) == {}
+    assert store.segments.garbage == {0: record_size(b"small")}
+
+
+def test_packed_objects_are_marked_and_compacted(tmp_path):
+    store = _store(tmp_path, pack_threshold=10)
+    _commit(store, ["a", "b", "c"])
+    store.index.close()
+
+    # Objects are loaded from the index after a restart, and new objects go to a new segment
+    marked = []
+    store = _store(tmp_path, pack_threshold=10, on_mark_deleted=marked.extend)
+    assert store.packed == {store.object_path(key): 0 for key in ["a", "b", "c"]}
+    assert _read_packed(store, "c") == b"c"
+
+    store.gc_watermark = record_size(b"c")
+    store._gc_objects()
+    assert marked == [store.object_path("a"), store.object_path("b")]
+    # Marked objects can not be located by clients anymore
+    assert list(PackedObjects(str(tmp_path)).locate(marked + [store.object_path("c")])) == [store.object_path("c")]
+
+    store._gc_objects(quarantine=-1)
+    assert store.segments.garbage == {0: 2 * record_size(b"a")}
+    store._compact_segments(quarantine=-1)
+
+    assert store.packed == {store.object_path("c"): 1}
+    assert _read_packed(store, "c") == b"c"
+    assert sorted(os.listdir(os.path.dirname(store.segments.path(0)))) == [os.path.basename(store.segments.path(1))]
@@ -1,9 +1,13 @@
+import threading
+import time
+from contextlib import closing
+
 import pytest
 
 from services.ui_backend_service.data.cache.utils import (
     error_event_msg, progress_event_msg, search_result_event_msg,
     artifact_location_from_key, artifact_cache_id, unpack_pathspec_with_attempt_id,
-    streamed_errors, cacheable_artifact_value, artifact_value
+    streamed_errors, cacheable_artifact_value, artifact_value, fetch_concurrently, synchronized
 )
 
 pytestmark = [pytest.mark.unit_tests]
@@ -111,3 +115,56 @@ class MockArtifact():
         self.pathspec = pathspec
         self.size = size
         self.data = data
+
+
+def test_fetch_concurrently_is_bounded_and_ordered():
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    def _fetch(target):
+        with lock:
+            running.append(target)
+            max_running.append(len(running))
+        # later targets finish first
+        time.sleep(0.01 * (10 - target))
+        with lock:
+            running.remove(target)
+        if target == 3:
+            raise ValueError("failed %s" % target)
+        return target * 2
+
+    results = []
+    for target, future in fetch_concurrently(_fetch, list(range(10)), max_workers=4):
+        assert future.done()
+        try:
+            results.append(future.result())
+        except ValueError as ex:
+            results.append(str(ex))
+
+    assert results == [0, 2, 4, "failed 3", 8, 10, 12, 14, 16, 18]
+    assert max(max_running) == 4
+
+
+def test_fetch_concurrently_cancels_remaining_targets():
+    fetched = []
+
+    def _fetch(target):
+        fetched.append(target)
+        time.sleep(0.01)
+
+    with closing(fetch_concurrently(_fetch, list(range(100)), max_workers=2)) as it:
+        next(it)
+    assert len(fetched) < 100
+
+
+def test_synchronized():
+    assert synchronized(None) is None
+    calls = []
+    _append = synchronized(calls.append)
+    threads = [threading.Thread(target=_append, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == list(range(10))
@@ -0,0 +1,132 @@
+import os
+import time
+import queue
+import pytest
+import threading
+
+from services.ui_backend_service.data.cache.client.cache_worker import ActionWorkerPool, \
+    WorkerProcessDied, WorkerTimeoutException, notify
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def _pid():
+    return os.getpid()
+
+
+def _fail():
+    raise ValueError("failed")
+
+
+def _die():
+    os._exit(1)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+def _notify_and_print(stream_key):
+    notify('stream_chunk', {'stream_key': stream_key})
+    print("output of %s" % stream_key)
+    return stream_key
+
+
+# Held by the test process while workers start
+_held_lock = threading.Lock()
+
+
+def _acquire_held_lock():
+    if not _held_lock.acquire(timeout=5):
+        raise RuntimeError("worker inherited a held lock")
+
+
+def _run(pool, func, args=()):
+    results = queue.Queue()
+    pool.apply_async(func, args, callback=lambda res: results.put((True, res)),
+                     error_callback=lambda ex: results.put((False, ex)))
+    return results.get(timeout=10)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def _make_pool(*args, **kwargs):
+        pool = ActionWorkerPool(*args, **kwargs)
+        pools.append(pool)
+        return pool
+    yield _make_pool
+    for pool in pools:
+        pool.close()
+
+
+def test_processes_are_kept_across_actions(make_pool):
+    pool = make_pool(1)
+    pids = {_run(pool, _pid)[1] for _ in range(5)}
+
+    assert len(pids) == 1
+    assert pids != {os.getpid()}
+    assert pool.recycled == 0
+
+    # Failing actions do not replace the process either
+    ok, ex = _run(pool, _fail)
+    assert not ok and isinstance(ex, ValueError)
+    assert _run(pool, _pid)[1] in pids
+
+
+def test_processes_are_recycled_on_memory_growth(make_pool):
+    # Any growth of memory recycles the process
+    pool = make_pool(1, max_rss_growth=-1)
+    pids = {_run(pool, _pid)[1] for _ in range(3)}
+
+    assert len(pids) == 3
+    assert pool.recycled == 3
+
+
+def test_dead_and_stuck_processes_are_replaced(make_pool):
+    pool = make_pool(1, task_timeout=0.2)
+
+    ok, ex = _run(pool, _die)
+    assert not ok and isinstance(ex, WorkerProcessDied)
+
+    ok, ex = _run(pool, _sleep, (5,))
+    assert not ok and isinstance(ex, WorkerTimeoutException)
+
+    assert pool.recycled == 2
+    assert _run(pool, _pid)[0]
+
+
+def test_tasks_wait_for_a_free_process(make_pool):
+    pool = make_pool(2)
+    results = queue.Queue()
+    for _ in range(6):
+        pool.apply_async(_sleep, (0.05,), callback=results.put)
+
+    for _ in range(6):
+        results.get(timeout=10)
+    assert len(pool.idle) == 2
+    assert not pool.pending
+
+
+def test_workers_do_not_inherit_held_locks(make_pool):
+    with _held_lock:
+        # Processes are replaced on every action, from the result handler thread
+        pool = make_pool(1, initializer=_acquire_held_lock, max_rss_growth=-1)
+        for _ in range(2):
+            ok, pid = _run(pool, _pid)
+            assert ok
+    assert pool.recycled == 2
+
+
+def test_messages_and_output_of_workers_are_relayed(make_pool):
+    messages = queue.Queue()
+    output = queue.Queue()
+    pool = make_pool(1, message_callback=lambda op, data: messages.put((op, data)), output_callback=output.put)
+    results = queue.Queue()
+    pool.apply_async(_notify_and_print, ('key',), callback=lambda res: results.put((messages.qsize(), res)))
+
+    # messages are passed to the callback before the result
+    assert results.get(timeout=10) == (1, 'key')
+    assert messages.get_nowait() == ('stream_chunk', {'stream_key': 'key'})
+    assert output.get(timeout=10) == "output of key"
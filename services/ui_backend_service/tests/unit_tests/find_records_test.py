@@ -0,0 +1,41 @@
+import pytest
+
+from services.data.db_utils import DBResponse
+from services.ui_backend_service.data.db.tables.run import AsyncRunTablePostgres
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class ExampleRunTable(AsyncRunTablePostgres):
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    async def execute_sql(self, select_sql, values=[], **kwargs):
+        self.queries.append((select_sql, list(values)))
+        return DBResponse(response_code=200, body=[{"flow_id": "HelloFlow"}]), None
+
+
+def test_select_columns_are_built_once():
+    table = ExampleRunTable()
+    assert table.select_columns is table.select_columns
+    assert table._select_fragments(True) is table._select_fragments(True)
+
+
+async def test_grouped_find_records_reuses_statements():
+    table = ExampleRunTable()
+    for _ in range(2):
+        await table.find_records(
+            conditions=["user_name = %s"], values=["test"], groups=["flow_id"], order=["ts_epoch DESC"],
+            limit=5, enable_joins=True
+        )
+
+    groups_sql, _ = table.queries[0]
+    content_sql, content_values = table.queries[1]
+    assert groups_sql.endswith(" LIMIT 5")
+    assert "flow_id = ANY(%s)" in content_sql
+    assert content_values == ["test", ["HelloFlow"]]
+    # statements of the second call are the cached ones
+    assert table.queries[2][0] == groups_sql
+    assert table.queries[3][0] is content_sql
+    assert len(table._select_statement_cache) == 2
@@ -0,0 +1,36 @@
+import json
+import time
+import pytest
+
+from services.ui_backend_service.data.cache.get_data_action import GetData, cache_key_from_target
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class SlowGetData(GetData):
+    @classmethod
+    def fetch_data(cls, target, stream_output):
+        time.sleep(0.1)
+        if target == "missing":
+            return None
+        if target == "failing":
+            raise ValueError("fetch failed")
+        stream_output({"type": "fetched", "target": target})
+        return [True, target]
+
+
+def test_execute_fetches_targets_concurrently():
+    targets = ["a", "b", "c", "missing", "failing"]
+    events = []
+
+    start = time.time()
+    results = SlowGetData.execute(message={"targets": targets}, keys=[], existing_keys={}, stream_output=events.append)
+
+    assert time.time() - start < 0.3
+    assert json.loads(results[cache_key_from_target("a", "data:SlowGetData:")]) == [True, "a"]
+    # Missing values are not cached, errors are cached per target
+    assert cache_key_from_target("missing", "data:SlowGetData:") not in results
+    failed = json.loads(results[cache_key_from_target("failing", "data:SlowGetData:")])
+    assert failed[:3] == [False, "ValueError", "fetch failed"]
+    assert "fetch failed" in failed[3]
+    assert sorted(event["target"] for event in events) == ["a", "b", "c"]
@@ -1,9 +1,11 @@
 import pytest
 import datetime
 import os
+import json
 from tempfile import TemporaryDirectory
-from services.ui_backend_service.data.cache.get_log_file_action import paginated_result, log_cache_id, lookup_id, \
-    _datetime_to_epoch, FullLogProvider, STDOUT, TailLogProvider, BlurbOnlyLogProvider, stream_sorted_logs
+from services.ui_backend_service.data.cache.get_log_file_action import GetLogFile, paginated_result, log_cache_id, lookup_id, \
+    _datetime_to_epoch, FullLogProvider, STDOUT, TailLogProvider, BlurbOnlyLogProvider, stream_sorted_logs, paginated_log
+from services.ui_backend_service.data.cache.log_index import LogIndex
 
 from unittest.mock import MagicMock, patch
 
@@ -336,4 +338,88 @@ def test_stream_sorted_logs_sandwiched():
         
         results = stream_sorted_logs([a_path, b_path])
 
-        assert [line for _ts, line in results] == [line for _ts, line in (raw_stream_b_start + raw_stream_a + raw_stream_b_end)]
\ No newline at end of file
+        assert [line for _ts, line in results] == [line for _ts, line in (raw_stream_b_start + raw_stream_a + raw_stream_b_end)]
+
+
+@pytest.mark.parametrize("limit, reverse_order, output_raw", [
+    (0, False, False), (7, False, False), (7, True, False), (7, False, True), (7, True, True), (200, True, False)
+])
+def test_paginated_log_matches_paginated_result(limit, reverse_order, output_raw):
+    start_ts = datetime.datetime(2021, 10, 27, 0, 0, tzinfo=datetime.timezone.utc)
+    raw_stream_a = [(start_ts + datetime.timedelta(seconds=2 * i), f"A line {i}") for i in range(0, 30)]
+    raw_stream_b = [(start_ts + datetime.timedelta(seconds=2 * i + 1), f"B line {i}") for i in range(0, 20)]
+    with TemporaryDirectory() as d:
+        a_path = os.path.join(d, "log_a")
+        b_path = os.path.join(d, "log_b")
+        with open(a_path, "wb+") as f:
+            f.write(b"\n".join(_logline_bytes(ts, "A", line) for ts, line in raw_stream_a) + b"\n")
+        with open(b_path, "wb+") as f:
+            f.write(b"\n".join(_logline_bytes(ts, "B", line) for ts, line in raw_stream_b) + b"\n")
+
+        with LogIndex(os.path.join(d, "index")) as log:
+            # append the logs in chunks, as they would be loaded from a running task
+            with open(a_path, "rb") as a, open(b_path, "rb") as b:
+                a_data, b_data = a.read(), b.read()
+            for chunk in range(4):
+                log.append({
+                    "a": a_data[log.offset("a"):len(a_data) * (chunk + 1) // 4],
+                    "b": b_data[log.offset("b"):len(b_data) * (chunk + 1) // 3],
+                }, ["a", "b"])
+
+            pages = max(-(50 // -limit), 1) if limit else 1
+            for page in range(1, pages + 2):
+                assert paginated_log(log, page, limit, reverse_order, output_raw) == paginated_result(
+                    lambda: stream_sorted_logs([a_path, b_path]), page, 50, limit, reverse_order, output_raw)
+
+
+
+@pytest.mark.parametrize("policy, env, expected_lines", [
+    ("full", {}, ["A line 0", "B line 0", "A line 1", "B line 1"]),
+    ("tail", {"MF_LOG_LOAD_TAIL_SIZE": "16"}, ["...2 more earlier lines truncated...", "A line 1", "B line 1"]),
+    ("tail", {"MF_LOG_LOAD_MAX_SIZE": "0"}, None),
+    ("blurb_only", {}, None),
+])
+def test_get_log_file_execute_honours_log_load_policy(tmp_path, monkeypatch, policy, env, expected_lines):
+    start_ts = datetime.datetime(2021, 10, 27, 0, 0, tzinfo=datetime.timezone.utc)
+    sources = {
+        "a.log": b"".join(_logline_bytes(start_ts + datetime.timedelta(seconds=2 * i), "A", f"A line {i}") + b"\n"
+                          for i in range(2)),
+        "b.log": b"".join(_logline_bytes(start_ts + datetime.timedelta(seconds=2 * i + 1), "B", f"B line {i}") + b"\n"
+                          for i in range(2)),
+    }
+    for name, data in sources.items():
+        with open(str(tmp_path / name), "wb") as f:
+            f.write(data)
+    storage = MagicMock(TYPE="local", size_file=os.path.getsize, full_uri=lambda path: path)
+    loglines = [(start_ts + datetime.timedelta(seconds=i), f"{source} line {i // 2}") for i, source in enumerate("ABAB")]
+    mock_task = MagicMock(
+        pathspec="TestFlow/1/start/2", current_attempt=0,
+        stdout_size=sum(len(data) for data in sources.values()), metadata_dict={}
+    )
+    mock_task.loglines.return_value = loglines
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MF_LOG_LOAD_POLICY", policy)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+
+    task = {"flow_id": "TestFlow", "run_number": 1, "step_name": "start", "task_id": 2}
+    message, keys, *_ = GetLogFile.format_request(task, logtype=STDOUT)
+    with patch("services.ui_backend_service.data.cache.get_log_file_action.Task", return_value=mock_task), \
+            patch("services.ui_backend_service.data.cache.get_log_file_action.log_sources",
+                  return_value=(storage, {name: str(tmp_path / name) for name in sources})) as m_log_sources:
+        results = GetLogFile.execute(message=message, keys=keys, stream_output=MagicMock())
+
+    content = [line["line"] for line in GetLogFile.response(results)["content"]]
+    # only the full log is loaded from the log files into a log index
+    assert m_log_sources.called == (policy == "full")
+    assert os.path.exists(os.path.join("cache_data", "log", "BLOBS", keys[0])) == (policy == "full")
+    if expected_lines is not None:
+        assert content == expected_lines
+    elif policy == "tail":
+        assert "greater than 0MB" in content[0]
+        mock_task.loglines.assert_not_called()
+    else:
+        assert "disabled logs viewing" in content[0]
+        mock_task.loglines.assert_not_called()
+    assert json.loads(results[keys[0]])["line_count"] == len(content)
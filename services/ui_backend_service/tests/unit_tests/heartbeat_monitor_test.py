@@ -0,0 +1,183 @@
+import pytest
+from pyee import AsyncIOEventEmitter
+
+from services.data.db_utils import DBResponse
+from services.data.postgres_async_db import IdCache
+from services.ui_backend_service.api import heartbeat_monitor
+from services.ui_backend_service.api.heartbeat_monitor import (
+    HEARTBEAT_INTERVAL, HeartbeatMonitor, RunHeartbeatMonitor, TaskHeartbeatMonitor
+)
+
+pytestmark = [pytest.mark.unit_tests]
+
+check_heartbeats = HeartbeatMonitor.check_heartbeats
+
+
+@pytest.fixture(autouse=True)
+def no_watcher_task(monkeypatch):
+    "Monitors start their watcher loop on creation, tests run it explicitly instead"
+    async def _no_watcher(self):
+        pass
+    monkeypatch.setattr(HeartbeatMonitor, "check_heartbeats", _no_watcher)
+
+
+class MockRunTable(object):
+    table_name = "runs_v3"
+
+    def __init__(self, db, runs=[]):
+        self.db = db
+        self.runs = runs
+        self.queries = []
+
+    async def get_run(self, flow_id, run_number):
+        self.queries.append(("get_run", flow_id, run_number))
+        return DBResponse(response_code=200, body={"tags": ["run_tag"], "system_tags": ["user:test"]})
+
+    async def get_expanded_runs(self, run_numbers):
+        self.queries.append(("get_expanded_runs", run_numbers))
+        return DBResponse(response_code=200, body=[run for run in self.runs if run["run_number"] in run_numbers])
+
+
+class MockTaskTable(object):
+    table_name = "tasks_v3"
+
+    def __init__(self, tasks=[]):
+        self.tasks = tasks
+        self.queries = []
+
+    async def get_task_attempts(self, attempt_keys):
+        self.queries.append(attempt_keys)
+        return DBResponse(response_code=200, body=[
+            dict(task) for task in self.tasks
+            if (task["flow_id"], task["run_number"], task["step_name"], task["task_id"], task["attempt_id"]) in attempt_keys
+        ])
+
+
+class MockDB(object):
+    def __init__(self, runs=[], tasks=[]):
+        self.run_tags_cache = IdCache()
+        self.run_table_postgres = MockRunTable(self, runs)
+        self.task_table_postgres = MockTaskTable(tasks)
+
+
+def _task(run_number, task_id, status, attempt_id=0, flow_id="HelloFlow"):
+    return {
+        "flow_id": flow_id, "run_number": run_number, "step_name": "start", "task_id": task_id,
+        "attempt_id": attempt_id, "status": status, "last_heartbeat_ts": 1
+    }
+
+
+async def test_pop_expired_skips_stale_heartbeats():
+    monitor = RunHeartbeatMonitor(AsyncIOEventEmitter(), db=MockDB())
+    monitor.watch(1, 100)
+    monitor.watch(2, 100)
+    monitor.watch(3, 100)
+    # newer heartbeat and removal leave stale heap entries behind
+    monitor.watch(2, 200)
+    monitor.remove_from_watch(3)
+
+    assert monitor.pop_expired(100 + HEARTBEAT_INTERVAL) == []
+    assert monitor.pop_expired(101 + HEARTBEAT_INTERVAL) == [1]
+    assert monitor.watched == {2: 200}
+    assert monitor.pop_expired(201 + HEARTBEAT_INTERVAL) == [2]
+    assert monitor.watched == {}
+    assert monitor._expiry_heap == []
+
+
+async def test_watch_compacts_stale_heartbeats():
+    monitor = RunHeartbeatMonitor(AsyncIOEventEmitter(), db=MockDB())
+    for hb in range(5000):
+        monitor.watch(1, hb)
+    assert len(monitor._expiry_heap) <= 1024 + 3
+    assert monitor.pop_expired(10000 + HEARTBEAT_INTERVAL) == [1]
+
+
+async def test_task_heartbeat_is_read_from_event_payload():
+    db = MockDB()
+    monitor = TaskHeartbeatMonitor(AsyncIOEventEmitter(), db=db)
+    await monitor.heartbeat_handler("update", {
+        "flow_id": "HelloFlow", "run_number": 1, "step_name": "start", "task_id": 2, "last_heartbeat_ts": 123
+    })
+    await monitor.heartbeat_handler("update", {
+        "flow_id": "HelloFlow", "run_number": 1, "step_name": "end", "task_id": 3, "last_heartbeat_ts": None
+    })
+
+    assert monitor.watched["HelloFlow/1/start/2/0"] == 123
+    assert "HelloFlow/1/end/3/0" in monitor.watched
+    assert db.task_table_postgres.queries == []
+    assert db.run_table_postgres.queries == []
+
+
+async def test_task_load_and_broadcast_uses_a_single_query():
+    tasks = [_task(1, 1, "failed"), _task(1, 2, "running", attempt_id=1), _task(2, 3, "completed")]
+    db = MockDB(tasks=tasks)
+    emitter = AsyncIOEventEmitter()
+    notified = []
+    emitter.on("notify", lambda operation, resources, task: notified.append(task))
+    monitor = TaskHeartbeatMonitor(emitter, db=db)
+
+    await monitor.load_and_broadcast(["HelloFlow/1/start/1/0", "HelloFlow/1/start/2/1", "HelloFlow/2/start/3/0"])
+
+    assert db.task_table_postgres.queries == [
+        [("HelloFlow", 1, "start", 1, 0), ("HelloFlow", 1, "start", 2, 1), ("HelloFlow", 2, "start", 3, 0)]
+    ]
+    # run tags are loaded once per run
+    assert db.run_table_postgres.queries == [("get_run", "HelloFlow", 1), ("get_run", "HelloFlow", 2)]
+    assert [task["task_id"] for task in notified] == [1]
+    assert notified[0]["tags"] == ["run_tag"]
+    # running tasks are watched again
+    assert list(monitor.watched) == ["HelloFlow/1/start/2/1"]
+
+
+async def test_run_load_and_broadcast_uses_a_single_query():
+    runs = [
+        {"flow_id": "HelloFlow", "run_number": 1, "status": "failed", "last_heartbeat_ts": 1},
+        {"flow_id": "HelloFlow", "run_number": 2, "status": "running", "last_heartbeat_ts": 2},
+    ]
+    db = MockDB(runs=runs)
+    emitter = AsyncIOEventEmitter()
+    notified = []
+    emitter.on("notify", lambda operation, resources, run: notified.append(run))
+    monitor = RunHeartbeatMonitor(emitter, db=db)
+
+    await monitor.load_and_broadcast([1, 2, 3])
+
+    assert db.run_table_postgres.queries == [("get_expanded_runs", [1, 2, 3])]
+    assert [run["run_number"] for run in notified] == [1]
+    assert monitor.watched == {2: 2}
+
+
+async def test_check_heartbeats_loads_expired_keys_in_batches(monkeypatch):
+    monkeypatch.setattr(heartbeat_monitor, "HEARTBEAT_BATCH_SIZE", 2)
+    monitor = RunHeartbeatMonitor(AsyncIOEventEmitter(), db=MockDB())
+    batches = []
+
+    async def _load_and_broadcast(keys):
+        batches.append(keys)
+    monitor.load_and_broadcast = _load_and_broadcast
+
+    class MockLoop(object):
+        def __init__(self):
+            self.tasks = []
+
+        def create_task(self, coro):
+            self.tasks.append(coro)
+    monitor.loop = MockLoop()
+
+    for run_number in range(5):
+        monitor.watch(run_number, 1)
+    monitor.watch(5, heartbeat_monitor.heartbeat_time_now())
+
+    class StopWatcher(Exception):
+        pass
+
+    async def _stop(_):
+        raise StopWatcher
+    monkeypatch.setattr(heartbeat_monitor.asyncio, "sleep", _stop)
+    with pytest.raises(StopWatcher):
+        await check_heartbeats(monitor)
+    for task in monitor.loop.tasks:
+        await task
+
+    assert batches == [[0, 1], [2, 3], [4]]
+    assert list(monitor.watched) == [5]
@@ -0,0 +1,69 @@
+import datetime
+import os
+import pytest
+
+from services.ui_backend_service.data.cache.log_index import LogIndex, LINES_FILENAME, OFFSETS_FILENAME
+
+pytestmark = [pytest.mark.unit_tests]
+
+START = datetime.datetime(2021, 10, 27, 0, 0)
+SOURCES = ["runtime", "task"]
+
+
+def _logline(seconds, source, msg):
+    ts = (START + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return "[MFLOG|0|{ts}|{source}|123-abc]{msg}\n".format(ts=ts, source=source, msg=msg).encode("utf-8")
+
+
+def _lines(log, start=0, stop=None):
+    return [line for _, line in log.read(start, log.line_count if stop is None else stop)]
+
+
+def test_lines_are_appended_incrementally(tmp_path):
+    data = b"".join(_logline(i, "task", "line %d" % i) for i in range(10))
+
+    with LogIndex(str(tmp_path)) as log:
+        assert log.is_empty
+        # an unterminated line is served as a tail, but not stored
+        log.append({"task": data[:-5]}, SOURCES)
+        assert log.line_count == 10
+        assert log.offset("task") == data.rindex(b"[MFLOG")
+        assert _lines(log, 8) == ["line 8", "li"]
+
+    with LogIndex(str(tmp_path)) as log:
+        log.append({"task": data[log.offset("task"):]}, SOURCES)
+        assert log.offset("task") == len(data)
+        assert _lines(log) == ["line %d" % i for i in range(10)]
+        assert _lines(log, 3, 5) == ["line 3", "line 4"]
+        assert log.read(9, 20) == [(int((START + datetime.timedelta(seconds=9)).timestamp() * 1000), "line 9")]
+        assert log.read(10, 20) == []
+
+
+def test_sources_are_merged_by_timestamp(tmp_path):
+    with LogIndex(str(tmp_path)) as log:
+        log.append({
+            "task": _logline(0, "task", "a") + _logline(3, "task", "d"),
+            "runtime": _logline(1, "runtime", "b") + b"not an mflog line\n",
+        }, SOURCES)
+        # lines without a timestamp stay after the previous line of their source
+        assert _lines(log) == ["a", "b", "not an mflog line\n", "d"]
+
+        # lines of a source that was uploaded late are merged with the stored lines
+        log.append({"runtime": _logline(2, "runtime", "c") + _logline(4, "runtime", "e")}, SOURCES)
+        assert _lines(log) == ["a", "b", "not an mflog line\n", "c", "d", "e"]
+
+        # lines with the same timestamp are merged in the order of the sources
+        log.append({"task": _logline(4, "task", "f")}, SOURCES)
+        log.append({"runtime": _logline(4, "runtime", "g")}, SOURCES)
+        assert _lines(log, 4) == ["d", "e", "g", "f"]
+
+
+def test_log_is_reset_when_files_are_missing(tmp_path):
+    with LogIndex(str(tmp_path)) as log:
+        log.append({"task": _logline(0, "task", "a")}, SOURCES)
+
+    os.unlink(os.path.join(str(tmp_path), OFFSETS_FILENAME))
+    with LogIndex(str(tmp_path)) as log:
+        assert log.is_empty
+        assert log.line_count == 0
+        assert os.path.getsize(os.path.join(str(tmp_path), LINES_FILENAME)) == 0
@@ -0,0 +1,128 @@
+import asyncio
+import time
+import pytest
+
+from services.ui_backend_service.api.notify import ListenNotify, NotifyMetrics
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+class MockCursor(object):
+    def __init__(self):
+        self.closed = False
+        self.executed = []
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class MockConnection(object):
+    def __init__(self):
+        self.notifies = asyncio.Queue()
+        self._cursor = MockCursor()
+
+    def cursor(self):
+        return self._cursor
+
+
+@pytest.fixture
+async def listen_notify(monkeypatch):
+    async def _no_init(self, pool):
+        pass
+    monkeypatch.setattr(ListenNotify, "_init", _no_init)
+
+    class MockDB(object):
+        pool = None
+    return ListenNotify(None, MockDB(), max_batch_size=2)
+
+
+async def test_listen_drains_queued_notifications_in_batches(listen_notify):
+    conn = MockConnection()
+    for i in range(5):
+        conn.notifies.put_nowait(i)
+
+    batches = []
+
+    async def _handle_batch(batch, received_at):
+        batches.append(batch)
+        if len(batches) == 3:
+            conn._cursor.closed = True
+    listen_notify.handle_trigger_batch = _handle_batch
+
+    await asyncio.wait_for(listen_notify.listen(conn), 1)
+
+    assert conn._cursor.executed == ["LISTEN notify"]
+    assert batches == [[0, 1], [2, 3], [4]]
+    assert listen_notify.metrics.batches == 3
+    assert listen_notify.metrics.max_queue_depth == 5
+    assert listen_notify.metrics.queue_depth == 1
+
+
+async def test_listen_blocks_until_notification_arrives(listen_notify):
+    conn = MockConnection()
+    received = []
+
+    async def _handle_batch(batch, received_at):
+        received.extend(batch)
+        conn._cursor.closed = True
+    listen_notify.handle_trigger_batch = _handle_batch
+
+    task = asyncio.ensure_future(listen_notify.listen(conn))
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    assert received == []
+
+    conn.notifies.put_nowait("msg")
+    await asyncio.wait_for(task, 1)
+    assert received == ["msg"]
+
+
+async def test_handle_trigger_batch_preserves_order_and_records_latency(listen_notify):
+    handled = []
+
+    async def _handle_msg(msg):
+        handled.append(msg)
+    listen_notify.handle_trigger_msg = _handle_msg
+
+    await listen_notify.handle_trigger_batch(["a", "b", "c"], time.monotonic())
+
+    assert handled == ["a", "b", "c"]
+    assert listen_notify.metrics.events == 3
+    assert listen_notify.metrics.max_dispatch_latency >= listen_notify.metrics.last_dispatch_latency >= 0
+
+
+async def test_ping_raises_on_failed_keepalive(listen_notify):
+    listen_notify.keepalive_interval = 0
+    conn = MockConnection()
+
+    async def _fail(sql):
+        raise Exception("connection closed")
+    conn._cursor.execute = _fail
+
+    with pytest.raises(Exception, match="connection closed"):
+        await asyncio.wait_for(listen_notify.ping(conn), 1)
+
+
+def test_notify_metrics_stats():
+    metrics = NotifyMetrics()
+    assert metrics.stats()["avg_dispatch_latency_ms"] == 0.0
+
+    metrics.record_batch(3)
+    metrics.record_batch(1)
+    metrics.record_dispatch(0.002)
+    metrics.record_dispatch(0.004)
+
+    stats = metrics.stats()
+    assert stats["events"] == 2
+    assert stats["batches"] == 2
+    assert stats["queue_depth"] == 1
+    assert stats["max_queue_depth"] == 3
+    assert stats["last_dispatch_latency_ms"] == 4.0
+    assert stats["avg_dispatch_latency_ms"] == 3.0
+    assert stats["max_dispatch_latency_ms"] == 4.0
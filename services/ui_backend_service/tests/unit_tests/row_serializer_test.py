@@ -0,0 +1,21 @@
+import pytest
+
+from services.ui_backend_service.data.db.models import ArtifactRow, RunRow, TaskRow
+from services.utils.tests import assert_serialized_like_row_object, serialized_fields_record
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+@pytest.mark.parametrize("row_type", [ArtifactRow, RunRow, TaskRow])
+@pytest.mark.parametrize("expanded", [True, False])
+def test_row_serializer_skips_columns_that_are_not_serialized(row_type, expanded):
+    # select columns of the UI tables can include columns that are not serialized
+    record = {**serialized_fields_record(row_type), "extra": "extra-value"}
+    assert "extra" not in assert_serialized_like_row_object(row_type, record, expanded)
+
+
+def test_row_serializer_uses_defaults_of_missing_columns():
+    # tasks that are listed without joins have no attempt columns
+    record = {"flow_id": "HelloFlow", "run_number": 1, "run_id": None, "step_name": "start", "user_name": "test",
+              "ts_epoch": 1, "task_id": 2}
+    assert assert_serialized_like_row_object(TaskRow, record)["attempt_id"] == 0
@@ -1,6 +1,7 @@
 import pytest
 
-from services.ui_backend_service.data.cache.search_artifacts_action import lookup_id
+from services.ui_backend_service.data.cache import search_artifacts_action, search_index
+from services.ui_backend_service.data.cache.search_artifacts_action import SearchArtifacts, lookup_id
 
 pytestmark = [pytest.mark.unit_tests]
 
@@ -21,3 +22,44 @@ async def test_cache_key_dependent_on_searchterm():
 
     assert not a == b
     assert not b == c
+
+
+class MockArtifact(object):
+    fetched = []
+
+    def __init__(self, pathspec, attempt):
+        self.pathspec = pathspec
+        self.size = 1
+        MockArtifact.fetched.append(pathspec)
+
+    @property
+    def data(self):
+        return "value of %s" % self.pathspec
+
+
+def test_search_is_answered_from_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_INDEX_PATH", str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(search_artifacts_action, "DataArtifact", MockArtifact)
+    MockArtifact.fetched = []
+    pathspecs = ["Flow/1/step/1/artifact/0", "Flow/1/step/2/artifact/0"]
+
+    def _search(searchterm, operator, invalidate_cache=False):
+        msg, keys, _, _, _, _ = SearchArtifacts.format_request(pathspecs, searchterm, operator)
+        events = []
+        results = SearchArtifacts.execute(message=msg, keys=keys, stream_output=events.append,
+                                          invalidate_cache=invalidate_cache)
+        return SearchArtifacts.response(results), events
+
+    results, _ = _search("STEP/1", "co")
+    assert results["Flow/1/step/1/artifact/0"] == {"included": True, "matches": True, "error": None}
+    assert results["Flow/1/step/2/artifact/0"] == {"included": True, "matches": False, "error": None}
+    assert len(MockArtifact.fetched) == 2
+
+    # Artifacts are not fetched again for other search terms
+    results, events = _search("value of flow/1/step/2/artifact", "eq")
+    assert [pathspec for pathspec, res in results.items() if res["matches"]] == ["Flow/1/step/2/artifact/0"]
+    assert len(MockArtifact.fetched) == 2
+    assert events == []
+
+    _search("value", "co", invalidate_cache=True)
+    assert len(MockArtifact.fetched) == 4
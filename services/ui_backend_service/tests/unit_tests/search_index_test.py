@@ -0,0 +1,78 @@
+import json
+import pytest
+
+from services.ui_backend_service.api.utils import operators_to_filters
+from services.ui_backend_service.data.cache.search_index import ArtifactSearchIndex, trigrams
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def _pathspec(task, run="1", name="value"):
+    return "Flow/%s/step/%s/%s/0" % (run, task, name)
+
+
+def _search(index, pathspecs, term, operator):
+    results = index.search(pathspecs, term, operators_to_filters[operator], operator)
+    return sorted(pathspec for pathspec, res in results.items() if res["matches"])
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ArtifactSearchIndex(str(tmp_path / "index.sqlite"))
+    index.add({
+        _pathspec(1): json.dumps([True, "Hello World"]),
+        _pathspec(2): json.dumps([True, {"greeting": "hello"}]),
+        _pathspec(3): json.dumps([True, 42]),
+        _pathspec(4): json.dumps([False, "artifact-too-large", "4: 1234 bytes"]),
+    })
+    yield index
+    index.close()
+
+
+def test_trigrams():
+    assert trigrams("hello") == {"hel", "ell", "llo"}
+    assert trigrams("hi") == set()
+
+
+def test_search_operators(index):
+    pathspecs = [_pathspec(task) for task in range(1, 5)]
+
+    assert _search(index, pathspecs, "HELLO", "co") == [_pathspec(1), _pathspec(2)]
+    assert _search(index, pathspecs, "hello world", "eq") == [_pathspec(1)]
+    assert _search(index, pathspecs, "{'gr", "sw") == [_pathspec(2)]
+    assert _search(index, pathspecs, "rld", "ew") == [_pathspec(1)]
+    # short terms and other operators are matched against the indexed values
+    assert _search(index, pathspecs, "o", "co") == [_pathspec(1), _pathspec(2)]
+    assert _search(index, pathspecs, "^\\d+$", "re") == [_pathspec(3)]
+    assert _search(index, [_pathspec(3)], "41", "gt") == [_pathspec(3)]
+
+    results = index.search(pathspecs, "hello", operators_to_filters["co"], "co")
+    assert results[_pathspec(4)] == {
+        "included": False,
+        "matches": False,
+        "error": {"id": "artifact-too-large", "detail": "4: 1234 bytes", "traceback": None}
+    }
+
+
+def test_index_is_incremental(index):
+    assert index.missing([_pathspec(1), _pathspec(5)]) == [_pathspec(5)]
+
+    # Values are only matched within the requested pathspecs, also across runs
+    index.add({_pathspec(1, run="2"): json.dumps([True, "hello"])})
+    assert _search(index, [_pathspec(1, run="2"), _pathspec(3)], "hello", "co") == [_pathspec(1, run="2")]
+
+    # Indexing a pathspec again replaces its value
+    index.add({_pathspec(1): json.dumps([True, "goodbye"])})
+    assert _search(index, [_pathspec(1), _pathspec(2)], "hello", "co") == [_pathspec(2)]
+    assert _search(index, [_pathspec(1), _pathspec(2)], "goodbye", "eq") == [_pathspec(1)]
+
+
+def test_least_recently_searched_partitions_are_pruned(tmp_path):
+    index = ArtifactSearchIndex(str(tmp_path / "index.sqlite"), max_partitions=2)
+    index.add({_pathspec(1, run="1"): json.dumps([True, "a"])})
+    index.add({_pathspec(1, run="2"): json.dumps([True, "b"])})
+    index.search([_pathspec(1, run="1")], "a", operators_to_filters["eq"], "eq")
+    index.add({_pathspec(1, run="3"): json.dumps([True, "c"])})
+
+    assert index.missing([_pathspec(1, run=run) for run in "123"]) == [_pathspec(1, run="2")]
+    index.close()
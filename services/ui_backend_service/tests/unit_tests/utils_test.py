@@ -1,6 +1,8 @@
 import pytest
 from services.data.db_utils import DBResponse, DBPagination
 import json
+import time
+import asyncio
 
 from aiohttp.test_utils import make_mocked_request
 
@@ -10,7 +12,10 @@ from services.ui_backend_service.api.utils import (
     builtin_conditions_query,
     custom_conditions_query,
     resource_conditions,
-    filter_from_conditions_query
+    filter_from_conditions_query,
+    keyset_order, keyset_conditions,
+    encode_cursor, decode_cursor,
+    TTLQueue
 )
 
 pytestmark = [pytest.mark.unit_tests]
@@ -107,6 +112,70 @@ def test_format_response_list_next_page_null():
     assert status == 200
 
 
+def test_format_response_list_keyset():
+    request = make_mocked_request(
+        'GET', '/runs?_limit=1&_cursor=', headers={'Host': 'test'})
+
+    db_response = DBResponse(response_code=200, body=[{"foo": "bar"}])
+    pagination = DBPagination(limit=1, offset=0, count=1, page=1)
+
+    _, response = format_response_list(request, db_response, pagination, 1, keyset=True, cursor="abc")
+    assert response["links"] == {
+        "self": "http://test/runs?_limit=1&_cursor=",
+        "first": "http://test/runs?_limit=1&_cursor=",
+        "prev": None,
+        "next": "http://test/runs?_limit=1&_cursor=abc",
+        "last": None
+    }
+
+    _, response = format_response_list(request, db_response, pagination, 1, keyset=True, cursor=None)
+    assert response["links"]["next"] is None
+
+
+def test_keyset_order():
+    assert keyset_order(None, ["flow_id", "run_number"]) == [("flow_id", "DESC"), ("run_number", "DESC")]
+    assert keyset_order(["\"ts_epoch\" ASC", "attempt_id DESC", "\"ts_epoch\" DESC"], ["run_number", "attempt_id"]) == [
+        ("ts_epoch", "ASC"), ("attempt_id", "DESC"), ("run_number", "DESC")]
+
+
+def test_cursor_roundtrip():
+    columns = [("ts_epoch", "DESC"), ("run_number", "DESC")]
+    cursor = encode_cursor(columns, {"ts_epoch": 123, "run_number": 4, "flow_id": "HelloFlow"})
+    assert decode_cursor(cursor, columns) == [123, 4]
+
+    # Cursors are only valid for the sort order they were created with
+    assert decode_cursor(cursor, [("ts_epoch", "DESC")]) is None
+    assert decode_cursor("not-a-cursor", columns) is None
+    assert decode_cursor("", columns) is None
+
+    # Non-scalar sort keys can not be used as a cursor
+    assert encode_cursor([("tags", "DESC")], {"tags": ["a"]}) is None
+
+
+def test_keyset_conditions_row_comparison():
+    condition, values = keyset_conditions(
+        [("flow_id", "DESC"), ("run_number", "DESC")], ["HelloFlow", 4], ["flow_id", "run_number"])
+    assert condition == "(\"flow_id\", \"run_number\") < (%s, %s)"
+    assert values == ["HelloFlow", 4]
+
+
+def test_keyset_conditions_mixed_directions_and_nulls():
+    condition, values = keyset_conditions(
+        [("finished_at", "ASC"), ("run_number", "DESC")], [100, 4], ["run_number"])
+    assert condition == "((\"finished_at\" > %s OR \"finished_at\" IS NULL) OR (\"finished_at\" = %s AND \"run_number\" < %s))"
+    assert values == [100, 100, 4]
+
+    condition, values = keyset_conditions(
+        [("finished_at", "ASC"), ("run_number", "DESC")], [None, 4], ["run_number"])
+    assert condition == "((\"finished_at\" IS NULL AND \"run_number\" < %s))"
+    assert values == [4]
+
+    condition, values = keyset_conditions(
+        [("finished_at", "DESC"), ("run_number", "DESC")], [None, 4], ["run_number"])
+    assert condition == "((\"finished_at\" IS NOT NULL) OR (\"finished_at\" IS NULL AND \"run_number\" < %s))"
+    assert values == [4]
+
+
 def test_pagination_query_defaults():
     request = make_mocked_request('GET', '/runs')
 
@@ -392,3 +461,36 @@ def test_filter_from_conditions_query():
 
     _list = list(filter(_filter, _test_data))
     assert _list == [_run_1, _run_2, _run_3]
+
+
+async def test_ttl_queue_values_since():
+    queue = TTLQueue(ttl_in_seconds=60)
+    for i in range(5):
+        await queue.append(i)
+    values = await queue.values()
+    assert [value for _, value in values] == [0, 1, 2, 3, 4]
+
+    since = values[2][0]
+    assert [value for _, value in await queue.values_since(since)] == [2, 3, 4]
+    assert await queue.values_since(time.time() + 1) == []
+
+
+async def test_ttl_queue_ring_buffer_drops_oldest():
+    queue = TTLQueue(ttl_in_seconds=60, max_size=3)
+    for i in range(7):
+        await queue.append(i)
+    assert [value for _, value in await queue.values()] == [4, 5, 6]
+    assert [value for _, value in await queue.values_since(0)] == [4, 5, 6]
+
+
+async def test_ttl_queue_discards_expired_values():
+    queue = TTLQueue(ttl_in_seconds=0.2, max_size=3)
+    await queue.append("expired")
+    await asyncio.sleep(0.3)
+    await queue.append("fresh")
+    assert [value for _, value in await queue.values()] == ["fresh"]
+
+    # Buffer keeps working after wrapping around expired slots
+    for i in range(4):
+        await queue.append(i)
+    assert [value for _, value in await queue.values()] == [1, 2, 3]
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from services.ui_backend_service.api.utils import TTLQueue
+from services.ui_backend_service.api.ws import SubscriptionRegistry, Websocket, WSSubscription, WS_QUEUE_TTL_SECONDS
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+def _subscription(ws, uuid, resource):
+    return WSSubscription(
+        ws=ws, disconnected_ts=None, fullpath=resource, resource=resource,
+        query=None, uuid=uuid, filter=None)
+
+
+def test_subscription_registry_add_and_match():
+    registry = SubscriptionRegistry()
+    registry.add(_subscription("ws1", "a", "/runs"))
+    registry.add(_subscription("ws1", "b", "/flows"))
+    registry.add(_subscription("ws2", "a", "/runs"))
+
+    assert len(registry) == 3
+    assert registry.has_any(["/runs", "/flows/HelloFlow/runs"])
+    assert not registry.has_any(["/flows/HelloFlow/runs"])
+
+    matches = registry.matching(["/runs", "/flows/HelloFlow/runs"])
+    assert sorted((resource, sub.ws, sub.uuid) for resource, sub in matches) == [
+        ("/runs", "ws1", "a"),
+        ("/runs", "ws2", "a")
+    ]
+
+
+def test_subscription_registry_replaces_duplicate_uuid():
+    registry = SubscriptionRegistry()
+    registry.add(_subscription("ws1", "a", "/runs"))
+    registry.add(_subscription("ws1", "a", "/flows"))
+
+    assert len(registry) == 1
+    assert not registry.has_any(["/runs"])
+    assert registry.has_any(["/flows"])
+
+
+def test_subscription_registry_remove():
+    registry = SubscriptionRegistry()
+    registry.add(_subscription("ws1", "a", "/runs"))
+    registry.add(_subscription("ws1", "b", "/flows"))
+    registry.add(_subscription("ws2", "a", "/runs"))
+
+    registry.remove("ws1", "a")
+    assert [sub.ws for _, sub in registry.matching(["/runs"])] == ["ws2"]
+
+    registry.remove("ws1")
+    assert not registry.has_any(["/flows"])
+    assert len(registry) == 1
+
+    # Removing unknown subscriptions is a no-op
+    registry.remove("ws3")
+    registry.remove("ws2", "unknown")
+    assert len(registry) == 1
+
+
+def test_subscription_registry_mark_disconnected():
+    registry = SubscriptionRegistry()
+    registry.add(_subscription("ws1", "a", "/runs"))
+    registry.add(_subscription("ws2", "a", "/runs"))
+
+    registry.mark_disconnected("ws1", 123)
+
+    disconnected = {sub.ws: sub.disconnected_ts for _, sub in registry.matching(["/runs"])}
+    assert disconnected == {"ws1": 123, "ws2": None}
+    assert {sub.ws: sub.disconnected_ts for sub in registry} == disconnected
+
+
+def test_subscription_registry_expire():
+    registry = SubscriptionRegistry()
+    registry.add(_subscription("ws1", "a", "/runs"))
+    registry.add(_subscription("ws1", "b", "/flows"))
+    registry.add(_subscription("ws2", "a", "/runs"))
+    registry.add(_subscription("ws3", "a", "/runs"))
+    registry.mark_disconnected("ws1", 100)
+    registry.mark_disconnected("ws2", 200)
+    registry.mark_disconnected("ws3", 300)
+    # removed subscriptions are not expired again
+    registry.remove("ws2")
+
+    registry.expire(250)
+    assert [(sub.ws, sub.uuid) for sub in registry] == [("ws3", "a")]
+    assert not registry.has_any(["/flows"])
+
+    registry.expire(301)
+    assert len(registry) == 0
+    assert not registry.has_any(["/runs"])
+
+
+class MockWebsocket(object):
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, payload):
+        self.sent.append(payload)
+
+
+async def test_broadcast_removes_expired_subscriptions_of_quiet_resources():
+    websocket = Websocket.__new__(Websocket)
+    websocket.queue = TTLQueue(WS_QUEUE_TTL_SECONDS)
+    websocket.subscriptions = SubscriptionRegistry()
+    quiet_ws, active_ws = MockWebsocket(), MockWebsocket()
+    websocket.subscriptions.add(_subscription(quiet_ws, "a", "/flows/QuietFlow/runs"))
+    websocket.subscriptions.add(_subscription(active_ws, "a", "/runs"))
+    websocket.subscriptions.mark_disconnected(quiet_ws, time.time() - WS_QUEUE_TTL_SECONDS - 1)
+
+    await websocket._broadcast("INSERT", ["/runs"], {"flow_id": "HelloFlow"})
+
+    assert [sub.ws for sub in websocket.subscriptions] == [active_ws]
+    assert not websocket.subscriptions.has_any(["/flows/QuietFlow/runs"])
+    assert len(active_ws.sent) == 1
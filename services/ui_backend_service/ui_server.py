@@ -59,10 +59,11 @@ def app(loop=None, db_conf: DBConfiguration = None):
     loop.run_until_complete(async_db_cache._init(db_conf))
     cache_store = CacheStore(app=app, db=async_db_cache, event_emitter=event_emitter)
 
+    listen_notify = None
     if FEATURE_DB_LISTEN_ENABLE:
         async_db_notify = AsyncPostgresDB('ui:notify')
         loop.run_until_complete(async_db_notify._init(db_conf))
-        ListenNotify(app, db=async_db_notify, event_emitter=event_emitter)
+        listen_notify = ListenNotify(app, db=async_db_notify, event_emitter=event_emitter)
 
     if FEATURE_HEARTBEAT_ENABLE:
         async_db_heartbeat = AsyncPostgresDB('ui:heartbeat')
@@ -91,7 +92,7 @@ def app(loop=None, db_conf: DBConfiguration = None):
     CardsApi(app, async_db, cache_store)
 
     LogApi(app, async_db, cache_store)
-    AdminApi(app, cache_store)
+    AdminApi(app, cache_store, listen_notify)
 
     # Add Metadata Service as a sub application so that Metaflow Client
     # can use it as a service backend in case none provided via METAFLOW_SERVICE_URL
@@ -1,3 +1,4 @@
+from services.data.db_utils import row_serializer
 from services.utils import DBConfiguration
 import pytest
 
@@ -14,3 +15,31 @@ def get_test_dbconf():
             expected DSN to be: dbname=test user=test host=db_test port=5432 password=test")
 
     return db_conf
+
+
+def serialized_fields_record(row_type, run_id=None, task_name=None):
+    """
+    Returns a result row with a distinct value for every column of the serialized fields of a row type,
+    see services.data.db_utils.row_serializer
+    """
+    columns = []
+    for field in row_type.serialized_fields(True) + row_type.serialized_fields(False):
+        for column in [field] if isinstance(field, str) else field[2:]:
+            if column not in columns:
+                columns.append(column)
+    record = {column: "{}-value".format(column) for column in columns}
+    ids = {"run_number": 1, "run_id": run_id, "task_id": 2, "task_name": task_name, "ts_epoch": 3}
+    record.update((column, value) for column, value in ids.items() if column in record)
+    return record
+
+
+def assert_serialized_like_row_object(row_type, record, expanded=False):
+    """
+    Asserts that row_serializer serializes a result row like `row_type(**record).serialize(expanded)`,
+    with the same keys in the same order
+    """
+    expected = row_type(**record).serialize(expanded)
+    serialized = row_serializer(row_type, list(record), expanded)(tuple(record.values()))
+    assert serialized == expected
+    assert list(serialized) == list(expected)
+    return serialized
@@ -0,0 +1,16 @@
+import pytest
+from services.data import models
+from services.ui_backend_service.data.db import models as ui_models
+from services.utils.tests import assert_serialized_like_row_object, serialized_fields_record
+
+pytestmark = [pytest.mark.unit_tests]
+
+
+@pytest.mark.parametrize("row_type", [
+    models.ArtifactRow, models.RunRow, models.TaskRow,
+    ui_models.ArtifactRow, ui_models.RunRow, ui_models.TaskRow
+])
+@pytest.mark.parametrize("expanded", [True, False])
+@pytest.mark.parametrize("run_id, task_name", [(None, None), ("custom-run", "custom-task")])
+def test_serialized_fields_match_serialize(row_type, expanded, run_id, task_name):
+    assert_serialized_like_row_object(row_type, serialized_fields_record(row_type, run_id, task_name), expanded)